@@ -0,0 +1,102 @@
+"""Micro-batching front end for the inference engine.
+
+Concurrent callers submit images to a queue. One worker thread takes the
+first waiting request, gathers more until ``max_batch_size`` or until
+``max_wait`` seconds have passed, runs the whole batch through each model
+once, and hands every caller its own result.
+"""
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from engine import to_rgb_array
+
+
+class BatchInferenceServer:
+    """Collects ``submit`` calls into batches for ``engine.analyze_batch``."""
+
+    def __init__(self, engine, max_batch_size=8, max_wait=0.01, history=1000):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=history)
+        self.completed = 0
+        self.failed = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, image):
+        """Queue an image; the Future resolves to ``(detections, depth_array)``."""
+        future = Future()
+        self.requests.put((to_rgb_array(image), time.perf_counter(), future))
+        return future
+
+    def analyze(self, image, timeout=None):
+        return self.submit(image).result(timeout)
+
+    def stats(self):
+        """Queue depth, batch-size histogram and latency percentiles (seconds)."""
+        with self.lock:
+            latencies = np.array(self.latencies) if self.latencies else None
+            stats = {
+                'queue_depth': self.requests.qsize(),
+                'completed': self.completed,
+                'failed': self.failed,
+                'batch_sizes': dict(sorted(self.batch_sizes.items())),
+            }
+        if latencies is not None:
+            stats['p50'] = float(np.percentile(latencies, 50))
+            stats['p99'] = float(np.percentile(latencies, 99))
+        return stats
+
+    def close(self):
+        self.running = False
+        self.requests.put(None)
+        self.thread.join(timeout=2)
+
+    def _gather(self):
+        first = self.requests.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._gather()
+            if not batch:
+                continue
+            try:
+                results = self.engine.analyze_batch([rgb for rgb, _, _ in batch])
+            except Exception as e:
+                with self.lock:
+                    self.failed += len(batch)
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            done = time.perf_counter()
+            with self.lock:
+                self.batch_sizes[len(batch)] += 1
+                self.completed += len(batch)
+                self.latencies.extend(done - submitted for _, submitted, _ in batch)
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
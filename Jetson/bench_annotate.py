@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Benchmark: per-detection cv2 drawing loop vs. the cached Annotator."""
+
+import argparse
+import time
+
+import numpy as np
+import cv2
+
+from annotate import Annotator
+from fusion import class_names
+
+
+def legacy_draw(image, detections):
+    # The drawing loop from jetson_old.py / process_image
+    for detection in detections:
+        left = int(detection['Left'])
+        top = int(detection['Top'])
+        right = int(detection['Right'])
+        bottom = int(detection['Bottom'])
+        cv2.rectangle(image, (left, top), (right, bottom), (0, 255, 0), 2)
+        label = f"{class_names[detection['ClassID']]}: {detection['MeanDepth']:.2f}"
+        label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+        label_top_left = (right - label_size[0] - 5, bottom - 5)
+        label_bottom_right = (right - 5, bottom - label_size[1] - 5)
+        cv2.rectangle(image, label_top_left, label_bottom_right, (0, 255, 0), cv2.FILLED)
+        cv2.putText(image, label, (right - label_size[0] - 3, bottom - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+
+
+def random_detections(rng, count, width, height):
+    detections = []
+    for _ in range(count):
+        left, top = rng.uniform(0, width - 40), rng.uniform(0, height - 40)
+        right, bottom = left + rng.uniform(40, width / 3), top + rng.uniform(40, height / 3)
+        detections.append({'ClassID': int(rng.integers(1, len(class_names))), 'Left': left, 'Top': top,
+                           'Right': min(right, width), 'Bottom': min(bottom, height),
+                           'MeanDepth': float(rng.random())})
+    return detections
+
+
+def best_time(fn, image, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        frame = image.copy()
+        start = time.perf_counter()
+        fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+parser = argparse.ArgumentParser(description="Compare the old drawing loop with annotate.Annotator.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["640x480", "1920x1080"], help="frame sizes WxH")
+parser.add_argument("--counts", type=int, nargs='+', default=[10, 100, 300, 500], help="detections per frame")
+parser.add_argument("--repeat", type=int, default=10, help="runs per measurement (best is reported)")
+opt = parser.parse_args()
+
+rng = np.random.default_rng(0)
+print(f"{'size':>10} {'dets':>5} {'loop ms':>9} {'cached ms':>10} {'alpha ms':>9} {'speedup':>8}")
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    image = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for count in opt.counts:
+        detections = random_detections(rng, count, width, height)
+        annotator = Annotator(class_names)
+        blended = Annotator(class_names, alpha=0.6)
+        # Warm the label caches, as a running stream would
+        annotator.draw(image.copy(), detections)
+        blended.draw(image.copy(), detections)
+        loop = best_time(lambda frame: legacy_draw(frame, detections), image, opt.repeat)
+        cached = best_time(lambda frame: annotator.draw(frame, detections), image, opt.repeat)
+        alpha = best_time(lambda frame: blended.draw(frame, detections), image, opt.repeat)
+        print(f"{size:>10} {count:>5} {loop * 1000:>9.2f} {cached * 1000:>10.2f} {alpha * 1000:>9.2f} {loop / cached:>7.1f}x")
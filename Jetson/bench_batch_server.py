@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Benchmark: one-at-a-time engine calls vs. the micro-batching server under concurrent load.
+
+Uses the CPU stand-in backend with a fixed per-call overhead to model the
+launch cost of a GPU network.
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from engine import InferenceEngine, NumpyBackend
+from batch_server import BatchInferenceServer
+
+
+def run_clients(analyze, clients, requests_per_client, image):
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            analyze(image)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'throughput': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 2),
+    }
+
+
+parser = argparse.ArgumentParser(description="Compare direct and batched inference under concurrent clients.")
+parser.add_argument("--clients", type=int, nargs='+', default=[1, 4, 8, 16], help="concurrent client counts")
+parser.add_argument("--requests", type=int, default=20, help="requests per client")
+parser.add_argument("--overhead", type=float, default=0.01, help="stand-in per-call overhead in seconds")
+parser.add_argument("--max-batch-size", type=int, default=8, help="largest batch")
+parser.add_argument("--max-wait", type=float, default=0.005, help="seconds to wait for a batch to fill")
+opt = parser.parse_args()
+
+image = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+engine = InferenceEngine(NumpyBackend(call_overhead=opt.overhead))
+server = BatchInferenceServer(engine, opt.max_batch_size, opt.max_wait)
+
+for clients in opt.clients:
+    direct = run_clients(engine.analyze, clients, opt.requests, image)
+    batched = run_clients(server.analyze, clients, opt.requests, image)
+    print(json.dumps({'clients': clients, 'direct': direct, 'batched': batched}))
+
+print(json.dumps(server.stats()))
+server.close()
+engine.close()
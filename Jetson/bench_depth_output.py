@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Benchmark: raw depth field vs. the old colormapped-JPEG round trip.
+
+The old scripts had depthNet draw a colormapped visualization at input
+resolution, saved it as JPEG and read it back as grayscale / 255. The
+engine now takes the float depth field (here a synthetic network-sized
+field) and at most resizes it. The value ranges show that the round trip
+only kept the colormap's luminance, not the depth values.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import cv2
+
+from fusion import depth_to_rgb
+
+
+def old_path(field, width, height):
+    view = depth_to_rgb(field, (width, height))
+    ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(view, cv2.COLOR_RGB2BGR))
+    gray = cv2.cvtColor(cv2.imdecode(encoded, cv2.IMREAD_COLOR), cv2.COLOR_BGR2GRAY)
+    return gray.astype(np.float32) / 255.0
+
+
+def new_path(field, width, height, upsample):
+    if not upsample:
+        return field.copy()
+    return cv2.resize(field, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def time_ms(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+parser = argparse.ArgumentParser(description="Compare depth output paths.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["640x480", "1280x720", "1920x1080"], help="input sizes WxH")
+parser.add_argument("--field", type=str, default="224x224", help="depth field size WxH")
+parser.add_argument("--repeat", type=int, default=50, help="iterations per measurement")
+opt = parser.parse_args()
+
+field_width, field_height = (int(v) for v in opt.field.split('x'))
+x = np.linspace(0, 1, field_width, dtype=np.float32)
+y = np.linspace(0, 1, field_height, dtype=np.float32)[:, None]
+field = (1.5 + 3.0 * x * y + 0.5 * np.sin(8 * x)).astype(np.float32)
+
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    round_trip = old_path(field, width, height)
+    print(json.dumps({
+        'size': size,
+        'field': opt.field,
+        'jpeg_round_trip_ms': round(time_ms(lambda: old_path(field, width, height), opt.repeat), 3),
+        'raw_upsampled_ms': round(time_ms(lambda: new_path(field, width, height, True), opt.repeat), 3),
+        'raw_field_ms': round(time_ms(lambda: new_path(field, width, height, False), opt.repeat), 3),
+        'round_trip_range': [round(float(round_trip.min()), 3), round(float(round_trip.max()), 3)],
+        'field_range': [round(float(field.min()), 3), round(float(field.max()), 3)],
+    }))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-box np.mean loop vs. batched summed-area-table statistics.
+
+``fusion ms`` is ``fusion.add_mean_depth``, which takes the loop below
+``fusion.batched_min_boxes`` boxes and the batched statistics from there on.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from depth_stats import box_depth_stats
+from fusion import add_mean_depth
+
+
+def loop_mean_depth(depth_array, boxes):
+    # The fusion loop used by jetson_old.py / detect_depth.py / process_image
+    means = []
+    for left, top, right, bottom in boxes:
+        roi = depth_array[top:bottom, left:right]
+        means.append(np.mean(roi))
+    return means
+
+
+def random_boxes(rng, count, height, width):
+    left = rng.integers(0, width - 1, count)
+    top = rng.integers(0, height - 1, count)
+    right = np.minimum(left + rng.integers(1, width // 2, count), width)
+    bottom = np.minimum(top + rng.integers(1, height // 2, count), height)
+    return np.stack([left, top, right, bottom], axis=1)
+
+
+def best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+parser = argparse.ArgumentParser(description="Compare per-box depth loops against depth_stats.box_depth_stats.")
+parser.add_argument("--width", type=int, default=640, help="depth map width")
+parser.add_argument("--height", type=int, default=480, help="depth map height")
+parser.add_argument("--counts", type=int, nargs='+', default=[1, 10, 50, 100, 250, 500], help="box counts to test")
+parser.add_argument("--repeat", type=int, default=20, help="runs per measurement (best is reported)")
+opt = parser.parse_args()
+
+rng = np.random.default_rng(0)
+depth_array = rng.random((opt.height, opt.width), dtype=np.float32)
+
+print(f"{'boxes':>6} {'loop ms':>10} {'mean ms':>10} {'all ms':>10} {'fusion ms':>10} {'speedup':>8}")
+for count in opt.counts:
+    boxes = random_boxes(rng, count, opt.height, opt.width)
+    loop = best_time(lambda: loop_mean_depth(depth_array, boxes), opt.repeat)
+    mean_only = best_time(lambda: box_depth_stats(depth_array, boxes, minmax=False), opt.repeat)
+    full = best_time(lambda: box_depth_stats(depth_array, boxes, median_bins=16), opt.repeat)
+    detections = [dict(zip(('Left', 'Top', 'Right', 'Bottom'), map(float, box))) for box in boxes]
+    fusion = best_time(lambda: add_mean_depth(detections, depth_array), opt.repeat)
+    print(f"{count:>6} {loop * 1000:>10.3f} {mean_only * 1000:>10.3f} {full * 1000:>10.3f} {fusion * 1000:>10.3f} "
+          f"{loop / mean_only:>7.1f}x")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark: result cache on repeated uploads and a mostly stationary camera.
+
+The stand-in backend sleeps ``--overhead`` seconds per network call to
+model GPU inference. Three workloads per frame size:
+
+- ``repeat``: a few distinct images submitted over and over (exact hits)
+- ``stationary``: one scene with sensor noise, i.e. a robot standing still
+  (near hits reuse depth, detection still runs)
+- ``moving``: a scene panning every frame (misses; shows the cache overhead)
+
+``live_p50_ms`` is the configuration of the live view in jetson_gradio.py,
+near hits only (``max_bytes=0``), so nothing is hashed or stored.
+
+Detection and depth run concurrently, so a near hit saves GPU time
+(``cached_network_calls``) rather than latency unless detections are
+reused too (``--reuse-detections``).
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import cv2
+
+from engine import InferenceEngine, NumpyBackend
+from metrics import metrics
+from result_cache import CachingEngine
+
+
+def scene(rng, width, height):
+    """Random coarse blocks plus fine noise, so that panning changes the thumbnail."""
+    blocks = cv2.resize(rng.uniform(0, 255, (12, 16, 3)).astype(np.float32), (width, height),
+                        interpolation=cv2.INTER_NEAREST)
+    return np.clip(blocks + rng.normal(0, 10, (height, width, 3)), 0, 255)
+
+
+def workload(name, rng, width, height, frames):
+    base = scene(rng, width, height)
+    if name == 'repeat':
+        images = [scene(rng, width, height).astype(np.uint8) for _ in range(4)]
+        return [images[i % len(images)] for i in range(frames)]
+    if name == 'stationary':
+        return [np.clip(base + rng.normal(0, 2, base.shape), 0, 255).astype(np.uint8) for _ in range(frames)]
+    return [np.roll(base, i * width // frames, axis=1).astype(np.uint8) for i in range(frames)]
+
+
+def run(engine, images):
+    """Latencies in ms and the number of network calls made."""
+    calls = metrics.histogram('detect').count + metrics.histogram('depth').count
+    latencies = []
+    for rgb in images:
+        t = time.perf_counter()
+        engine.analyze(rgb)
+        latencies.append(time.perf_counter() - t)
+    return np.array(latencies) * 1000, metrics.histogram('detect').count + metrics.histogram('depth').count - calls
+
+
+parser = argparse.ArgumentParser(description="Measure the detection/depth result cache.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["224x224", "640x480", "1280x720"], help="frame sizes WxH")
+parser.add_argument("--frames", type=int, default=60, help="frames per workload")
+parser.add_argument("--overhead", type=float, default=0.02, help="seconds per stand-in network call")
+parser.add_argument("--threshold", type=float, default=2.0, help="near-hit threshold (mean gray-level difference)")
+parser.add_argument("--reuse-detections", action="store_true", help="reuse detections on near hits as well")
+opt = parser.parse_args()
+
+rng = np.random.default_rng(0)
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    for name in ('repeat', 'stationary', 'moving'):
+        images = workload(name, rng, width, height, opt.frames)
+        plain = InferenceEngine(NumpyBackend(call_overhead=opt.overhead))
+        cached = CachingEngine(InferenceEngine(NumpyBackend(call_overhead=opt.overhead)), diff_threshold=opt.threshold,
+                               reuse_detections=opt.reuse_detections)
+        live = CachingEngine(InferenceEngine(NumpyBackend(call_overhead=opt.overhead)), max_bytes=0,
+                             diff_threshold=opt.threshold, reuse_detections=opt.reuse_detections)
+        baseline, baseline_calls = run(plain, images)
+        with_cache, cached_calls = run(cached, images)
+        live_only, _ = run(live, images)
+        stats = cached.stats()
+        print(json.dumps({
+            'size': size,
+            'workload': name,
+            'uncached_p50_ms': round(float(np.median(baseline)), 3),
+            'cached_p50_ms': round(float(np.median(with_cache)), 3),
+            'live_p50_ms': round(float(np.median(live_only)), 3),
+            'speedup': round(float(baseline.sum() / with_cache.sum()), 2),
+            'network_calls': baseline_calls,
+            'cached_network_calls': cached_calls,
+            'exact_hits': stats['exact_hits'],
+            'near_hits': stats['near_hits'],
+            'misses': stats['misses'],
+            'cache_mb': round(stats['bytes'] / 1e6, 1),
+        }))
+        plain.close()
+        cached.close()
+        live.close()
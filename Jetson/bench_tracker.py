@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark: tracking quality and cost on synthetic box sequences.
+
+Objects move at constant velocity and bounce off the frame edges. The
+"detector" returns their boxes with position noise and occasional misses.
+For each ``--detect-every`` value the script reports detector runs, ID
+switches, how well the reported boxes overlap the true ones, and the
+tracker's time per frame.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from tracker import Tracker, TrackedDetector, iou_matrix
+
+
+def synthetic_sequence(frames, objects, width, height, noise, miss_rate, seed):
+    """Yield (true_boxes, detections) per frame."""
+    rng = np.random.default_rng(seed)
+    size = rng.uniform(30, 90, (objects, 2))
+    position = rng.uniform(0, 1, (objects, 2)) * ([width, height] - size)
+    velocity = rng.uniform(-4, 4, (objects, 2))
+    classes = rng.integers(1, 4, objects)
+    for _ in range(frames):
+        position += velocity
+        for axis, limit in enumerate((width, height)):
+            bounce = (position[:, axis] < 0) | (position[:, axis] + size[:, axis] > limit)
+            velocity[bounce, axis] *= -1
+            position[:, axis] = np.clip(position[:, axis], 0, limit - size[:, axis])
+        truth = np.concatenate([position, position + size], axis=1)
+        detections = []
+        for i, box in enumerate(truth + rng.normal(0, noise, truth.shape)):
+            if rng.random() < miss_rate:
+                continue
+            detections.append({'ClassID': int(classes[i]), 'Confidence': 0.9, 'Left': box[0], 'Top': box[1],
+                               'Right': box[2], 'Bottom': box[3]})
+        yield truth, detections
+
+
+def run(opt, detect_every):
+    sequence = synthetic_sequence(opt.frames, opt.objects, opt.width, opt.height, opt.noise, opt.miss_rate, opt.seed)
+    # The "frame" handed to the detector is already its list of detections
+    detector = TrackedDetector(lambda detections: detections, Tracker(max_age=max(5, 2 * detect_every)), detect_every)
+
+    owner = {}
+    switches = 0
+    overlaps = []
+    elapsed = 0.0
+    for truth, detections in sequence:
+        start = time.perf_counter()
+        tracks = detector(detections)
+        elapsed += time.perf_counter() - start
+        if not tracks:
+            overlaps.extend([0.0] * len(truth))
+            continue
+        boxes = np.array([[t['Left'], t['Top'], t['Right'], t['Bottom']] for t in tracks])
+        iou = iou_matrix(truth, boxes)
+        best = iou.argmax(axis=1)
+        overlaps.extend(iou.max(axis=1))
+        for obj, track in enumerate(best):
+            if iou[obj, track] < 0.3:
+                continue
+            track_id = tracks[track]['TrackID']
+            if owner.get(obj, track_id) != track_id:
+                switches += 1
+            owner[obj] = track_id
+
+    return {
+        'detect_every': detect_every,
+        'detector_runs': detector.detector_runs,
+        'id_switches': switches,
+        'mean_iou': round(float(np.mean(overlaps)), 3),
+        'recall_at_0.5': round(float(np.mean(np.array(overlaps) >= 0.5)), 3),
+        'tracker_ms_per_frame': round(elapsed / opt.frames * 1000, 3),
+    }
+
+
+parser = argparse.ArgumentParser(description="Measure tracking quality and cost on synthetic boxes.")
+parser.add_argument("--frames", type=int, default=600, help="frames per run")
+parser.add_argument("--objects", type=int, default=10, help="objects in the scene")
+parser.add_argument("--width", type=int, default=1280, help="frame width")
+parser.add_argument("--height", type=int, default=720, help="frame height")
+parser.add_argument("--noise", type=float, default=2.0, help="detector box noise in pixels")
+parser.add_argument("--miss-rate", type=float, default=0.05, help="chance a detection is missed")
+parser.add_argument("--detect-every", type=int, nargs='+', default=[1, 2, 3, 5], help="detector intervals to test")
+parser.add_argument("--seed", type=int, default=0, help="random seed")
+opt = parser.parse_args()
+
+for detect_every in opt.detect_every:
+    print(json.dumps(run(opt, detect_every)))
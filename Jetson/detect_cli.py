@@ -0,0 +1,66 @@
+"""Command line shared by depthnet.py, detectdepthnet.py and detectnet.py.
+
+The scripts keep their original arguments; the capture -> detect -> render
+loop itself is the ``pipelines/detectnet.json`` pipeline.
+"""
+import argparse
+import json
+import sys
+
+from pipeline import build_pipeline, load_config
+
+
+def _usage():
+    # Importing jetson.inference loads TensorRT and CUDA, so it only happens for --help;
+    # otherwise the stages import it while they are being built
+    import jetson.inference
+    import jetson.utils
+    return jetson.inference.detectNet.Usage() + jetson.utils.videoSource.Usage() + jetson.utils.videoOutput.Usage() + jetson.utils.Log.Usage()
+
+
+def run_detectnet(output_positional=False):
+    wants_help = any(arg in ('-h', '--help') for arg in sys.argv[1:])
+    parser = argparse.ArgumentParser(
+        description="Locate objects in a live camera stream using an object detection DNN.",
+        formatter_class=argparse.RawTextHelpFormatter,
+        epilog=_usage() if wants_help else None
+    )
+
+    parser.add_argument("input_URI", type=str, default="", nargs='?', help="URI of the input stream")
+    parser.add_argument("output_URI", type=str, default="", nargs='?', help="URI of the output stream")
+    if output_positional:
+        parser.add_argument("detections_output", type=str, help="Where to stream per-frame detections: '-', a file or pipe path, tcp://host:port or unix:///path")
+    else:
+        parser.add_argument("--detections-output", type=str, default="-", help="where to stream per-frame detections: '-', a file or pipe path, tcp://host:port or unix:///path")
+    parser.add_argument("--detections-format", "--format", type=str, default="ndjson", choices=["ndjson", "binary"], help="detection stream format")
+    parser.add_argument("--network", type=str, default="ssd-mobilenet-v2", help="pre-trained model to load")
+    parser.add_argument("--overlay", type=str, default="box,labels,conf", help="detection overlay flags")
+    parser.add_argument("--threshold", type=float, default=0.5, help="minimum detection threshold to use")
+    parser.add_argument("--detect-every", type=int, default=1, help="run the detector every N frames and track boxes in between")
+    parser.add_argument("--max-age", type=int, default=None, help="frames a track is kept without a matching detection")
+    parser.add_argument("--mode", type=str, default="latency", choices=["latency", "throughput"], help="drop (latency) or block (throughput) when a stage falls behind")
+
+    # Adjust for headless mode
+    is_headless = ["--headless"] if sys.argv[0].find('console.py') != -1 else [""]
+
+    try:
+        opt = parser.parse_known_args()[0]
+    except:
+        print("")
+        parser.print_help()
+        sys.exit(0)
+
+    config = load_config('detectnet')
+    config['mode'] = opt.mode
+    detect_every = max(1, opt.detect_every)
+    pipeline = build_pipeline(
+        config,
+        jetson_source={'uri': opt.input_URI, 'argv': sys.argv},
+        detect={'network': opt.network, 'threshold': opt.threshold, 'overlay': opt.overlay,
+                'every': detect_every, 'argv': sys.argv},
+        track={'max_age': opt.max_age if opt.max_age is not None else max(5, 2 * detect_every)},
+        detections={'output': opt.detections_output, 'format': opt.detections_format},
+        render={'uri': opt.output_URI, 'argv': sys.argv + is_headless},
+    )
+    # Per-stage timings replace the network profiler dump
+    print(json.dumps(pipeline.run()), file=sys.stderr)
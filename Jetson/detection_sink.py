@@ -0,0 +1,204 @@
+"""Streaming per-frame detection output.
+
+``DetectionStream`` takes one call per frame, ``write(frame_index,
+detections)``, and hands it to a writer thread through a bounded queue, so
+the capture loop never waits on the disk, pipe or socket. The writer
+serializes everything that is queued in one go and flushes at most every
+``flush_interval`` seconds (and on ``close``).
+
+Targets:
+
+- ``-``: standard output
+- ``tcp://host:port`` or ``unix:///path/to/socket``: a stream socket
+- anything else: a file path (named pipes work too)
+
+Formats:
+
+- ``ndjson``: one compact JSON object per frame,
+  ``{"frame", "time", "wall", "detections"}``
+- ``binary``: a small JSON header followed by fixed-width records (see
+  ``record_dtype``), one per detection. A frame without detections gets
+  one record with ``class_id == -1`` so frame timing survives. Load with
+  ``load_detections``.
+
+``time`` is seconds since the stream was opened (monotonic clock); ``wall``
+is ``time.time()`` at ``write``.
+"""
+import io
+import json
+import os
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from metrics import metrics
+
+MAGIC = b'JDT1'
+record_dtype = np.dtype([
+    ('frame', '<u4'), ('time', '<f8'), ('track_id', '<i4'), ('class_id', '<i2'), ('confidence', '<f4'),
+    ('left', '<f4'), ('top', '<f4'), ('right', '<f4'), ('bottom', '<f4'), ('depth', '<f4'),
+])
+
+
+def open_target(target):
+    """Open ``target`` as a binary writable stream."""
+    if target == '-':
+        return sys.stdout.buffer
+    if target.startswith('tcp://'):
+        host, port = target[len('tcp://'):].rsplit(':', 1)
+        return socket.create_connection((host, int(port))).makefile('wb')
+    if target.startswith('unix://'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len('unix://'):])
+        return sock.makefile('wb')
+    return open(target, 'wb')
+
+
+def _ndjson_lines(items):
+    lines = []
+    for frame_index, elapsed, wall, detections in items:
+        lines.append(json.dumps({'frame': frame_index, 'time': round(elapsed, 6), 'wall': wall,
+                                 'detections': detections}, separators=(',', ':'), default=float))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _binary_records(items):
+    rows = []
+    for frame_index, elapsed, _, detections in items:
+        if not detections:
+            rows.append((frame_index, elapsed, -1, -1, 0.0, 0.0, 0.0, 0.0, 0.0, np.nan))
+        for d in detections:
+            depth = d.get('MeanDepth')
+            rows.append((frame_index, elapsed, d.get('TrackID', -1), d['ClassID'], d.get('Confidence', 0.0),
+                         d['Left'], d['Top'], d['Right'], d['Bottom'], np.nan if depth is None else depth))
+    return np.array(rows, dtype=record_dtype).tobytes()
+
+
+class DetectionStream:
+    """Buffered, asynchronous writer of per-frame detections.
+
+    When the writer falls ``queue_size`` frames behind, ``write`` drops the
+    frame and counts it in ``dropped`` (``block=True`` waits instead).
+    """
+
+    formats = {'ndjson': _ndjson_lines, 'binary': _binary_records}
+
+    def __init__(self, target, format='ndjson', queue_size=256, flush_interval=0.5, block=False):
+        if format not in self.formats:
+            raise ValueError(f"unknown format {format!r}, expected one of {sorted(self.formats)}")
+        self.target = target
+        self.format = format
+        self.encode = self.formats[format]
+        self.flush_interval = flush_interval
+        self.block = block
+        self.items = queue.Queue(maxsize=queue_size)
+        self.start = time.monotonic()
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        # Opening happens on the writer thread: a named pipe or socket may block until the reader appears
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, frame_index, detections):
+        """Queue one frame's detections (dicts as produced by ``engine.detection_to_dict``)."""
+        item = (frame_index, time.monotonic() - self.start, time.time(), list(detections))
+        try:
+            self.items.put(item, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Write what is still queued and close the target."""
+        try:
+            self.items.put(None, timeout=timeout)
+        except queue.Full:
+            # The writer is stuck on the target; it is a daemon thread, so give up on it
+            pass
+        self.thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _header(self):
+        if self.format != 'binary':
+            return b''
+        header = json.dumps({'format': 'detections', 'created': time.time(), 'fields': record_dtype.names}).encode()
+        return MAGIC + struct.pack('<I', len(header)) + header
+
+    def _run(self):
+        try:
+            raw = open_target(self.target)
+            stream = raw if isinstance(raw, io.BufferedIOBase) else io.BufferedWriter(raw, 1 << 16)
+        except Exception as e:
+            # OSError, or a ValueError for a malformed target such as a tcp:// address without a port
+            self.error = e
+            print(f"Detection stream {self.target} unavailable: {e}")
+            # Keep draining so writers never block on a dead target
+            while self.items.get() is not None:
+                self.dropped += 1
+            return
+
+        stream.write(self._header())
+        last_flush = time.monotonic()
+        pending = False
+        running = True
+        while running:
+            try:
+                # Wake up at the flush deadline even when no frames arrive
+                items = [self.items.get(timeout=self.flush_interval if pending else None)]
+            except queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self.items.get_nowait())
+                except queue.Empty:
+                    break
+            if items and items[-1] is None:
+                running = False
+                items.pop()
+            try:
+                with metrics.timer('output'):
+                    if items:
+                        stream.write(self.encode(items))
+                        self.written += len(items)
+                        pending = True
+                    now = time.monotonic()
+                    if pending and (not running or now - last_flush >= self.flush_interval):
+                        stream.flush()
+                        last_flush = now
+                        pending = False
+            except Exception as e:
+                # Reader went away (closed pipe or socket) or a frame could not be encoded; count the rest as dropped
+                self.error = e
+                self.dropped += len(items)
+                while running and self.items.get() is not None:
+                    self.dropped += 1
+                break
+        if raw is not sys.stdout.buffer:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+def load_detections(path):
+    """Return the records of a binary detection stream as a read-only structured array."""
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a binary detection stream")
+        header_size, = struct.unpack('<I', f.read(4))
+    offset = 8 + header_size
+    # Ignore a partially written last record
+    count = (os.path.getsize(path) - offset) // record_dtype.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=record_dtype)
+    return np.memmap(path, dtype=record_dtype, mode='r', offset=offset, shape=(count,))
@@ -0,0 +1,350 @@
+"""Long-lived detection + depth engine.
+
+The networks are loaded once when the engine is built and every call to
+``analyze`` runs in-process, instead of launching ``./depthnet.py`` and
+``./detectnet.py`` as subprocesses for every image.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+import cv2
+
+from metrics import metrics
+from preprocess import pool
+from shared_buffers import SharedArray
+
+
+def detection_to_dict(detection):
+    """Convert a jetson.inference detection to the dict layout used in the JSON files."""
+    return {
+        'ClassID': detection.ClassID,
+        'Confidence': detection.Confidence,
+        'Left': detection.Left,
+        'Top': detection.Top,
+        'Right': detection.Right,
+        'Bottom': detection.Bottom,
+        'Width': detection.Width,
+        'Height': detection.Height,
+        'Area': detection.Area,
+        'Center': (detection.Center[0], detection.Center[1])
+    }
+
+
+def to_rgb_array(image):
+    """Return an HxWx3 uint8 RGB array for a PIL image or an RGB numpy array."""
+    if isinstance(image, np.ndarray):
+        return image
+    return np.asarray(image.convert('RGB'))
+
+
+class JetsonBackend:
+    """Runs detectNet and depthNet from jetson.inference on the GPU.
+
+    ``depth`` returns depthNet's raw float depth field (relative depth, not
+    a visualization). The field is at the network's output resolution; with
+    ``depth_upsample`` it is resized bilinearly to the input resolution.
+    ``depth_dtype`` may be float16 to halve the size of stored depth maps.
+    """
+
+    def __init__(self, detect_network="ssd-mobilenet-v2", depth_network="monodepth-mobilenet", threshold=0.5,
+                 depth_upsample=True, depth_dtype=np.float32):
+        import jetson.inference
+        import jetson.utils
+        self.utils = jetson.utils
+        self.detect_net = jetson.inference.detectNet(detect_network, threshold=threshold)
+        self.depth_net = jetson.inference.depthNet(depth_network)
+        self.depth_upsample = depth_upsample
+        self.depth_dtype = depth_dtype
+
+    def detect(self, rgb):
+        cuda_img = self.utils.cudaFromNumpy(rgb)
+        detections = self.detect_net.Detect(cuda_img, overlay='none')
+        return [detection_to_dict(detection) for detection in detections]
+
+    def depth(self, rgb):
+        cuda_img = self.utils.cudaFromNumpy(rgb)
+        # No output image: only the depth field is computed, no colormap
+        self.depth_net.Process(cuda_img)
+        field = self.depth_net.GetDepthField()
+        self.utils.cudaDeviceSynchronize()
+        # The field is mapped memory that the next Process call overwrites
+        raw = self.utils.cudaToNumpy(field).reshape(field.height, field.width)
+        if self.depth_upsample and raw.shape != rgb.shape[:2]:
+            return cv2.resize(raw, (rgb.shape[1], rgb.shape[0]), interpolation=cv2.INTER_LINEAR).astype(
+                self.depth_dtype, copy=False)
+        return raw.astype(self.depth_dtype, copy=True)
+
+
+class NumpyBackend:
+    """CPU stand-in for the Jetson networks, used in simulation mode and for tests.
+
+    Detections are either the fixed list passed in, or a single box covering
+    the centre of the frame. Depth is the normalized luminance of the image.
+    ``call_overhead`` adds a fixed delay to every detect/depth call (single
+    or batched), to model the per-launch cost of a GPU network in benchmarks.
+    """
+
+    def __init__(self, detections=None, class_id=1, confidence=0.9, call_overhead=0.0):
+        self.detections = detections
+        self.class_id = class_id
+        self.confidence = confidence
+        self.call_overhead = call_overhead
+
+    def detect(self, rgb):
+        if self.call_overhead:
+            time.sleep(self.call_overhead)
+        return self._detect(rgb)
+
+    def depth(self, rgb):
+        if self.call_overhead:
+            time.sleep(self.call_overhead)
+        return self._depth(rgb)
+
+    def detect_batch(self, rgbs):
+        if self.call_overhead:
+            time.sleep(self.call_overhead)
+        return [self._detect(rgb) for rgb in rgbs]
+
+    def depth_batch(self, rgbs):
+        if self.call_overhead:
+            time.sleep(self.call_overhead)
+        return [self._depth(rgb) for rgb in rgbs]
+
+    def _detect(self, rgb):
+        if self.detections is not None:
+            return [dict(detection) for detection in self.detections]
+        height, width = rgb.shape[:2]
+        left, top, right, bottom = width / 4, height / 4, width * 3 / 4, height * 3 / 4
+        return [{
+            'ClassID': self.class_id,
+            'Confidence': self.confidence,
+            'Left': left,
+            'Top': top,
+            'Right': right,
+            'Bottom': bottom,
+            'Width': right - left,
+            'Height': bottom - top,
+            'Area': (right - left) * (bottom - top),
+            'Center': ((left + right) / 2, (top + bottom) / 2)
+        }]
+
+    def _depth(self, rgb):
+        gray = pool.take(rgb.shape[:2])
+        try:
+            cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY, dst=gray)
+            return np.multiply(gray, np.float32(1 / 255.0), dtype=np.float32)
+        finally:
+            pool.give(gray)
+
+
+def _serve_channel(conn, backend, op):
+    frame = out = None
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        frame_desc, out_desc = message
+        if frame is None or frame.shm.name != frame_desc[0]:
+            if frame is not None:
+                frame.close()
+            frame = SharedArray.attach(frame_desc)
+        try:
+            if op == 'detect':
+                conn.send(('ok', backend.detect(frame.array)))
+            else:
+                if out is None or out.shm.name != out_desc[0]:
+                    if out is not None:
+                        out.close()
+                    out = SharedArray.attach(out_desc)
+                out.array[...] = backend.depth(frame.array)
+                conn.send(('ok', None))
+        except Exception as e:
+            conn.send(('error', repr(e)))
+    for shared in (frame, out):
+        if shared is not None:
+            shared.close()
+
+
+def _backend_worker(backend_factory, kwargs, detect_conn, depth_conn):
+    backend = backend_factory(**kwargs)
+    # One thread per model so detect and depth still overlap inside the worker
+    threads = [threading.Thread(target=_serve_channel, args=(detect_conn, backend, 'detect')),
+               threading.Thread(target=_serve_channel, args=(depth_conn, backend, 'depth'))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class _Channel:
+    """Parent side of one worker pipe, with reusable shared input/output buffers."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.frame = None
+        self.out = None
+
+    def _buffer(self, current, shape, dtype):
+        if current is not None and current.matches(shape, dtype):
+            return current
+        if current is not None:
+            current.close()
+        return SharedArray.create(shape, dtype)
+
+    def call(self, rgb, out_shape=None):
+        with self.lock:
+            self.frame = self._buffer(self.frame, rgb.shape, rgb.dtype)
+            self.frame.array[...] = rgb
+            out_desc = None
+            if out_shape is not None:
+                self.out = self._buffer(self.out, out_shape, np.float32)
+                out_desc = self.out.descriptor()
+            self.conn.send((self.frame.descriptor(), out_desc))
+            status, result = self.conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f"backend worker failed: {result}")
+            if out_shape is not None:
+                return self.out.array.copy()
+            return result
+
+    def close(self):
+        with self.lock:
+            self.conn.send(None)
+            for shared in (self.frame, self.out):
+                if shared is not None:
+                    shared.close()
+            self.frame = self.out = None
+
+
+class ProcessBackend:
+    """Runs another backend in a separate worker process.
+
+    ``backend_factory`` (e.g. ``JetsonBackend``) is called inside the worker,
+    so it must be picklable. Frames and depth maps are exchanged through
+    shared memory; only detections and buffer descriptors go over the pipe.
+    The shared depth buffer is float32 at input resolution, so the backend
+    must return upsampled depth.
+    """
+
+    def __init__(self, backend_factory, **kwargs):
+        context = multiprocessing.get_context('spawn')
+        detect_parent, detect_child = context.Pipe()
+        depth_parent, depth_child = context.Pipe()
+        self.process = context.Process(
+            target=_backend_worker, args=(backend_factory, kwargs, detect_child, depth_child), daemon=True)
+        self.process.start()
+        self.detect_channel = _Channel(detect_parent)
+        self.depth_channel = _Channel(depth_parent)
+
+    def detect(self, rgb):
+        return self.detect_channel.call(rgb)
+
+    def depth(self, rgb):
+        return self.depth_channel.call(rgb, out_shape=rgb.shape[:2])
+
+    def close(self):
+        self.detect_channel.close()
+        self.depth_channel.close()
+        self.process.join(timeout=5)
+
+
+def create_backend(name=None, **kwargs):
+    """Build a backend by name, falling back to the CPU stand-in if jetson.inference is missing."""
+    if name == 'numpy':
+        return NumpyBackend(**kwargs)
+    try:
+        return JetsonBackend(**kwargs)
+    except ImportError as e:
+        if name == 'jetson':
+            raise
+        print(f"Import error: {e}\nRunning in simulation mode.")
+        return NumpyBackend()
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class InferenceEngine:
+    """Holds the loaded models and runs detection + depth on one image.
+
+    Detection and depth are independent until fusion, so both are dispatched
+    on the same frame at once and the call takes roughly max(detect, depth)
+    instead of their sum. The networks are not safe to call from several
+    threads at once, so each model is guarded by its own lock.
+    """
+
+    def __init__(self, backend=None, timeout=None):
+        self.backend = backend if backend is not None else create_backend()
+        self.timeout = timeout
+        self.detect_lock = threading.Lock()
+        self.depth_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='engine')
+
+    def detect(self, rgb):
+        with self.detect_lock, metrics.timer('detect'):
+            return self.backend.detect(rgb)
+
+    def depth(self, rgb):
+        with self.depth_lock, metrics.timer('depth'):
+            return self.backend.depth(rgb)
+
+    def detect_batch(self, rgbs):
+        with self.detect_lock, metrics.timer('detect_batch'):
+            if hasattr(self.backend, 'detect_batch'):
+                return self.backend.detect_batch(rgbs)
+            return [self.backend.detect(rgb) for rgb in rgbs]
+
+    def depth_batch(self, rgbs):
+        with self.depth_lock, metrics.timer('depth_batch'):
+            if hasattr(self.backend, 'depth_batch'):
+                return self.backend.depth_batch(rgbs)
+            return [self.backend.depth(rgb) for rgb in rgbs]
+
+    def analyze_batch(self, images):
+        """Return a list of ``(detections, depth_array)``, running the whole batch through each model once."""
+        rgbs = [to_rgb_array(image) for image in images]
+        detect_future = self.executor.submit(self.detect_batch, rgbs)
+        depth_future = self.executor.submit(self.depth_batch, rgbs)
+        return list(zip(detect_future.result(), depth_future.result()))
+
+    def analyze_timed(self, image, timeout=None):
+        """Return ``(detections, depth_array, timings)`` for a PIL image or RGB array.
+
+        ``timings`` holds the seconds spent in the 'detect' and 'depth'
+        branches and the wall-clock 'total'. Raises TimeoutError if both
+        branches have not finished within ``timeout`` seconds.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        rgb = to_rgb_array(image)
+        detect_future = self.executor.submit(_timed, self.detect, rgb)
+        depth_future = self.executor.submit(_timed, self.depth, rgb)
+        try:
+            detections, detect_time = detect_future.result(timeout)
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            depth_array, depth_time = depth_future.result(remaining)
+        except FutureTimeoutError:
+            raise TimeoutError(f"detection/depth did not finish within {timeout:.3f}s")
+        timings = {
+            'detect': detect_time,
+            'depth': depth_time,
+            'total': time.perf_counter() - start,
+        }
+        return detections, depth_array, timings
+
+    def analyze(self, image, timeout=None):
+        """Return ``(detections, depth_array)`` for a PIL image or RGB array."""
+        detections, depth_array, _ = self.analyze_timed(image, timeout)
+        return detections, depth_array
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        if hasattr(self.backend, 'close'):
+            self.backend.close()
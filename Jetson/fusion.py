@@ -0,0 +1,142 @@
+"""Fuse detections with the depth map and draw the result, entirely in memory.
+
+Detections are the dicts produced by ``engine.detection_to_dict`` and the
+depth map is a float array (raw network depth, or luminance in [0, 1] in
+simulation mode). It may be smaller than the image, e.g. the network's
+output field; boxes are then scaled to it. Nothing here touches the disk;
+use ``DiskSink`` when the results should also be saved.
+"""
+import json
+import os
+import uuid
+
+import numpy as np
+import cv2
+
+from annotate import Annotator
+from depth_stats import box_depth_stats, boxes_from_detections, clip_boxes
+from metrics import metrics
+from preprocess import encode_jpeg
+
+
+# List of class names in order (replace with your own list if different)
+class_names = [
+    "unlabeled", "person", "bicycle", "car", "motorcycle", "airplane", "bus",
+    "train", "truck", "boat", "traffic light", "fire hydrant", "street sign",
+    "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse",
+    "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "hat", "backpack",
+    "umbrella", "shoe", "eye glasses", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove",
+    "skateboard", "surfboard", "tennis racket", "bottle", "plate", "wine glass",
+    "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich",
+    "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "mirror", "dining table", "window", "desk",
+    "toilet", "door", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "blender", "book",
+    "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush"
+]
+
+
+# Shared renderer; label patches are cached across frames
+annotator = Annotator(class_names)
+
+# Below this many boxes a slice mean per box beats building the integral images
+# of box_depth_stats (0.01 vs 0.5 ms at one box on 640x480; they meet around 25 boxes)
+batched_min_boxes = 24
+
+
+def _slice_means(depth_array, boxes):
+    """Mean of the finite depth pixels in each box, or None; one slice per box."""
+    clipped, inside = clip_boxes(boxes, *depth_array.shape[:2])
+    means = []
+    for (left, top, right, bottom), valid in zip(clipped, inside):
+        if not valid:
+            means.append(None)
+            continue
+        roi = depth_array[top:bottom, left:right]
+        mean = roi.mean()
+        if not np.isfinite(mean):
+            # Only pay for the mask when the box has missing depth
+            finite = roi[np.isfinite(roi)]
+            mean = finite.mean() if finite.size else None
+        means.append(None if mean is None else float(mean))
+    return means
+
+
+def add_mean_depth(detections, depth_array, image_shape=None):
+    """Store the mean depth inside each bounding box as detection['MeanDepth'].
+
+    ``image_shape`` is the shape of the image the boxes refer to, if the
+    depth map has a different resolution. Boxes with no depth pixels inside
+    the image get None.
+    """
+    with metrics.timer('fusion'):
+        if image_shape is not None and tuple(image_shape[:2]) != depth_array.shape[:2] and detections:
+            scale = np.array([depth_array.shape[1] / image_shape[1], depth_array.shape[0] / image_shape[0]] * 2)
+            scaled = np.array([[d['Left'], d['Top'], d['Right'], d['Bottom']] for d in detections]) * scale
+            # Outward rounding, at least one depth pixel: a small box must not vanish on a coarse field
+            boxes = np.concatenate([np.floor(scaled[:, :2]), np.ceil(scaled[:, 2:])], axis=1).astype(np.int64)
+            boxes[:, 2:] = np.maximum(boxes[:, 2:], boxes[:, :2] + 1)
+        else:
+            boxes = boxes_from_detections(detections)
+        if len(boxes) < batched_min_boxes:
+            means = _slice_means(depth_array, boxes)
+        else:
+            stats = box_depth_stats(depth_array, boxes, minmax=False)
+            means = [float(mean) if valid else None for mean, valid in zip(stats['mean'], stats['valid'])]
+        for detection, mean_depth in zip(detections, means):
+            detection['MeanDepth'] = mean_depth
+    return detections
+
+
+def draw_detections(image, detections):
+    """Draw boxes and 'class: depth' labels onto an RGB or BGR image in place."""
+    with metrics.timer('annotate'):
+        return annotator.draw(image, detections)
+
+
+def fuse(rgb_image, detections, depth_array):
+    """Return a new annotated RGB image with the mean depth of each detection."""
+    add_mean_depth(detections, depth_array, rgb_image.shape)
+    # Green boxes and black text look the same in RGB and BGR, so no conversion is needed
+    return draw_detections(rgb_image.copy(), detections)
+
+
+def depth_to_rgb(depth_array, size=None, colormap=cv2.COLORMAP_VIRIDIS):
+    """Colorized RGB view of a depth map, stretched to its finite min/max.
+
+    Only for display; ``size`` is an optional ``(width, height)``.
+    """
+    with metrics.timer('depth_view'):
+        finite = np.isfinite(depth_array)
+        low, high = (float(depth_array[finite].min()), float(depth_array[finite].max())) if finite.any() else (0.0, 1.0)
+        scale = 255.0 / (high - low) if high > low else 0.0
+        gray = cv2.convertScaleAbs(np.nan_to_num(depth_array.astype(np.float32), nan=low), alpha=scale, beta=-low * scale)
+        if size is not None and (gray.shape[1], gray.shape[0]) != tuple(size):
+            gray = cv2.resize(gray, tuple(size), interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(cv2.applyColorMap(gray, colormap), cv2.COLOR_BGR2RGB)
+
+
+class DiskSink:
+    """Optional sink that saves fused results to a directory.
+
+    Every call writes to its own file names, so concurrent requests do not
+    overwrite each other's output.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, annotated_rgb=None, detections=None, name=None):
+        name = name or str(uuid.uuid4())
+        paths = {}
+        if annotated_rgb is not None:
+            paths['image'] = os.path.join(self.directory, f"{name}.jpg")
+            with open(paths['image'], 'wb') as f:
+                f.write(encode_jpeg(annotated_rgb, quality=95))
+        if detections is not None:
+            paths['detections'] = os.path.join(self.directory, f"{name}.json")
+            with open(paths['detections'], 'w') as f:
+                json.dump({'detections': detections}, f, indent=4)
+        return paths
@@ -1,90 +1,143 @@
+# Imported first: the networks load and the camera opens in the background
+# while gradio is imported and the UI is built
+from startup import startup
+from metrics import metrics
+
+# Set to a directory to also save every annotated image and its detections to disk
+output_dir = None
+# Live video comes from the JetBot camera, or in simulation mode from
+# video_path if set, otherwise from synthetic frames
+video_path = None
+# Per-stage and per-handler timings at http://<host>:9102/metrics
+metrics_port = 9102
+# Requests that arrive while the networks are loading wait this long for them
+engine_wait = 120.0
+# Largest inference batch; the Still Image tab runs this many requests at once so
+# that concurrent uploads actually reach the batch server together
+batch_size = 8
+
+# Set by init_engine and init_live once ready
+engine = None
+result_cache = None
+live_cache = None
+batch_server = None
+live_analyzer = None
+
+def init_engine():
+    global engine, result_cache, live_cache, batch_server
+    import numpy as np
+    from engine import InferenceEngine
+    from result_cache import CachingEngine
+    from batch_server import BatchInferenceServer
+    # Load the networks once; every request reuses them in-process
+    networks = InferenceEngine()
+    # The first inference is the slow one (allocations, kernel selection), so
+    # it runs now on a blank frame rather than on the first upload
+    networks.analyze(np.zeros((224, 224, 3), dtype=np.uint8))
+    startup.mark('first_inference')
+    # Re-submitted images are answered from memory
+    result_cache = CachingEngine(networks, max_bytes=256 * 1024 * 1024, diff_threshold=0)
+    # Live frames never repeat exactly, so the live view only reuses depth while
+    # it barely changes and neither hashes its frames nor fills the upload cache
+    live_cache = CachingEngine(networks, max_bytes=0, diff_threshold=2.0)
+    # Concurrent uploads are grouped into small batches for the networks
+    # (JetsonBackend has no detect_batch/depth_batch, so on the Jetson a batch still runs its
+    # images one after another; batching then only saves the per-request queueing and wakeups)
+    batch_server = BatchInferenceServer(result_cache, max_batch_size=batch_size, max_wait=0.01)
+    engine = networks
+
+def init_source():
+    from live_stream import open_source
+    try:
+        from jetbot import Camera
+        camera = Camera.instance()
+    except ImportError as e:
+        print(f"Import error: {e}\nRunning in simulation mode.")
+        camera = None
+    source = open_source(camera, video_path)
+    source.read()
+    startup.mark('first_frame')
+    return source
+
+def init_live():
+    global live_analyzer
+    from live_stream import LiveAnalyzer
+    live_analyzer = LiveAnalyzer(live_cache, startup.get('source'))
+
+startup.start('engine', init_engine)
+startup.start('source', init_source)
+startup.start('live', init_live, after=('engine', 'source'))
+
 import gradio as gr
-import subprocess
-import json
-from PIL import Image
-import numpy as np
-import cv2
-
-
-# List of class names in order (replace with your own list if different)
-class_names = [
-    "unlabeled", "person", "bicycle", "car", "motorcycle", "airplane", "bus",
-    "train", "truck", "boat", "traffic light", "fire hydrant", "street sign",
-    "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse",
-    "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "hat", "backpack",
-    "umbrella", "shoe", "eye glasses", "handbag", "tie", "suitcase", "frisbee",
-    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove",
-    "skateboard", "surfboard", "tennis racket", "bottle", "plate", "wine glass",
-    "cup", "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich",
-    "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
-    "couch", "potted plant", "bed", "mirror", "dining table", "window", "desk",
-    "toilet", "door", "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
-    "microwave", "oven", "toaster", "sink", "refrigerator", "blender", "book",
-    "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush"
-]
-
-def process_image(input_image):
-    depth_image_path = 'depth_net_answer.jpg'
-    bounding_boxes_json_path = 'detect_net_answer.json'
-    output_image_path = 'detect_net_answer_with_depth.jpg'
-    
+
+from engine import to_rgb_array
+from fusion import fuse, depth_to_rgb, DiskSink
+
+disk_sink = DiskSink(output_dir) if output_dir else None
+
+metrics.serve(metrics_port)
+
+
+def wait_ready(name):
+    """Wait for a subsystem while it is starting; raises RuntimeError if it did not come up."""
+    startup.wait(name, engine_wait)
+    if not startup.ready(name):
+        raise RuntimeError(f"{name} is {startup.state(name)}:\n{startup.format_status()}")
+
+@metrics.timed()
+def process_image(input_image, show_depth=False):
     try:
-        # Save the input image locally
-        input_image_path = 'input_image.jpg'
-        input_image.save(input_image_path)
-
-        # Run DepthNet
-        depthnet_result = subprocess.run(
-            ['./depthnet.py', input_image_path, depth_image_path],
-            capture_output=True, text=True)
-        if depthnet_result.returncode != 0:
-            return f"depthnet.py error:\n{depthnet_result.stderr}"
-
-        # Run DetectNet
-        detectnet_result = subprocess.run(
-            ['./detectnet.py', input_image_path, bounding_boxes_json_path],
-            capture_output=True, text=True)
-        if detectnet_result.returncode != 0:
-            return f"detectnet.py error:\n{detectnet_result.stderr}"
-
-        # Convert depth image to a NumPy array
-        depth_image = Image.open(depth_image_path).convert('L')
-        depth_array = np.array(depth_image)
-
-        # Load the original image using OpenCV
-        original_image = cv2.imread(input_image_path)
-
-        # Read bounding box coordinates from the JSON file
-        with open(bounding_boxes_json_path, 'r') as f:
-            bounding_boxes_data = json.load(f)
-
-        # Draw bounding boxes and depth information
-        for detection in bounding_boxes_data['detections']:
-            left = int(detection['Left'])
-            top = int(detection['Top'])
-            right = int(detection['Right'])
-            bottom = int(detection['Bottom'])
-            class_id = detection['ClassID']
-
-            roi = depth_array[top:bottom, left:right]
-            mean_depth = np.mean(roi)
-            normalized_depth = mean_depth / 255.0
-            detection['MeanDepth'] = normalized_depth
-
-            cv2.rectangle(original_image, (left, top), (right, bottom), (0, 255, 0), 2)
-            label = f"{class_names[class_id]}: {normalized_depth:.2f}"
-            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-            label_top_left = (right - label_size[0] - 5, bottom - 5)
-            label_bottom_right = (right - 5, bottom - label_size[1] - 5)
-            cv2.rectangle(original_image, label_top_left, label_bottom_right, (0, 255, 0), cv2.FILLED)
-            cv2.putText(original_image, label, (right - label_size[0] - 3, bottom - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-
-        # Save the final annotated image
-        cv2.imwrite(output_image_path, original_image)
-
-        return output_image_path
+        # Run DetectNet and DepthNet on the uploaded image
+        rgb_image = to_rgb_array(input_image)
+        wait_ready('engine')
+        detections, depth_array = batch_server.analyze(rgb_image)
+
+        # Draw bounding boxes and depth information in memory
+        annotated_image = fuse(rgb_image, detections, depth_array)
+
+        if disk_sink:
+            disk_sink.write(annotated_image, detections)
+
+        # The colorized depth map is only rendered when asked for
+        depth_image = depth_to_rgb(depth_array, (rgb_image.shape[1], rgb_image.shape[0])) if show_depth else None
+        return annotated_image, depth_image
     except Exception as e:
-        return str(e)
+        raise gr.Error(str(e))
+
+
+def server_stats():
+    if not batch_server:
+        return startup.format_status()
+    stats = batch_server.stats()
+    lines = [
+        f"Queue depth: {stats['queue_depth']}",
+        f"Completed: {stats['completed']} (failed: {stats['failed']})",
+        f"Batch sizes: {stats['batch_sizes']}",
+    ]
+    if 'p50' in stats:
+        lines.append(f"Latency p50: {stats['p50'] * 1000:.1f} ms, p99: {stats['p99'] * 1000:.1f} ms")
+    cache = result_cache.stats()
+    lines.append(f"Result cache: {cache['exact_hits']} exact + {cache['near_hits']} near hits, "
+                 f"{cache['misses']} misses ({cache['hit_rate']:.0%}), "
+                 f"{cache['entries']} entries, {cache['bytes'] / 1e6:.1f} MB")
+    live = live_cache.stats()
+    lines.append(f"Live view: {live['near_hits']} near hits, {live['misses']} misses ({live['hit_rate']:.0%})")
+    lines.append("")
+    lines.append(startup.format_status())
+    lines.append("")
+    lines.append(metrics.format_summary())
+    return "\n".join(lines)
+
+
+def stream_live():
+    if not live_analyzer:
+        yield None, "Starting: " + ", ".join(f"{name} {startup.state(name)}" for name in ('engine', 'source', 'live'))
+        try:
+            wait_ready('live')
+        except RuntimeError as e:
+            raise gr.Error(str(e))
+    # Only the newest annotated frame is sent; frames the browser could not keep up with are dropped
+    yield from live_analyzer.frames()
 
 
 #
@@ -98,6 +151,7 @@ This application uses pre-trained models to analyze an input image. It identifie
 ### Features:
 1. **Object Detection:** Draws bounding boxes and labels around detected objects.
 2. **Depth Estimation:** Computes the mean depth of each detected object.
+3. **Depth Map:** Optionally shows the colorized depth map.
 
 **Instructions:**
 1. Upload an image to be analyzed.
@@ -108,12 +162,33 @@ This application uses pre-trained models to analyze an input image. It identifie
 # Create Gradio interface
 interface = gr.Interface(
     fn=process_image, 
-    inputs=gr.Image(type="pil"), 
-    outputs=gr.Image(type="pil"),
+    inputs=[gr.Image(type="pil"), gr.Checkbox(label="Show depth map")],
+    outputs=[gr.Image(type="pil", label="Detections"), gr.Image(label="Depth map")],
     title=title,
     description=description,
-    
+    # Gradio runs one call per event at a time by default, which would keep every batch at size 1
+    concurrency_limit=batch_size,
 )
 
+with gr.Blocks() as live_interface:
+    gr.Markdown("# Live Depth and Detection")
+    gr.Markdown("Runs detection and depth continuously on the JetBot camera (or a video/synthetic source in simulation mode).")
+    with gr.Row():
+        start_button = gr.Button("▶️ Start")
+        stop_button = gr.Button("⏹️ Stop")
+    live_output = gr.Image(label="Live Analysis")
+    live_status = gr.Textbox(label="Performance", value="Stopped.")
+    live_event = start_button.click(stream_live, outputs=[live_output, live_status])
+    stop_button.click(lambda: "Stopped.", outputs=live_status, cancels=[live_event])
+
+with gr.Blocks() as stats_interface:
+    gr.Markdown("# Inference Server")
+    gr.Markdown(f"Prometheus metrics: `http://<host>:{metrics_port}/metrics`")
+    stats_output = gr.Textbox(label="Batching Statistics and Stage Timings", lines=16, value=server_stats)
+    gr.Button("🔄 Refresh").click(server_stats, outputs=stats_output)
+
 # Launch Gradio app
-interface.launch()
+app = gr.TabbedInterface([interface, live_interface, stats_interface], ["Still Image", "Live Video", "Server Stats"])
+app.queue().launch(prevent_thread_lock=True)
+startup.mark('ui')
+app.block_thread()
@@ -0,0 +1,195 @@
+"""Live detection + depth on a video stream.
+
+A single background thread takes the newest frame from a source, runs the
+engine and fusion on it and keeps only the latest annotated result.
+Viewers read that result; anything they were too slow to see is dropped,
+so the UI never falls behind the camera.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import cv2
+
+from fusion import fuse
+from metrics import metrics
+
+
+class CameraSource:
+    """Frames from the JetBot camera (``camera.value`` is BGR)."""
+
+    def __init__(self, camera):
+        self.camera = camera
+
+    def read(self):
+        return cv2.cvtColor(self.camera.value, cv2.COLOR_BGR2RGB), time.perf_counter()
+
+
+class VideoFileSource:
+    """Frames from a video file, played back in real time and looped.
+
+    Frames the consumer is too slow for are skipped, like a live camera.
+    """
+
+    def __init__(self, path):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"could not open video {path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.start_time = time.perf_counter()
+        self.position = 0
+        # Decoded BGR frames are converted right away, so one buffer is reused
+        self.frame = None
+
+    def read(self):
+        wanted = int((time.perf_counter() - self.start_time) * self.fps)
+        # Skip the frames we fell behind on without decoding them
+        while self.position < wanted:
+            if not self.capture.grab():
+                break
+            self.position += 1
+        ok, frame = self.capture.read(self.frame)
+        if not ok:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.start_time = time.perf_counter()
+            self.position = 0
+            ok, frame = self.capture.read(self.frame)
+            if not ok:
+                raise IOError("video has no frames")
+        self.frame = frame
+        self.position += 1
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), time.perf_counter()
+
+
+class SyntheticSource:
+    """Moving gradient with a bright square, for simulation mode."""
+
+    def __init__(self, width=640, height=480, fps=30.0):
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps
+        self.last_time = 0.0
+        self.gradient = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+
+    def read(self):
+        # Pace like a camera would
+        delay = self.last_time + self.interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.perf_counter()
+        self.last_time = now
+        shift = int(now * 60) % self.width
+        gray = np.roll(self.gradient, shift, axis=1).astype(np.uint8)
+        frame = np.dstack([gray, gray[:, ::-1], np.full_like(gray, 96)])
+        size = min(self.width, self.height) // 4
+        x = int((np.sin(now) + 1) / 2 * (self.width - size))
+        y = (self.height - size) // 2
+        frame[y:y + size, x:x + size] = 255
+        return frame, now
+
+
+def open_source(camera=None, video_path=None, width=640, height=480):
+    """Pick the JetBot camera if there is one, else a video file, else synthetic frames."""
+    if camera is not None:
+        return CameraSource(camera)
+    if video_path:
+        return VideoFileSource(video_path)
+    return SyntheticSource(width, height)
+
+
+class LiveAnalyzer:
+    """Runs the engine on the newest frame of ``source`` in a background thread.
+
+    The thread starts with the first viewer and stops when the last one
+    leaves. Use ``frames()`` as a Gradio generator.
+    """
+
+    def __init__(self, engine, source, window=30):
+        self.engine = engine
+        self.source = source
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.latest = None
+        self.viewers = 0
+        # The analysis thread and its own stop event; a stopped thread keeps its event
+        # set, so a quick restart can never revive it next to its successor
+        self.thread = None
+        self.stopped = None
+        self.stopping = None
+        self.frame_times = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+
+    def _run(self, stopped, previous=None):
+        # A thread stopped just before may still be inside a slow inference; never run two
+        # loops on the source and engine, however long it takes to finish
+        if previous is not None:
+            previous.join()
+        while not stopped.is_set():
+            try:
+                with metrics.timer('capture'):
+                    frame, captured = self.source.read()
+                detections, depth_array = self.engine.analyze(frame)
+                annotated = fuse(frame, detections, depth_array)
+            except Exception as e:
+                print(f"Live analysis error: {e}")
+                stopped.wait(0.5)
+                continue
+            done = time.perf_counter()
+            with self.condition:
+                if stopped.is_set():
+                    break
+                self.frame_times.append(done)
+                self.latencies.append(done - captured)
+                self.sequence += 1
+                self.latest = (annotated, detections)
+                self.condition.notify_all()
+
+    def start(self):
+        with self.condition:
+            self.viewers += 1
+            if self.thread is not None:
+                return
+            stopped = self.stopped = threading.Event()
+            previous, self.stopping = self.stopping, None
+            thread = self.thread = threading.Thread(target=self._run, args=(stopped, previous), daemon=True)
+            thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.viewers = max(0, self.viewers - 1)
+            if self.viewers or self.thread is None:
+                return
+            self.stopped.set()
+            thread = self.stopping = self.thread
+            self.thread = None
+        if thread.is_alive():
+            thread.join(timeout=2)
+
+    def stats(self):
+        """Return (fps, mean latency in seconds) over the recent window."""
+        with self.condition:
+            times = list(self.frame_times)
+            latencies = list(self.latencies)
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+        latency = sum(latencies) / len(latencies) if latencies else 0.0
+        return fps, latency
+
+    def frames(self, timeout=2.0):
+        """Yield ``(annotated_image, status_text)`` for each new result, dropping stale ones."""
+        self.start()
+        seen = self.sequence
+        dropped = 0
+        try:
+            while True:
+                with self.condition:
+                    if not self.condition.wait_for(lambda: self.sequence > seen, timeout):
+                        continue
+                    dropped += self.sequence - seen - 1
+                    seen = self.sequence
+                    annotated, detections = self.latest
+                fps, latency = self.stats()
+                status = f"{fps:.1f} FPS | latency {latency * 1000:.0f} ms | {len(detections)} objects | {dropped} frames dropped"
+                yield annotated, status
+        finally:
+            self.stop()
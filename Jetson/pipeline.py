@@ -0,0 +1,560 @@
+"""Configurable capture -> inference -> output pipeline.
+
+A pipeline is a source followed by stages, each running on its own worker
+thread and connected by bounded queues, so capture, inference and
+rendering of consecutive frames overlap. An item is a dict that every
+stage reads from and adds to: ``frame_index``, ``captured``
+(``time.perf_counter()`` at capture), ``image``, and then for example
+``detections``, ``depth`` and ``annotated``.
+
+Two modes decide what happens when a stage falls behind:
+
+- ``latency``: a full queue drops its oldest item, so every stage works on
+  the freshest frame (live viewing). Queues up to a lossless stage (the
+  ``detections`` sink, see ``lossless_types``) block instead, so its
+  per-frame output and the tracker ahead of it never skip frames; only
+  the stages after it, e.g. ``render``, drop
+- ``throughput``: a full queue blocks the stage before it, so every
+  frame is processed (recording, offline runs)
+
+Pipelines are usually declared in config (see ``build_pipeline`` and the
+JSON files in ``pipelines/``); every ``type`` there is a factory from
+``stage_types``. Each stage keeps its own timing, see ``Pipeline.stats``.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+
+from metrics import metrics
+
+_END = object()
+# Stage types that must see every frame; in latency mode nothing is dropped ahead of them
+lossless_types = {'detections'}
+# Ready-made pipeline configs, usable by name in build_pipeline
+presets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipelines')
+
+
+class EndOfStream(Exception):
+    """Raised by a source or stage to end the pipeline after the items already in flight."""
+
+
+class Stage:
+    """One step: ``fn(item)`` returns the item to pass on, or None to drop it.
+
+    For the source, ``fn(None)`` returns a new item (None when no frame is
+    ready yet) and raises ``EndOfStream`` when the input is exhausted.
+    ``close`` is called once when the pipeline shuts down. A ``lossless``
+    stage gets every frame even in latency mode.
+    """
+
+    def __init__(self, name, fn, close=None, lossless=False):
+        self.name = name
+        self.fn = fn
+        self.close = close
+        self.lossless = lossless
+
+
+class _StageStats:
+    def __init__(self, durations):
+        self.count = 0
+        self.dropped = 0
+        self.errors = 0
+        self.durations = durations
+        # dropped is counted by the thread feeding the stage, the rest by the stage's own
+        self.lock = threading.Lock()
+        # perf_counter of the first item passed on
+        self.first = None
+
+    def summary(self, started=None):
+        with self.lock:
+            summary = {'count': self.count, 'dropped': self.dropped, 'errors': self.errors}
+        if self.first is not None and started is not None:
+            summary['first_ms'] = round((self.first - started) * 1000, 3)
+        durations = self.durations.snapshot()
+        if durations['count']:
+            for key in ('mean', 'p50', 'p99'):
+                summary[f'{key}_ms'] = round(durations[key] * 1000, 3)
+        return summary
+
+
+class Pipeline:
+    """Runs ``source`` and ``stages`` on one thread each.
+
+    ``queue_size`` bounds every queue between two stages; ``history`` is how
+    many recent frames the end-to-end FPS and latency cover. Stage timings
+    go to the shared ``metrics`` registry (family ``pipeline``).
+    """
+
+    modes = ('latency', 'throughput')
+
+    def __init__(self, source, stages, mode='latency', queue_size=2, history=300):
+        if mode not in self.modes:
+            raise ValueError(f"unknown mode {mode!r}, expected one of {self.modes}")
+        self.source = source
+        self.stages = list(stages)
+        self.mode = mode
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        # Queues up to and including the one into the last lossless stage never drop
+        self.lossless_until = max((i for i, stage in enumerate(self.stages) if stage.lossless), default=-1)
+        self.stage_stats = [_StageStats(metrics.histogram(stage.name, family='pipeline')) for stage in [source] + self.stages]
+        self.latencies = deque(maxlen=history)
+        self.finish_times = deque(maxlen=history)
+        self.running = False
+        self.threads = []
+        self.started = None
+        self.build_seconds = None
+
+    def start(self):
+        self.running = True
+        self.started = time.perf_counter()
+        self.threads = [threading.Thread(target=self._run_source, daemon=True)]
+        self.threads += [threading.Thread(target=self._run_stage, args=(i,), daemon=True) for i in range(len(self.stages))]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop now; items still queued are discarded."""
+        self.running = False
+
+    def wait(self, timeout=None):
+        """Wait until the source is exhausted and every stage has finished; returns True if so."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self.threads)
+
+    def run(self):
+        """Run (starting it if needed) until end of stream or Ctrl-C; returns ``stats()``."""
+        if not self.threads:
+            self.start()
+        try:
+            while not self.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+            self.wait(5.0)
+        return self.stats()
+
+    def stats(self):
+        """Per-stage counts and timings, plus end-to-end FPS and latency.
+
+        ``first_ms`` is when a stage passed on its first item, counted from
+        ``start``; ``build_ms`` is how long ``build_pipeline`` took (opening
+        sources, loading networks).
+        """
+        stats = {'mode': self.mode, 'stages': {}}
+        if self.build_seconds is not None:
+            stats['build_ms'] = round(self.build_seconds * 1000, 3)
+        for stage, stage_stats in zip([self.source] + self.stages, self.stage_stats):
+            stats['stages'][stage.name] = stage_stats.summary(self.started)
+        times = list(self.finish_times)
+        if len(times) > 1 and times[-1] > times[0]:
+            stats['fps'] = round((len(times) - 1) / (times[-1] - times[0]), 2)
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1000
+            stats['latency_p50_ms'] = round(float(np.percentile(latencies, 50)), 3)
+            stats['latency_p99_ms'] = round(float(np.percentile(latencies, 99)), 3)
+        return stats
+
+    def _put(self, index, item):
+        """Hand ``item`` to stage ``index``; returns False once the pipeline is stopped."""
+        if index == len(self.stages):
+            if item is not _END:
+                done = time.perf_counter()
+                self.finish_times.append(done)
+                self.latencies.append(done - item['captured'])
+            return True
+        target = self.queues[index]
+        if self.mode == 'latency' and index > self.lossless_until and item is not _END:
+            while True:
+                try:
+                    target.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        target.get_nowait()
+                        stats = self.stage_stats[index + 1]
+                        with stats.lock:
+                            stats.dropped += 1
+                    except queue.Empty:
+                        pass
+        while self.running:
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _call(self, stats, stage, item):
+        start = time.perf_counter()
+        try:
+            return stage.fn(item)
+        except EndOfStream:
+            raise
+        except Exception as e:
+            stats.errors += 1
+            print(f"Pipeline stage {stage.name} failed: {e}")
+            return None
+        finally:
+            stats.durations.observe(time.perf_counter() - start)
+
+    def _run_source(self):
+        stats = self.stage_stats[0]
+        frame_index = 0
+        try:
+            while self.running:
+                try:
+                    item = self._call(stats, self.source, None)
+                except EndOfStream:
+                    break
+                if item is None:
+                    continue
+                item.setdefault('frame_index', frame_index)
+                item.setdefault('captured', time.perf_counter())
+                frame_index += 1
+                stats.count += 1
+                if stats.first is None:
+                    stats.first = time.perf_counter()
+                if not self._put(0, item):
+                    break
+        finally:
+            self._put(0, _END)
+            if self.source.close is not None:
+                self.source.close()
+
+    def _run_stage(self, index):
+        stage = self.stages[index]
+        stats = self.stage_stats[index + 1]
+        source = self.queues[index]
+        try:
+            while self.running:
+                try:
+                    item = source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    break
+                try:
+                    item = self._call(stats, stage, item)
+                except EndOfStream:
+                    self.running = False
+                    break
+                if item is None:
+                    continue
+                stats.count += 1
+                if stats.first is None:
+                    stats.first = time.perf_counter()
+                if not self._put(index + 1, item):
+                    break
+        finally:
+            self._put(index + 1, _END)
+            if stage.close is not None:
+                stage.close()
+
+
+stage_types = {}
+
+
+def stage_type(name):
+    """Register a stage factory under ``name`` for use in pipeline configs."""
+    def register(factory):
+        stage_types[name] = factory
+        return factory
+    return register
+
+
+def build_stage(config):
+    """Build one stage from ``{"type": ..., "name": ..., **params}``."""
+    params = dict(config)
+    kind = params.pop('type')
+    name = params.pop('name', kind)
+    if kind not in stage_types:
+        raise ValueError(f"unknown stage type {kind!r}, expected one of {sorted(stage_types)}")
+    fn, close = stage_types[kind](**params)
+    return Stage(name, fn, close, lossless=kind in lossless_types)
+
+
+def load_config(config):
+    """Read a JSON config from a path, or from ``pipelines/<name>.json`` for a preset name."""
+    path = config if os.path.exists(config) else os.path.join(presets_dir, f"{config}.json")
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_pipeline(config, **overrides):
+    """Build a Pipeline from a config dict, a JSON config path or a preset name.
+
+    ``overrides`` update parameters of stages by name, e.g.
+    ``build_pipeline(config, detect={'threshold': 0.3})``.
+
+    Stages are built concurrently (opening a camera and loading networks
+    don't depend on each other), unless the config sets
+    ``"parallel_build": false``.
+    """
+    start = time.perf_counter()
+    if isinstance(config, str):
+        config = load_config(config)
+    configs = []
+    for stage_config in [config['source']] + config['stages']:
+        stage_config = dict(stage_config)
+        stage_config.update(overrides.get(stage_config.get('name', stage_config['type']), {}))
+        configs.append(stage_config)
+    if config.get('parallel_build', True):
+        with ThreadPoolExecutor(max_workers=len(configs), thread_name_prefix='build') as pool:
+            futures = [pool.submit(build_stage, stage_config) for stage_config in configs]
+        built, errors = [], []
+        for future in futures:
+            try:
+                built.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            # Release whatever did open before reporting the first failure
+            for stage in built:
+                if stage.close is not None:
+                    stage.close()
+            raise errors[0]
+    else:
+        built = [build_stage(stage_config) for stage_config in configs]
+    pipeline = Pipeline(built[0], built[1:], mode=config.get('mode', 'latency'), queue_size=config.get('queue_size', 2))
+    pipeline.build_seconds = time.perf_counter() - start
+    return pipeline
+
+
+# Sources
+
+@stage_type('jetson_source')
+def _jetson_source(uri='', argv=None):
+    """CUDA images from ``jetson.utils.videoSource`` (camera, file or network stream)."""
+    import jetson.utils
+    source = jetson.utils.videoSource(uri, argv=argv or [])
+
+    def read(_):
+        image = source.Capture()
+        if image is None:
+            if not source.IsStreaming():
+                raise EndOfStream()
+            return None
+        return {'image': image}
+    return read, source.Close
+
+
+@stage_type('image')
+def _image_source(path, repeat=1):
+    """An RGB image file, produced ``repeat`` times."""
+    rgb = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+    remaining = [repeat]
+
+    def read(_):
+        if remaining[0] <= 0:
+            raise EndOfStream()
+        remaining[0] -= 1
+        return {'image': rgb}
+    return read, None
+
+
+@stage_type('video')
+def _video_source(path):
+    """RGB frames of a video file, played back in real time and looped."""
+    from live_stream import VideoFileSource
+    source = VideoFileSource(path)
+
+    def read(_):
+        rgb, captured = source.read()
+        return {'image': rgb, 'captured': captured}
+    return read, source.capture.release
+
+
+@stage_type('synthetic')
+def _synthetic_source(width=640, height=480, fps=30.0, frames=None):
+    """Moving synthetic RGB frames, for simulation and benchmarks."""
+    from live_stream import SyntheticSource
+    source = SyntheticSource(width, height, fps)
+    produced = [0]
+
+    def read(_):
+        if frames is not None and produced[0] >= frames:
+            raise EndOfStream()
+        produced[0] += 1
+        rgb, captured = source.read()
+        return {'image': rgb, 'captured': captured}
+    return read, None
+
+
+# Models
+
+@stage_type('detectnet')
+def _detectnet_stage(network='ssd-mobilenet-v2', threshold=0.5, overlay='box,labels,conf', every=1, argv=None):
+    """jetson.inference detectNet on CUDA images, drawing its overlay in place.
+
+    With ``every`` > 1 the network only runs on every Nth frame; the others
+    get ``detections = None`` for a following ``track`` stage to fill in.
+    """
+    import jetson.inference
+    from engine import detection_to_dict
+    net = jetson.inference.detectNet(network, argv or [], threshold)
+
+    def detect(item):
+        if item['frame_index'] % every == 0:
+            item['detections'] = [detection_to_dict(d) for d in net.Detect(item['image'], overlay=overlay)]
+        else:
+            item['detections'] = None
+        item['status'] = f"{network} | Network {net.GetNetworkFPS():.0f} FPS"
+        return item
+    return detect, None
+
+
+@stage_type('analyze')
+def _analyze_stage(backend=None, timeout=None, cache_mb=0, diff_threshold=2.0, depth_upsample=None):
+    """Detection and depth at the same time through the InferenceEngine (RGB arrays).
+
+    With ``cache_mb`` > 0, results are reused for repeated frames and depth
+    for nearly unchanged ones (see result_cache.py). ``depth_upsample=false``
+    keeps the Jetson depth field at network resolution.
+    """
+    from engine import InferenceEngine, create_backend, to_rgb_array
+    options = {} if depth_upsample is None else {'depth_upsample': depth_upsample}
+    engine = InferenceEngine(create_backend(backend, **options), timeout=timeout)
+    if cache_mb:
+        from result_cache import CachingEngine
+        engine = CachingEngine(engine, max_bytes=int(cache_mb * 1024 * 1024), diff_threshold=diff_threshold)
+
+    def analyze(item):
+        item['image'] = to_rgb_array(item['image'])
+        item['detections'], item['depth'], item['timings'] = engine.analyze_timed(item['image'])
+        return item
+    return analyze, engine.close
+
+
+# Processing
+
+@stage_type('track')
+def _track_stage(iou_threshold=0.3, max_age=5, min_hits=1, depth_smoothing=0.6):
+    """Stable track IDs; predicts boxes for frames without detections and smooths depth."""
+    from fusion import add_mean_depth
+    from tracker import Tracker
+    tracker = Tracker(iou_threshold, max_age, min_hits, depth_smoothing)
+
+    def track(item):
+        detections = item.get('detections')
+        tracks = tracker.predict() if detections is None else tracker.update(detections)
+        if item.get('depth') is not None:
+            tracker.smooth_depth(add_mean_depth(tracks, item['depth'], getattr(item['image'], 'shape', None)))
+        item['detections'] = tracks
+        return item
+    return track, None
+
+
+@stage_type('fuse')
+def _fuse_stage():
+    """Mean depth inside each box as detection['MeanDepth']."""
+    from fusion import add_mean_depth
+
+    def fuse(item):
+        add_mean_depth(item['detections'], item['depth'], getattr(item['image'], 'shape', None))
+        return item
+    return fuse, None
+
+
+@stage_type('annotate')
+def _annotate_stage():
+    """Boxes and labels on a copy of an RGB image (``annotated``).
+
+    CUDA images already carry the detectNet overlay; only boxes the tracker
+    predicted on skipped frames are drawn onto them.
+    """
+    from fusion import draw_detections
+
+    def annotate(item):
+        image = item['image']
+        if isinstance(image, np.ndarray):
+            item['annotated'] = draw_detections(image.copy(), item['detections'])
+            return item
+        import jetson.utils
+        for detection in item['detections']:
+            if detection.get('Tracked'):
+                box = (detection['Left'], detection['Top'], detection['Right'], detection['Bottom'])
+                jetson.utils.cudaDrawRect(image, box, (0, 255, 0, 80))
+        item['annotated'] = image
+        return item
+    return annotate, None
+
+
+@stage_type('depth_view')
+def _depth_view_stage(colormap='viridis'):
+    """Colorized depth map at image resolution (``depth_image``), for sinks that show depth."""
+    from fusion import depth_to_rgb
+    code = getattr(cv2, f"COLORMAP_{colormap.upper()}")
+
+    def view(item):
+        height, width = item['image'].shape[:2]
+        item['depth_image'] = depth_to_rgb(item['depth'], (width, height), code)
+        return item
+    return view, None
+
+
+# Sinks
+
+@stage_type('render')
+def _render_stage(uri='', argv=None):
+    """Show or stream frames with ``jetson.utils.videoOutput``; ends the pipeline when it closes."""
+    import jetson.utils
+    output = jetson.utils.videoOutput(uri, argv=argv or [])
+
+    def render(item):
+        output.Render(item.get('annotated', item['image']))
+        if 'status' in item:
+            output.SetStatus(item['status'])
+        if not output.IsStreaming():
+            raise EndOfStream()
+        return item
+    return render, output.Close
+
+
+@stage_type('detections')
+def _detections_sink(output='-', format='ndjson'):
+    """Per-frame detections streamed through a DetectionStream."""
+    from detection_sink import DetectionStream
+    stream = DetectionStream(output, format=format)
+
+    def write(item):
+        stream.write(item['frame_index'], item['detections'])
+        return item
+    return write, stream.close
+
+
+@stage_type('json')
+def _json_sink(path):
+    """Detections of each frame as an indented JSON file; ``path`` may contain ``{frame}``."""
+
+    def write(item):
+        with open(path.format(frame=item['frame_index']), 'w') as f:
+            json.dump({'detections': item['detections']}, f, indent=4)
+        return item
+    return write, None
+
+
+@stage_type('image_file')
+def _image_file_sink(path, key='annotated'):
+    """An RGB image of the item (default the annotated one) as a file; ``path`` may contain ``{frame}``."""
+
+    from preprocess import pool, rgb_to_bgr
+
+    def write(item):
+        image = item.get(key, item['image'])
+        bgr = pool.take(image.shape)
+        try:
+            cv2.imwrite(path.format(frame=item['frame_index']), rgb_to_bgr(image, bgr))
+        finally:
+            pool.give(bgr)
+        return item
+    return write, None
@@ -0,0 +1 @@
+../preprocess.py
\ No newline at end of file
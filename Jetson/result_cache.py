@@ -0,0 +1,227 @@
+"""Reuse of detection and depth results for repeated or nearly identical frames.
+
+``CachingEngine`` wraps an ``InferenceEngine`` and has the same
+``analyze``/``analyze_timed``/``analyze_batch`` interface. Every frame is
+first reduced to a 32x32 grayscale thumbnail (~0.3 ms for 720p):
+
+- exact hits: earlier results are kept in an LRU bounded by ``max_bytes``
+  and indexed by the thumbnail. Only when the thumbnail matches is the
+  whole frame hashed (SHA-256) to confirm it is the same image, so
+  re-submitting an image costs a hash instead of two network runs. On a
+  miss the hash for the new entry is computed while the networks run.
+- near hits: if the thumbnail differs from the one of the last inferred
+  frame by less than ``diff_threshold`` (mean absolute difference in gray
+  levels), the last depth map is reused and only detection runs. A
+  stationary robot barely changes its depth map, while objects can still
+  move through the view. With ``reuse_detections`` the detections are
+  reused as well.
+
+With ``max_bytes=0`` there is no exact-hit cache: nothing is hashed or
+stored, and only near hits are looked for. That suits a live camera,
+whose frames never repeat exactly.
+
+Hits and misses are counted in ``stats()`` and as ``metrics`` counters.
+Cached depth arrays are shared between callers and marked read-only;
+detections are returned as fresh dicts every time, since fusion adds
+``MeanDepth`` to them.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+
+from engine import to_rgb_array
+from metrics import metrics
+
+
+def frame_digest(rgb):
+    digest = hashlib.sha256(np.ascontiguousarray(rgb).data)
+    digest.update(repr((rgb.shape, rgb.dtype.str)).encode())
+    return digest.digest()
+
+
+def thumbnail(rgb, size=32):
+    """``size`` x ``size`` uint8 grayscale summary of the frame."""
+    # Subsample first; averaging ~128x128 pixels still smooths out sensor noise
+    step = max(1, min(rgb.shape[:2]) // (4 * size))
+    small = cv2.resize(rgb[::step, ::step], (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+
+
+def _copy_detections(detections):
+    return [dict(detection) for detection in detections]
+
+
+class CachingEngine:
+    """Result cache in front of ``engine``; see the module docstring for the two kinds of hits."""
+
+    def __init__(self, engine, max_bytes=256 * 1024 * 1024, diff_threshold=2.0, thumbnail_size=32,
+                 reuse_detections=False):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.diff_threshold = diff_threshold
+        self.thumbnail_size = thumbnail_size
+        self.reuse_detections = reuse_detections
+        # thumbnail key -> (frame digest, detections, depth array, size in bytes)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.last = None
+        self.lock = threading.Lock()
+        # hashlib releases the GIL, so hashing overlaps with inference
+        self.hasher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-hash')
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, rgb):
+        thumb = thumbnail(rgb, self.thumbnail_size)
+        key = hashlib.blake2b(thumb.data, digest_size=16)
+        key.update(repr(rgb.shape).encode())
+        return thumb, key.digest()
+
+    def analyze_timed(self, image, timeout=None):
+        """Like ``InferenceEngine.analyze_timed``; ``timings['cache']`` is 'hit', 'near' or 'miss'."""
+        start = time.perf_counter()
+        rgb = to_rgb_array(image)
+        with metrics.timer('cache_lookup'):
+            if self.max_bytes > 0:
+                thumb, key = self._key(rgb)
+                cached = self._get(key, rgb)
+            else:
+                thumb, key, cached = thumbnail(rgb, self.thumbnail_size), None, None
+        if cached is not None:
+            detections, depth_array = cached
+            return _copy_detections(detections), depth_array, {
+                'detect': 0.0, 'depth': 0.0, 'total': time.perf_counter() - start, 'cache': 'hit'}
+
+        last = self._near(thumb, rgb.shape)
+        if last is not None:
+            last_detections, last_depth = last
+            detect_start = time.perf_counter()
+            detections = last_detections if self.reuse_detections else self.engine.detect(rgb)
+            detect_time = time.perf_counter() - detect_start
+            with self.lock:
+                self.near_hits += 1
+            metrics.inc('cache_near_hits')
+            # Not stored: a noisy near-duplicate is unlikely to repeat exactly
+            return _copy_detections(detections), last_depth, {
+                'detect': detect_time, 'depth': 0.0, 'total': time.perf_counter() - start, 'cache': 'near'}
+
+        digest = self.hasher.submit(frame_digest, rgb) if key is not None else None
+        detections, depth_array, timings = self.engine.analyze_timed(rgb, timeout)
+        depth_array.flags.writeable = False
+        with self.lock:
+            self.misses += 1
+            if self.diff_threshold > 0:
+                self.last = (thumb.astype(np.float32), rgb.shape, detections, depth_array)
+        metrics.inc('cache_misses')
+        if digest is not None:
+            self._put(key, digest.result(), detections, depth_array)
+        timings['cache'] = 'miss'
+        timings['total'] = time.perf_counter() - start
+        return _copy_detections(detections), depth_array, timings
+
+    def analyze(self, image, timeout=None):
+        detections, depth_array, _ = self.analyze_timed(image, timeout)
+        return detections, depth_array
+
+    def analyze_batch(self, images):
+        """Exact hits are answered from the cache; the misses go through the engine as one batch.
+
+        Uploads in a batch are unrelated images, so there are no near hits here.
+        """
+        rgbs = [to_rgb_array(image) for image in images]
+        if self.max_bytes <= 0:
+            computed = self.engine.analyze_batch(rgbs)
+            with self.lock:
+                self.misses += len(rgbs)
+            metrics.inc('cache_misses', len(rgbs))
+            return [(_copy_detections(detections), depth_array) for detections, depth_array in computed]
+        keys = [self._key(rgb)[1] for rgb in rgbs]
+        results = [self._get(key, rgb) for key, rgb in zip(keys, rgbs)]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            digests = [self.hasher.submit(frame_digest, rgbs[i]) for i in missing]
+            computed = self.engine.analyze_batch([rgbs[i] for i in missing])
+            with self.lock:
+                self.misses += len(missing)
+            metrics.inc('cache_misses', len(missing))
+            for i, digest, (detections, depth_array) in zip(missing, digests, computed):
+                depth_array.flags.writeable = False
+                self._put(keys[i], digest.result(), detections, depth_array)
+                results[i] = (detections, depth_array)
+        return [(_copy_detections(detections), depth_array) for detections, depth_array in results]
+
+    def detect(self, rgb):
+        return self.engine.detect(rgb)
+
+    def depth(self, rgb):
+        return self.engine.depth(rgb)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.exact_hits + self.near_hits + self.misses
+            return {
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'evictions': self.evictions,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.last = None
+
+    def close(self):
+        self.clear()
+        self.hasher.shutdown(wait=False)
+        self.engine.close()
+
+    def _get(self, key, rgb):
+        with self.lock:
+            entry = self.entries.get(key)
+        # Same thumbnail; the full hash decides whether it is the same image
+        if entry is None or entry[0] != frame_digest(rgb):
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.exact_hits += 1
+        metrics.inc('cache_exact_hits')
+        return entry[1], entry[2]
+
+    def _near(self, thumb, shape):
+        if self.diff_threshold <= 0:
+            return None
+        with self.lock:
+            last = self.last
+        if last is None or last[1] != shape:
+            return None
+        if float(np.mean(np.abs(thumb - last[0]))) >= self.diff_threshold:
+            return None
+        return last[2], last[3]
+
+    def _put(self, key, digest, detections, depth_array):
+        size = depth_array.nbytes + 256 * (len(detections) + 1)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[3]
+            self.entries[key] = (digest, detections, depth_array, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, _, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Run a pipeline declared in a JSON config (see pipeline.py and pipelines/)."""
+
+import argparse
+import json
+import sys
+import threading
+
+from metrics import metrics
+from pipeline import build_pipeline, load_config
+
+
+def parse_override(text):
+    """'stage.param=value' -> (stage, param, value); value is parsed as JSON when possible."""
+    key, _, value = text.partition('=')
+    stage, _, param = key.partition('.')
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return stage, param, value
+
+
+parser = argparse.ArgumentParser(description="Run a capture -> inference -> output pipeline from a config file.")
+parser.add_argument("config", type=str, help="config file, or the name of a preset in pipelines/ (e.g. detectnet)")
+parser.add_argument("--mode", type=str, choices=["latency", "throughput"], help="drop (latency) or block (throughput) on full queues")
+parser.add_argument("--queue-size", type=int, help="items each queue between two stages can hold")
+parser.add_argument("--set", type=str, action='append', default=[], metavar="STAGE.PARAM=VALUE",
+                    help="override a stage parameter, e.g. --set detect.threshold=0.3")
+parser.add_argument("--stats-interval", type=float, default=0.0, help="print stage timings every N seconds (0 = only at the end)")
+parser.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus-style metrics on this port (0 = off)")
+opt = parser.parse_args()
+
+config = load_config(opt.config)
+if opt.mode:
+    config['mode'] = opt.mode
+if opt.queue_size:
+    config['queue_size'] = opt.queue_size
+
+overrides = {}
+for text in opt.set:
+    stage, param, value = parse_override(text)
+    overrides.setdefault(stage, {})[param] = value
+
+pipeline = build_pipeline(config, **overrides)
+if opt.metrics_port:
+    metrics.serve(opt.metrics_port)
+
+# Stats go to stderr so they never mix with detections streamed to stdout
+if opt.stats_interval > 0:
+    def report():
+        while not pipeline.wait(opt.stats_interval):
+            print(json.dumps(pipeline.stats()), file=sys.stderr)
+    pipeline.start()
+    threading.Thread(target=report, daemon=True).start()
+
+print(json.dumps(pipeline.run()), file=sys.stderr)
@@ -0,0 +1,47 @@
+"""NumPy arrays backed by shared memory, for handing frames between processes.
+
+Only a small descriptor (block name, shape, dtype) crosses the pipe; the
+pixels themselves are written once into the shared block and read in place
+by the other process. Workers must be started from the process that
+creates the blocks (as ``engine.ProcessBackend`` does) so that they share
+its resource tracker and only the creator unlinks them.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray:
+    """A NumPy array whose data lives in a ``multiprocessing.shared_memory`` block."""
+
+    def __init__(self, shm, shape, dtype, owner):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = owner
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, dtype):
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        return cls(shm, shape, dtype, owner=True)
+
+    @classmethod
+    def attach(cls, descriptor):
+        name, shape, dtype = descriptor
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, shape, dtype, owner=False)
+
+    def matches(self, shape, dtype):
+        return self.shape == tuple(shape) and self.dtype == np.dtype(dtype)
+
+    def descriptor(self):
+        return (self.shm.name, self.shape, self.dtype.str)
+
+    def close(self):
+        # Drop the view before closing, or the mmap refuses to close
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1 @@
+../startup.py
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""SORT-style multi-object tracker for detection dicts.
+
+Each track is a constant-velocity Kalman filter over the box centre and
+size, ``[cx, cy, w, h, vx, vy, vw, vh]``. All tracks are predicted and
+updated together as stacked NumPy arrays. Detections are matched to tracks
+by IoU (Hungarian assignment when SciPy is installed, greedy otherwise),
+so every object keeps a stable ``TrackID`` and its depth can be smoothed
+over time.
+
+Between detector runs ``predict`` carries the boxes forward, so the
+detector only has to run every Nth frame (see ``TrackedDetector``).
+"""
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of (N, 4) and (M, 4) arrays of (left, top, right, bottom)."""
+    left = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    top = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    right = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    bottom = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def match(iou, threshold):
+    """Return (track, detection) index pairs with IoU >= threshold."""
+    if iou.size == 0:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou)
+        pairs = zip(rows, cols)
+    else:
+        # Greedy: best remaining pair first
+        order = np.argsort(-iou, axis=None)
+        used_rows, used_cols, pairs = set(), set(), []
+        for flat in order:
+            row, col = divmod(int(flat), iou.shape[1])
+            if iou[row, col] < threshold:
+                break
+            if row not in used_rows and col not in used_cols:
+                used_rows.add(row)
+                used_cols.add(col)
+                pairs.append((row, col))
+    return [(int(row), int(col)) for row, col in pairs if iou[row, col] >= threshold]
+
+
+def _to_state(boxes):
+    width = boxes[:, 2] - boxes[:, 0]
+    height = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + width / 2, boxes[:, 1] + height / 2, width, height], axis=1)
+
+
+def _to_boxes(state):
+    half_w = np.maximum(state[:, 2], 1.0) / 2
+    half_h = np.maximum(state[:, 3], 1.0) / 2
+    return np.stack([state[:, 0] - half_w, state[:, 1] - half_h, state[:, 0] + half_w, state[:, 1] + half_h], axis=1)
+
+
+class Tracker:
+    """Keeps track IDs for detections across frames.
+
+    - ``iou_threshold``: minimum IoU between a predicted track and a detection
+    - ``max_age``: frames a track survives without a matching detection
+    - ``min_hits``: detections needed before a track is reported
+    - ``depth_smoothing``: weight of the previous depth in the EMA (0 = none)
+    - ``class_aware``: only match detections of the same class
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=5, min_hits=1, depth_smoothing=0.6, class_aware=True):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.depth_smoothing = depth_smoothing
+        self.class_aware = class_aware
+        self.next_id = 1
+
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.5, 0.5, 0.25, 0.25])
+        self.R = np.diag([4.0, 4.0, 10.0, 10.0])
+
+        self.x = np.zeros((0, 8))
+        self.P = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.class_ids = np.zeros(0, dtype=np.int64)
+        self.confidences = np.zeros(0)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+        self.depths = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predict(self):
+        """Advance every track by one frame and return the current tracks."""
+        self._predict()
+        self._prune()
+        return self.tracks()
+
+    def update(self, detections):
+        """Advance one frame and correct the tracks with this frame's detections."""
+        self._predict()
+        boxes = np.array([[d['Left'], d['Top'], d['Right'], d['Bottom']] for d in detections], dtype=np.float64).reshape(-1, 4)
+        classes = np.array([d['ClassID'] for d in detections], dtype=np.int64)
+
+        iou = iou_matrix(_to_boxes(self.x), boxes)
+        if self.class_aware and iou.size:
+            iou = np.where(self.class_ids[:, None] == classes[None, :], iou, 0.0)
+        pairs = match(iou, self.iou_threshold)
+
+        if pairs:
+            tracks = np.array([t for t, _ in pairs])
+            found = np.array([d for _, d in pairs])
+            self._correct(tracks, _to_state(boxes[found]))
+            self.confidences[tracks] = [detections[d].get('Confidence', 1.0) for d in found]
+            self.hits[tracks] += 1
+            self.misses[tracks] = 0
+
+        matched = {d for _, d in pairs}
+        new = [d for d in range(len(detections)) if d not in matched]
+        if new:
+            self._add(boxes[new], classes[new], [detections[d].get('Confidence', 1.0) for d in new])
+
+        self._prune()
+        return self.tracks()
+
+    def tracks(self):
+        """Current tracks as detection dicts with 'TrackID' and 'Tracked' (True if not detected this frame)."""
+        boxes = _to_boxes(self.x)
+        results = []
+        for i in np.flatnonzero(self.hits >= self.min_hits):
+            left, top, right, bottom = (float(v) for v in boxes[i])
+            track_id = int(self.ids[i])
+            results.append({
+                'TrackID': track_id,
+                'ClassID': int(self.class_ids[i]),
+                'Confidence': float(self.confidences[i]),
+                'Left': left,
+                'Top': top,
+                'Right': right,
+                'Bottom': bottom,
+                'Width': right - left,
+                'Height': bottom - top,
+                'Area': (right - left) * (bottom - top),
+                'Center': ((left + right) / 2, (top + bottom) / 2),
+                'Tracked': bool(self.misses[i] > 0),
+                'MeanDepth': self.depths.get(track_id),
+            })
+        return results
+
+    def smooth_depth(self, tracks):
+        """Replace each track's 'MeanDepth' with an exponential moving average over frames."""
+        for track in tracks:
+            depth = track.get('MeanDepth')
+            if depth is None:
+                continue
+            previous = self.depths.get(track['TrackID'])
+            if previous is not None:
+                depth = self.depth_smoothing * previous + (1 - self.depth_smoothing) * depth
+            self.depths[track['TrackID']] = depth
+            track['MeanDepth'] = depth
+        return tracks
+
+    def _predict(self):
+        if not len(self.ids):
+            return
+        self.x = self.x @ self.F.T
+        self.P = np.einsum('ij,tjk,lk->til', self.F, self.P, self.F) + self.Q
+        self.misses += 1
+
+    def _correct(self, tracks, measurements):
+        P = self.P[tracks]
+        S = P[:, :4, :4] + self.R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        innovation = measurements - self.x[tracks, :4]
+        self.x[tracks] += np.einsum('tij,tj->ti', K, innovation)
+        self.P[tracks] = P - K @ P[:, :4, :]
+
+    def _add(self, boxes, classes, confidences):
+        count = len(boxes)
+        x = np.zeros((count, 8))
+        x[:, :4] = _to_state(boxes)
+        P = np.tile(np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0, 1000.0]), (count, 1, 1))
+        self.x = np.concatenate([self.x, x])
+        self.P = np.concatenate([self.P, P])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count)])
+        self.next_id += count
+        self.class_ids = np.concatenate([self.class_ids, classes])
+        self.confidences = np.concatenate([self.confidences, confidences])
+        self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+        self.misses = np.concatenate([self.misses, np.zeros(count, dtype=np.int64)])
+
+    def _prune(self):
+        keep = self.misses <= self.max_age
+        if keep.all():
+            return
+        for track_id in self.ids[~keep]:
+            self.depths.pop(int(track_id), None)
+        self.x, self.P = self.x[keep], self.P[keep]
+        self.ids, self.class_ids = self.ids[keep], self.class_ids[keep]
+        self.confidences, self.hits, self.misses = self.confidences[keep], self.hits[keep], self.misses[keep]
+
+
+class TrackedDetector:
+    """Runs ``detect(frame)`` only every ``detect_every`` frames; the tracker fills in the rest."""
+
+    def __init__(self, detect, tracker=None, detect_every=1):
+        self.detect = detect
+        self.tracker = tracker if tracker is not None else Tracker(max_age=max(5, 2 * detect_every))
+        self.detect_every = detect_every
+        self.frame_index = 0
+        self.detector_runs = 0
+
+    def __call__(self, frame):
+        if self.frame_index % self.detect_every == 0:
+            tracks = self.tracker.update(self.detect(frame))
+            self.detector_runs += 1
+        else:
+            tracks = self.tracker.predict()
+        self.frame_index += 1
+        return tracks
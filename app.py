@@ -1,83 +1,189 @@
+# Imported first: robot, camera and depth network start in the background
+# while gradio is imported and the UI is built
+from startup import startup
+from motor_control import MotorExecutor, MotorControlLoop
+from metrics import metrics
+
+# Placeholder image path or URL
+placeholder_image_path = 'images.png'
+# Port of the MJPEG video endpoint (http://<jetbot>:8081/stream.mjpg)
+video_port = 8081
+# Burst snapshots: number of frames and frames per second
+burst_count = 10
+burst_rate = 5.0
+# Port of the Prometheus-style metrics endpoint (http://<jetbot>:9101/metrics)
+metrics_port = 9101
+
+# Set by the init functions once their hardware is up; handlers check robot/camera
+# first and do nothing (or show the placeholder) until then, as in simulation mode
+robot = None
+camera = None
+frames = None
+video_server = None
+motors = None
+speed_loop = None
+snapshot_writer = None
+guard = None
+
+def init_robot():
+    global robot, guard, motors, speed_loop
+    from jetbot import Robot
+    from collision_guard import CollisionGuard
+    jetbot = Robot()
+    # Forward motion is slowed or vetoed when the depth network sees an obstacle
+    # ahead, and stays vetoed until the network has loaded (see init_guard)
+    guard = CollisionGuard(jetbot, stop_distance=0.5, slow_distance=1.0)
+    # Timed motions run in the background so button handlers return immediately
+    motors = MotorExecutor(guard)
+    # Slider speeds are coalesced and written to the motors at a fixed rate
+    speed_loop = MotorControlLoop(guard, rate=50)
+    # Published last: handlers only touch the motors once robot is set
+    robot = jetbot
+
+def init_camera():
+    global camera, frames, video_server, snapshot_writer
+    from jetbot import Camera
+    from frame_buffer import FrameRing
+    from video_stream import MJPEGServer
+    from snapshots import SnapshotWriter
+    jetbot_camera = Camera.instance()
+    # Each camera frame is converted once here and shared by every consumer
+    frames = FrameRing.from_camera(jetbot_camera)
+    # Low-latency MJPEG feed: each frame is encoded once and shared by all viewers
+    video_server = MJPEGServer(frames, port=video_port).start()
+    # Snapshots copy the frame instantly; encoding and disk writes run in the background
+    snapshot_writer = SnapshotWriter(frames, 'snapshots', max_files=500)
+    camera = jetbot_camera
+    startup.mark('first_frame')
+
+def init_guard():
+    global guard
+    try:
+        startup.wait('camera')
+        if not startup.ready('camera'):
+            raise RuntimeError("needs camera")
+        from collision_guard import jetson_depth
+        depth_fn = jetson_depth()
+        # The first map also warms the network up
+        frame = frames.latest()
+        guard.update(depth_fn(frame.rgb), frame.timestamp)
+    except BaseException:
+        # No camera or no depth network: the motors are driven directly, as without
+        # the guard, instead of leaving forward motion vetoed for the whole session
+        motors.robot = speed_loop.robot = robot
+        guard.close()
+        guard = None
+        raise
+    startup.mark('first_inference')
+    guard.follow(frames, depth_fn)
+
+startup.start('robot', init_robot)
+startup.start('camera', init_camera)
+startup.start('guard', init_guard, after=('robot',))
+
 import gradio as gr
-import time
 import os
-import uuid
 from PIL import Image
-import numpy as np
-import cv2
 
-# Placeholder image path or URL
-placeholder_image_path = 'images.png'
-try:
-    from jetbot import Robot, Camera, bgr8_to_jpeg
-    robot = Robot()
-    camera = Camera.instance()
-except ImportError as e:
-    print(f"Import error: {e}\nRunning in simulation mode.")
-    robot = None
-    camera = None
+# Handler and camera timings, readable at any time without touching the control loop
+metrics.serve(metrics_port)
 
+@metrics.timed()
 def move_forward():
     if robot:
-        robot.forward(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('forward', 0.3, 1.0)
 
+@metrics.timed()
 def move_backward():
     if robot:
-        robot.backward(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('backward', 0.3, 1.0)
 
+@metrics.timed()
 def turn_left():
     if robot:
-        robot.left(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('left', 0.3, 1.0)
 
+@metrics.timed()
 def turn_right():
     if robot:
-        robot.right(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('right', 0.3, 1.0)
 
+@metrics.timed()
 def stop():
     if robot:
-        robot.stop()
+        # Cancels any queued or running motion immediately
+        motors.stop()
+        speed_loop.reset()
 
+@metrics.timed()
 def set_speed_left(speed):
     if robot:
-        robot.left_motor.value = speed
+        speed_loop.set_targets(left=speed)
 
+@metrics.timed()
 def set_speed_right(speed):
     if robot:
-        robot.right_motor.value = speed
+        speed_loop.set_targets(right=speed)
+
+# Load the placeholder image as a PIL Image once
+with open(placeholder_image_path, 'rb') as f:
+    placeholder_image = Image.open(f)
+    placeholder_image.load()  # This might be necessary depending on how PIL handles lazy loading
 
+@metrics.timed()
 def update_camera():
     if camera:
-        # Assuming the camera.value is a numpy array in BGR format
-        # Convert from BGR to RGB
-        rgb_image = cv2.cvtColor(camera.value, cv2.COLOR_BGR2RGB)
-        # Convert numpy array to PIL Image
-        pil_image = Image.fromarray(rgb_image)
-        return pil_image
+        # Latest frame, already converted to RGB and wrapped as a PIL Image once per camera tick
+        return frames.latest().image()
     else:
-        # Load the placeholder image as a PIL Image
-        with open(placeholder_image_path, 'rb') as f:
-            pil_image = Image.open(f)
-            pil_image.load()  # This might be necessary depending on how PIL handles lazy loading
-        return pil_image
+        return placeholder_image
 
 
+@metrics.timed()
 def save_snapshot():
     if camera:
-        image_path = f"snapshots/{uuid.uuid4()}.jpeg"
-        with open(image_path, 'wb') as f:
-            f.write(update_camera())
-        return image_path
+        # Show the captured pixels right away; the JPEG is written by the snapshot workers
+        return snapshot_writer.capture().rgb
     else:
         return placeholder_image_path
 
+@metrics.timed()
+def take_burst():
+    if camera:
+        snapshot_writer.burst(burst_count, burst_rate)
+        return f"Capturing {burst_count} frames at {burst_rate:g} per second into snapshots/."
+    else:
+        return "No camera in simulation mode."
+
+@metrics.timed()
+def video_link():
+    if startup.state('camera') == 'starting':
+        return "Low-latency MJPEG feed: waiting for the camera."
+    if not video_server:
+        return ""
+    return f"For a lower-latency feed open `http://<jetbot-address>:{video_port}/stream.mjpg` (add `?quality=60&width=320` to reduce bandwidth)."
+
+def guard_status():
+    if startup.state('guard') == 'starting':
+        return "Collision guard: loading the depth network (forward motion is blocked until then)."
+    if not guard:
+        error = startup.report()['subsystems'].get('guard', {}).get('error')
+        return f"Collision guard off ({error}): forward motion is not guarded." if robot and error else "Collision guard disabled."
+    stats = guard.stats()
+    return (f"Forward speed limit {stats['scale']:.0%}, clearance {stats['clearance']:.2f}, "
+            f"{stats['vetoes']} vetoes, reflex p99 {stats['reflex']['p99'] * 1000:.2f} ms")
+
+@metrics.timed()
+def calibrate_guard():
+    if not guard:
+        return "Collision guard disabled."
+    try:
+        # The current view becomes the free-floor reference
+        guard.calibrate()
+    except RuntimeError as e:
+        return str(e)
+    return guard_status()
+
 # Ensure snapshot directory exists
 os.makedirs('snapshots', exist_ok=True)
 
@@ -102,11 +208,27 @@ with gr.Blocks() as demo:
     with gr.Row():
         live_feed = gr.Image(streaming=True,value=update_camera)
         snapshot_result = gr.Image(width=300, height=300, label="Last Snapshot")
-    snapshot_button = gr.Button("📸 Take Snapshot", elem_id="snapshot_button").click(save_snapshot, outputs=snapshot_result)
+    with gr.Row():
+        snapshot_button = gr.Button("📸 Take Snapshot", elem_id="snapshot_button").click(save_snapshot, outputs=snapshot_result)
+        burst_button = gr.Button(f"🎞️ Burst ({burst_count} frames)", elem_id="burst_button")
+        burst_status = gr.Textbox(label="Burst Status", value="")
+    burst_button.click(take_burst, outputs=burst_status)
+    with gr.Row():
+        calibrate_button = gr.Button("🧭 Calibrate Collision Guard (clear floor ahead)", elem_id="calibrate_button")
+        guard_output = gr.Textbox(label="Collision Guard", value=guard_status)
+    calibrate_button.click(calibrate_guard, outputs=guard_output)
+    startup_output = gr.Textbox(label="Startup", value=startup.format_status, every=2.0, lines=4)
+    # Re-checked while the page is open: the camera (and its MJPEG server) usually comes up after the layout is built
+    gr.Markdown(value=video_link, every=2.0)
+    gr.Markdown(f"Handler and camera timings: `http://<jetbot-address>:{metrics_port}/metrics`.")
         
     gr.Markdown("### Instructions")
     gr.Markdown("1. **Move the Sliders**: Adjust the sliders to change the speed of the left and right motors.")
     gr.Markdown("2. **Press the Buttons**: Use the directional buttons to move the JetBot. Press 'Stop' to halt any movement.")
     gr.Markdown("3. **Camera and Snapshot**: View the live feed and take snapshots using the button.")
+    gr.Markdown("4. **Collision Guard**: Forward motion slows down and stops in front of obstacles. With a clear floor ahead, press 'Calibrate' so the floor itself is not taken for an obstacle.")
+    gr.Markdown("5. **Startup**: The page is usable while the camera, motors and depth network are still starting; their state is shown in 'Startup'.")
 
-demo.launch()
+demo.launch(prevent_thread_lock=True)
+startup.mark('ui')
+demo.block_thread()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Benchmark: collision reflex latency with synthetic depth maps and a SimulatedRobot.
+
+- ``grid``: cost of reducing one depth map to the obstacle grid, per size
+- ``reflex``: the robot drives forward through a MotorControlLoop; depth
+  maps arrive at ``--fps``, with an obstacle that approaches and crosses
+  ``stop_distance``. Measured from the arrival of the map that shows the
+  obstacle to the motor write that stops the robot, over ``--trials`` runs.
+- ``stale``: depth stops arriving; time from the last map to the
+  watchdog's stop (bounded by ``max_age`` plus one watchdog period)
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from collision_guard import CollisionGuard, obstacle_grid
+from motor_control import MotorControlLoop
+from simulation import SimulatedRobot
+
+
+def depth_map(width, height, obstacle=None, rng=None):
+    """Floor getting farther towards the horizon, plus an optional box at distance ``obstacle``."""
+    rows = np.linspace(4.0, 0.6, height, dtype=np.float32)[:, None]
+    depth = np.repeat(rows, width, axis=1)
+    if rng is not None:
+        depth += rng.normal(0, 0.02, depth.shape).astype(np.float32)
+    if obstacle is not None:
+        depth[height // 3:height * 5 // 6, width * 2 // 5:width * 3 // 5] = obstacle
+    return depth
+
+
+def stop_time(robot, after):
+    """perf_counter of the first write after ``after`` that leaves both motors at 0."""
+    left = right = None
+    for t, name, value in list(robot.calls):
+        if name == 'left_motor':
+            left = value
+        else:
+            right = value
+        if t >= after and left == 0 and right == 0:
+            return t
+    return None
+
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return {'p50_ms': round(float(np.percentile(values, 50)), 4), 'p99_ms': round(float(np.percentile(values, 99)), 4),
+            'max_ms': round(float(values.max()), 4)}
+
+
+parser = argparse.ArgumentParser(description="Measure the depth collision reflex.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["224x224", "640x480", "1280x720"], help="depth map sizes WxH")
+parser.add_argument("--fps", type=float, default=30.0, help="depth maps per second in the reflex run")
+parser.add_argument("--trials", type=int, default=100, help="obstacle approaches in the reflex run")
+parser.add_argument("--budget", type=float, default=0.005, help="reflex budget in seconds")
+opt = parser.parse_args()
+
+rng = np.random.default_rng(0)
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    depth = depth_map(width, height, 0.4, rng)
+    times = []
+    for _ in range(200):
+        t = time.perf_counter()
+        obstacle_grid(depth)
+        times.append(time.perf_counter() - t)
+    print(json.dumps({'case': 'grid', 'size': size, **percentiles(times)}))
+
+# Reflex: the floor alone never vetoes once calibrated; the obstacle does
+width, height = 224, 224
+free = depth_map(width, height)
+robot = SimulatedRobot(history=100000)
+guard = CollisionGuard(robot, stop_distance=0.5, slow_distance=1.0, budget=opt.budget)
+guard.calibrate(free)
+loop = MotorControlLoop(guard, rate=50)
+latencies, missed = [], 0
+for trial in range(opt.trials):
+    guard.update(free)
+    loop.set_targets(0.3, 0.3)
+    time.sleep(0.03)
+    for distance in (2.0, 1.5, 1.0, 0.8, 0.45):
+        time.sleep(1.0 / opt.fps)
+        depth = depth_map(width, height, distance, rng)
+        arrival = time.perf_counter()
+        guard.update(depth, time.time())
+    stopped = stop_time(robot, arrival)
+    if stopped is None:
+        missed += 1
+    else:
+        latencies.append(stopped - arrival)
+    loop.set_targets(0.0, 0.0)
+print(json.dumps({'case': 'reflex', 'size': f"{width}x{height}", 'trials': opt.trials, 'missed': missed,
+                  'over_budget': sum(latency > opt.budget for latency in latencies), **percentiles(latencies)}))
+
+# Stale depth: feed maps, then stop feeding while driving forward
+stale = []
+for trial in range(20):
+    guard.update(free)
+    loop.set_targets(0.3, 0.3)
+    time.sleep(0.05)
+    guard.update(free)
+    last = time.perf_counter()
+    deadline = last + 2 * guard.max_age
+    stopped = None
+    while stopped is None and time.perf_counter() < deadline:
+        time.sleep(0.005)
+        stopped = stop_time(robot, last)
+    if stopped is not None:
+        stale.append(stopped - last)
+    loop.set_targets(0.0, 0.0)
+print(json.dumps({'case': 'stale', 'max_age_ms': guard.max_age * 1000, 'stops': len(stale), **percentiles(stale)}))
+loop.close()
+guard.close()
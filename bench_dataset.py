@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Benchmark: dataset recording at camera rate and random-access batch reads.
+
+A simulated camera feeds a FrameRing while a SimulatedRobot changes its
+motor values; the recorder follows the ring for a few seconds. The
+script then reads random training batches back through ``Dataset``.
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from dataset_recorder import Dataset, DatasetRecorder
+from frame_buffer import FrameRing
+from simulation import SimulatedCamera, SimulatedRobot
+
+
+parser = argparse.ArgumentParser(description="Measure dataset recording and random-access reads.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["224x224", "640x480"], help="frame sizes WxH")
+parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+parser.add_argument("--rate", type=float, default=30.0, help="recording rate (samples per second)")
+parser.add_argument("--duration", type=float, default=3.0, help="seconds of recording per size")
+parser.add_argument("--batch", type=int, default=32, help="training batch size")
+parser.add_argument("--chunk-size", type=int, default=256, help="frames per shard")
+opt = parser.parse_args()
+
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    directory = tempfile.mkdtemp(prefix='dataset-')
+    camera = SimulatedCamera(width, height, opt.fps)
+    frames = FrameRing.from_camera(camera)
+    robot = SimulatedRobot()
+    camera.start()
+
+    recorder = DatasetRecorder(directory, frames.latest().rgb.shape, chunk_size=opt.chunk_size)
+    recorder.follow(frames, robot, rate=opt.rate)
+    start = time.perf_counter()
+    while time.perf_counter() - start < opt.duration:
+        robot.set_motors(np.sin(time.perf_counter()), np.cos(time.perf_counter()))
+        time.sleep(0.02)
+    recorder.close()
+    camera.stop()
+
+    dataset = Dataset(directory)
+    rng = np.random.default_rng(0)
+    reads = []
+    for _ in range(50):
+        indices = rng.integers(0, len(dataset), opt.batch)
+        t = time.perf_counter()
+        dataset.batch(indices)
+        reads.append(time.perf_counter() - t)
+    reads = np.array(reads) * 1000
+    print(json.dumps({
+        'size': size,
+        'recorded': recorder.recorded,
+        'dropped': recorder.dropped,
+        'recorded_fps': round(recorder.recorded / opt.duration, 1),
+        'shards': len(dataset.index['shards']),
+        'batch_p50_ms': round(float(np.percentile(reads, 50)), 3),
+        'batch_p99_ms': round(float(np.percentile(reads, 99)), 3),
+        'samples_per_s': round(opt.batch / float(np.median(reads)) * 1000, 1),
+    }))
+    shutil.rmtree(directory)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Benchmark: one FleetServer with growing numbers of local stand-in agents.
+
+Per fleet size, after every agent is online:
+
+- ``command``: round trip of a 'set_motors' command (send to ack) to
+  random robots, while all of them stream telemetry and thumbnails
+- ``stop_all``: time until every robot acknowledged a broadcast stop
+- received telemetry and thumbnails per robot per second, bytes per
+  second into the server, and the share of wall time the server's
+  single I/O thread was busy
+
+Agents run in this process, so everything shares the CPU with them; on
+real robots the server only pays for its own thread.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+from fleet import FleetServer, StandInAgent
+
+
+def percentiles(values):
+    values = np.array(values) * 1000
+    return {'p50_ms': round(float(np.percentile(values, 50)), 3), 'p99_ms': round(float(np.percentile(values, 99)), 3),
+            'max_ms': round(float(values.max()), 3)}
+
+
+parser = argparse.ArgumentParser(description="Measure the fleet server with stand-in robots.")
+parser.add_argument("--robots", type=int, nargs='+', default=[4, 12, 24, 48], help="fleet sizes")
+parser.add_argument("--seconds", type=float, default=5.0, help="measured streaming time per fleet size")
+parser.add_argument("--commands", type=int, default=200, help="timed commands per fleet size")
+parser.add_argument("--fps", type=float, default=10.0, help="stand-in camera frame rate")
+parser.add_argument("--thumbnail-rate", type=float, default=2.0, help="thumbnails per robot per second")
+opt = parser.parse_args()
+
+random.seed(0)
+for count in opt.robots:
+    server = FleetServer(host='127.0.0.1', port=0).start()
+    start = time.perf_counter()
+    agents = [StandInAgent(f"bot{i:02d}", ('127.0.0.1', server.port), fps=opt.fps,
+                           thumbnail_rate=opt.thumbnail_rate).start() for i in range(count)]
+    while len(server.robot_ids(online=True)) < count and time.perf_counter() - start < 30:
+        time.sleep(0.01)
+    connected = time.perf_counter() - start
+
+    before = server.stats()
+    before_time = time.perf_counter()
+    # Commands are sent while the fleet streams; spread them over the measured period
+    latencies, lost = [], 0
+    interval = opt.seconds / opt.commands
+    for _ in range(opt.commands):
+        robot_id = f"bot{random.randrange(count):02d}"
+        t = time.perf_counter()
+        ack = server.send(robot_id, 'set_motors', 0.2, 0.2, wait=2.0)
+        if ack is None:
+            lost += 1
+        else:
+            latencies.append(time.perf_counter() - t)
+        time.sleep(max(0.0, interval - (time.perf_counter() - t)))
+    elapsed = time.perf_counter() - before_time
+    after = server.stats()
+
+    t = time.perf_counter()
+    acks = server.broadcast('stop', wait=5.0)
+    stop_all = time.perf_counter() - t
+    stopped = sum(1 for ack in acks.values() if ack and ack['ok'])
+
+    messages = {name: after['messages'][name] - before['messages'][name] for name in after['messages']}
+    print(json.dumps({
+        'robots': count,
+        'connect_s': round(connected, 3),
+        'command': {**percentiles(latencies), 'lost': lost},
+        'stop_all_ms': round(stop_all * 1000, 2),
+        'stopped': stopped,
+        'telemetry_per_robot_s': round(messages['telemetry'] / count / elapsed, 2),
+        'thumbnails_per_robot_s': round(messages['thumbnail'] / count / elapsed, 2),
+        'server_kb_in_s': round((after['bytes_in'] - before['bytes_in']) / 1024 / elapsed, 1),
+        'server_busy': round((after['busy_seconds'] - before['busy_seconds']) / elapsed, 4),
+        'server_threads': 1,
+        'process_threads': threading.active_count(),
+    }))
+    for agent in agents:
+        agent.close()
+    server.stop()
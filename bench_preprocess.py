@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark: per-frame preprocessing with fresh allocations vs pooled, fused buffers.
+
+Two workloads per frame size:
+
+- ``model_input``: BGR camera frame -> 224x224 normalized float32 model
+  input. The baseline is the usual chain (cvtColor, resize, astype, divide,
+  subtract mean, divide by std, transpose); ``Preprocessor`` writes into
+  one preallocated output.
+- ``jpeg``: RGB frame -> 640 px wide JPEG, as the MJPEG stream and the
+  snapshot writer do. The baseline allocates the scaled and BGR copies
+  every frame; ``encode_jpeg`` takes them from the pool.
+
+Reported per case: p50/p99 time, the allocation peak per frame
+(``tracemalloc``, numpy buffers included) and the pool's allocation and
+reuse counts.
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+
+from preprocess import BufferPool, Preprocessor, encode_jpeg, pool
+
+MEAN = np.array((0.485, 0.456, 0.406), dtype=np.float32)
+STD = np.array((0.229, 0.224, 0.225), dtype=np.float32)
+
+
+def naive_model_input(bgr, layout):
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    resized = cv2.resize(rgb, (224, 224), interpolation=cv2.INTER_LINEAR)
+    tensor = (resized.astype(np.float32) / 255.0 - MEAN) / STD
+    return np.ascontiguousarray(tensor.transpose(2, 0, 1)) if layout == 'chw' else tensor
+
+
+def naive_jpeg(rgb, quality, width):
+    if width and width < rgb.shape[1]:
+        height = max(1, round(rgb.shape[0] * width / rgb.shape[1]))
+        rgb = cv2.resize(rgb, (width, height), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded
+
+
+def measure(fn, frames, repeat):
+    for frame in frames[:3]:
+        fn(frame)
+    times = []
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn(frames[i % len(frames)])
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = np.array(times) * 1000
+    return {'p50_ms': round(float(np.percentile(times, 50)), 3), 'p99_ms': round(float(np.percentile(times, 99)), 3),
+            'peak_kb_per_frame': round(peak / 1024, 1)}
+
+
+parser = argparse.ArgumentParser(description="Measure pooled, fused image preprocessing.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["640x480", "1280x720", "1920x1080"], help="frame sizes WxH")
+parser.add_argument("--repeat", type=int, default=300, help="timed frames per case")
+parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+parser.add_argument("--width", type=int, default=640, help="JPEG width")
+opt = parser.parse_args()
+
+rng = np.random.default_rng(0)
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+    for layout in ('chw', 'hwc'):
+        buffers = BufferPool()
+        preprocessor = Preprocessor(layout=layout, buffers=buffers)
+        out = np.empty(preprocessor.shape, dtype=np.float32)
+        before = measure(lambda bgr: naive_model_input(bgr, layout), frames, opt.repeat)
+        after = measure(lambda bgr: preprocessor(bgr, out), frames, opt.repeat)
+        print(json.dumps({'case': 'model_input', 'size': size, 'layout': layout, 'before': before, 'after': after,
+                          'speedup': round(before['p50_ms'] / after['p50_ms'], 2), 'pool': buffers.stats()}))
+    start = pool.stats()
+    before = measure(lambda rgb: naive_jpeg(rgb, opt.quality, opt.width), frames, opt.repeat)
+    after = measure(lambda rgb: encode_jpeg(rgb, opt.quality, opt.width), frames, opt.repeat)
+    stats = pool.stats()
+    print(json.dumps({'case': 'jpeg', 'size': size, 'width': opt.width, 'before': before, 'after': after,
+                      'speedup': round(before['p50_ms'] / after['p50_ms'], 2),
+                      'pool': {'allocations': stats['allocations'] - start['allocations'],
+                               'reuses': stats['reuses'] - start['reuses']}}))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark: start-up of a control panel, eager vs background initialization.
+
+Each run is a fresh Python process that starts like app.py, with stand-ins
+for the hardware:
+
+- ``eager``: the previous order. Import the UI and its dependencies, open the
+  robot, open the camera, load the depth network and run it once, then
+  build the UI.
+- ``background``: the current order. Robot, camera and network start on
+  ``startup`` threads before the UI imports, and the UI is built meanwhile.
+
+Reported medians are seconds since process start (interpreter start-up
+included) until ``ui`` (the page can be served), ``first_frame`` and
+``first_inference``. Imports are real (gradio when installed, otherwise
+the PIL/numpy/cv2 modules the panels load). Opening the robot, the camera
+and the network are modeled by ``--robot``/``--camera``/``--network``
+seconds of waiting. The defaults are rough Jetson Nano figures (motor HAT,
+CSI camera pipeline, TensorRT engine load), which spend that time in
+drivers and native code rather than in Python.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def import_ui():
+    """The panel's UI imports; returns the module names actually imported."""
+    imported = []
+    for name in ('gradio', 'PIL.Image', 'numpy', 'cv2', 'command_journal', 'dataset_recorder'):
+        try:
+            __import__(name)
+            imported.append(name)
+        except ImportError:
+            pass
+    return imported
+
+
+def child(opt):
+    from startup import startup
+    startup.verbose = False
+
+    def open_robot():
+        from simulation import SimulatedRobot
+        time.sleep(opt.robot)
+        return SimulatedRobot()
+
+    def open_camera():
+        from simulation import SimulatedCamera
+        from frame_buffer import FrameRing
+        time.sleep(opt.camera)
+        frames = FrameRing.from_camera(SimulatedCamera(224, 224).start())
+        startup.mark('first_frame')
+        return frames
+
+    def load_network():
+        import numpy as np
+        from collision_guard import obstacle_grid
+        time.sleep(opt.network)
+        frames = startup.get('camera')
+        obstacle_grid(frames.latest().rgb[..., 0].astype(np.float32))
+        startup.mark('first_inference')
+
+    if opt.child == 'eager':
+        imported = import_ui()
+        startup.start('robot', open_robot)
+        startup.wait('robot')
+        startup.start('camera', open_camera)
+        startup.wait('camera')
+        startup.start('network', load_network)
+        startup.wait('network')
+        startup.mark('ui')
+    else:
+        startup.start('robot', open_robot)
+        startup.start('camera', open_camera)
+        startup.start('network', load_network, after=('robot', 'camera'))
+        imported = import_ui()
+        startup.mark('ui')
+        for name in ('robot', 'camera', 'network'):
+            startup.wait(name)
+    report = startup.report()
+    report['imported'] = imported
+    print(json.dumps(report))
+
+
+parser = argparse.ArgumentParser(description="Measure panel start-up with eager and background initialization.")
+parser.add_argument("--runs", type=int, default=5, help="processes per mode")
+parser.add_argument("--robot", type=float, default=0.5, help="seconds to open the robot")
+parser.add_argument("--camera", type=float, default=3.0, help="seconds until the camera delivers frames")
+parser.add_argument("--network", type=float, default=6.0, help="seconds to load the depth network")
+parser.add_argument("--child", choices=['eager', 'background'], help=argparse.SUPPRESS)
+opt = parser.parse_args()
+
+if opt.child:
+    child(opt)
+    sys.exit(0)
+
+here = os.path.dirname(os.path.abspath(__file__))
+results = {}
+for mode in ('eager', 'background'):
+    runs = []
+    for _ in range(opt.runs):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, '--robot', str(opt.robot),
+                                 '--camera', str(opt.camera), '--network', str(opt.network)],
+                                cwd=here, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    milestones = {name: round(statistics.median(run['milestones'][name] for run in runs), 3)
+                  for name in ('ui', 'first_frame', 'first_inference')}
+    results[mode] = milestones
+    print(json.dumps({'mode': mode, 'runs': opt.runs, **milestones, 'imported': runs[0]['imported']}))
+print(json.dumps({'speedup': {name: round(results['eager'][name] / results['background'][name], 2)
+                              for name in results['eager']}}))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Offline benchmark suite for the camera, fusion and annotation paths.
+
+Everything runs on synthetic frames and the CPU stand-in models, so the
+numbers can be compared between commits on any machine:
+
+- ``camera``: the update_camera path (BGR camera frame -> RGB -> PIL image),
+  per-call conversion vs. the shared FrameRing
+- ``fusion``: mean depth per detection box (``fusion.add_mean_depth``)
+- ``annotate``: boxes and labels (``fusion.draw_detections``)
+- ``process_image``: the still-image handler of jetson_gradio.py
+  (stand-in detect + depth, then ``fusion.fuse``)
+
+Each case is swept over resolutions (224x224 as in try.py up to 1080p)
+and detection counts. The report is JSON with throughput, latency
+percentiles and peak Python-traced memory per case; ``--compare`` prints
+the p50 change against an earlier report.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Jetson'))
+
+from frame_buffer import FrameRing
+from engine import InferenceEngine, NumpyBackend
+from fusion import add_mean_depth, class_names, draw_detections, fuse
+
+
+def synthetic_frame(rng, width, height):
+    """Smooth gradients plus noise, so JPEG and colour conversion see realistic content."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.dstack([x + 0 * y, y + 0 * x, (x + y) / 2])
+    noise = rng.normal(0, 12, (height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def synthetic_detections(rng, count, width, height):
+    detections = []
+    for _ in range(count):
+        w, h = rng.uniform(0.05, 0.4) * width, rng.uniform(0.05, 0.4) * height
+        left, top = rng.uniform(0, width - w), rng.uniform(0, height - h)
+        detections.append({
+            'ClassID': int(rng.integers(1, len(class_names))), 'Confidence': float(rng.uniform(0.5, 1.0)),
+            'Left': left, 'Top': top, 'Right': left + w, 'Bottom': top + h,
+            'Width': w, 'Height': h, 'Area': w * h, 'Center': (left + w / 2, top + h / 2),
+        })
+    return detections
+
+
+def measure(fn, min_time, min_iterations):
+    """Time ``fn()`` repeatedly, then once more under tracemalloc for the peak allocation."""
+    fn()  # warm caches and lazy allocations
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < min_iterations or time.perf_counter() - start < min_time:
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'iterations': len(latencies),
+        'throughput_per_s': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p90_ms': round(float(np.percentile(latencies, 90)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'max_ms': round(float(latencies.max()), 4),
+        'peak_alloc_kb': round(peak / 1024, 1),
+    }
+
+
+def camera_cases(rng, width, height):
+    bgr = cv2.cvtColor(synthetic_frame(rng, width, height), cv2.COLOR_RGB2BGR)
+
+    def per_call():
+        # update_camera before the FrameRing: convert and wrap on every request
+        return Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+
+    ring = FrameRing(bgr.shape)
+
+    def ring_tick():
+        # One camera tick: convert into the ring, then a viewer reads the cached PIL image
+        ring.write_bgr(bgr)
+        return ring.latest().image()
+
+    return {'camera/per_call': per_call, 'camera/frame_ring': ring_tick}
+
+
+def detection_cases(rng, width, height, count, engine):
+    rgb = synthetic_frame(rng, width, height)
+    depth = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY).astype(np.float32) / 255.0
+    detections = synthetic_detections(rng, count, width, height)
+    add_mean_depth(detections, depth)
+    engine.backend.detections = detections
+
+    def process_image():
+        found, depth_array = engine.analyze(rgb)
+        return fuse(rgb, found, depth_array)
+
+    return {
+        'fusion': lambda: add_mean_depth(detections, depth),
+        'annotate': lambda: draw_detections(rgb.copy(), detections),
+        'process_image': process_image,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['case'], r['size'], r.get('detections')): r for r in json.load(f)['results']}
+    print(f"{'case':>20} {'size':>10} {'dets':>5} {'base ms':>9} {'now ms':>9} {'change':>8}", file=sys.stderr)
+    for r in results:
+        old = baseline.get((r['case'], r['size'], r.get('detections')))
+        if old is None:
+            continue
+        change = r['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0
+        dets = r.get('detections', '-')
+        print(f"{r['case']:>20} {r['size']:>10} {dets:>5} {old['p50_ms']:>9.3f} {r['p50_ms']:>9.3f} {change:>+8.1%}", file=sys.stderr)
+
+
+parser = argparse.ArgumentParser(description="Benchmark camera conversion, fusion and annotation on synthetic data.")
+parser.add_argument("--sizes", type=str, nargs='+', default=["224x224", "640x480", "1280x720", "1920x1080"], help="frame sizes WxH")
+parser.add_argument("--detections", type=int, nargs='+', default=[1, 10, 50], help="detections per frame")
+parser.add_argument("--cases", type=str, nargs='+', default=["camera", "fusion", "annotate", "process_image"], help="cases to run")
+parser.add_argument("--min-time", type=float, default=0.3, help="seconds per measurement")
+parser.add_argument("--min-iterations", type=int, default=20, help="iterations per measurement")
+parser.add_argument("--output", type=str, default="-", help="JSON report path ('-' for stdout)")
+parser.add_argument("--compare", type=str, help="earlier JSON report to compare p50 latencies against")
+opt = parser.parse_args()
+
+rng = np.random.default_rng(0)
+engine = InferenceEngine(NumpyBackend())
+results = []
+for size in opt.sizes:
+    width, height = (int(v) for v in size.split('x'))
+    cases = []
+    if 'camera' in opt.cases:
+        cases += [(name, None, fn) for name, fn in camera_cases(rng, width, height).items()]
+    for count in opt.detections:
+        for name, fn in detection_cases(rng, width, height, count, engine).items():
+            if name in opt.cases:
+                cases.append((name, count, fn))
+    for name, count, fn in cases:
+        result = {'case': name, 'size': size, **({'detections': count} if count is not None else {})}
+        result.update(measure(fn, opt.min_time, opt.min_iterations))
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+engine.close()
+
+report = {'environment': environment(), 'results': results}
+if opt.output == '-':
+    print(json.dumps(report, indent=2))
+else:
+    with open(opt.output, 'w') as f:
+        json.dump(report, f, indent=2)
+if opt.compare:
+    compare(results, opt.compare)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Load test for the MJPEG endpoint: how many viewers can one device serve?
+
+A simulated camera feeds a FrameRing, the MJPEGServer runs on localhost,
+and N client threads read the stream for a few seconds each round.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+
+from frame_buffer import FrameRing
+from simulation import SimulatedCamera
+from video_stream import MJPEGServer, BOUNDARY
+
+
+def viewer(port, query, duration, counts, index):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('GET', f'/stream.mjpg?{query}')
+    response = connection.getresponse()
+    marker = f'--{BOUNDARY}'.encode()
+    deadline = time.perf_counter() + duration
+    frames = 0
+    while time.perf_counter() < deadline:
+        line = response.fp.readline()
+        if not line:
+            break
+        if line.startswith(marker):
+            response.fp.readline()  # Content-Type
+            length = int(response.fp.readline().split(b':')[1])
+            response.fp.readline()
+            response.fp.read(length + 2)
+            frames += 1
+    counts[index] = frames
+    connection.close()
+
+
+parser = argparse.ArgumentParser(description="Measure MJPEG fan-out with a synthetic camera.")
+parser.add_argument("--width", type=int, default=224, help="camera width")
+parser.add_argument("--height", type=int, default=224, help="camera height")
+parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+parser.add_argument("--viewers", type=int, nargs='+', default=[1, 5, 10, 25, 50], help="viewer counts to test")
+parser.add_argument("--duration", type=float, default=3.0, help="seconds per round")
+parser.add_argument("--query", type=str, default="quality=80", help="stream options, e.g. 'quality=60&width=160'")
+opt = parser.parse_args()
+
+camera = SimulatedCamera(opt.width, opt.height, opt.fps)
+frames = FrameRing.from_camera(camera)
+camera.start()
+server = MJPEGServer(frames, host='127.0.0.1', port=0).start()
+
+results = []
+for count in opt.viewers:
+    before = server.stats()
+    first_frame = frames.latest().sequence
+    counts = [0] * count
+    threads = [threading.Thread(target=viewer, args=(server.port, opt.query, opt.duration, counts, i)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = server.stats()
+    camera_frames = frames.latest().sequence - first_frame
+    per_viewer = [c / opt.duration for c in counts]
+    results.append({
+        'viewers': count,
+        'min_fps': round(min(per_viewer), 2),
+        'mean_fps': round(sum(per_viewer) / count, 2),
+        'camera_frames': camera_frames,
+        'encodes': after['encodes'] - before['encodes'],
+        'frames_sent': after['frames_sent'] - before['frames_sent'],
+    })
+    print(json.dumps(results[-1]))
+
+server.stop()
+camera.stop()
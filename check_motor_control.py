@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Check MotorExecutor and MotorControlLoop against a SimulatedRobot.
+
+Runs without hardware and exits non-zero on the first failed check:
+
+- ``submit``: a timed motion returns at once, drives the motors for its
+  duration, then stops them; queued motions run in order
+- ``cancel``: ``stop`` cancels the running and the queued motions and
+  stops the motors right away
+- ``stop``: a stop with nothing running still writes zero speeds
+- ``speed loop``: a slider speed is written again after a timed motion
+  stopped the motors
+"""
+
+import sys
+import time
+
+from motor_control import MotorExecutor, MotorControlLoop
+from simulation import SimulatedRobot
+
+
+def speeds(robot):
+    return robot.left_motor.value, robot.right_motor.value
+
+
+def check(name, condition, detail=''):
+    print(f"{'ok  ' if condition else 'FAIL'} {name}" + (f": {detail}" if detail and not condition else ''))
+    if not condition:
+        sys.exit(1)
+
+
+robot = SimulatedRobot()
+motors = MotorExecutor(robot)
+speed_loop = MotorControlLoop(robot, rate=100)
+
+# submit
+start = time.perf_counter()
+first = motors.submit('forward', 0.3, 0.2)
+second = motors.submit('left', 0.5, 0.1)
+check("submit returns without waiting", time.perf_counter() - start < 0.05)
+time.sleep(0.05)
+check("first motion drives the motors", speeds(robot) == (0.3, 0.3), speeds(robot))
+check("executor is busy", motors.busy())
+check("first motion finishes", first.done.wait(1.0) and not first.cancelled)
+time.sleep(0.05)
+check("queued motion runs next", speeds(robot) == (-0.5, 0.5), speeds(robot))
+check("queued motion finishes", second.done.wait(1.0) and not second.cancelled)
+time.sleep(0.02)
+check("motors stop after the last motion", speeds(robot) == (0, 0), speeds(robot))
+check("executor is idle", not motors.busy())
+
+# cancel
+running = motors.submit('backward', 0.4, 5.0)
+queued = motors.submit('right', 0.4, 5.0)
+time.sleep(0.05)
+check("long motion started", speeds(robot) == (-0.4, -0.4), speeds(robot))
+start = time.perf_counter()
+motors.stop()
+check("stop takes effect at once", time.perf_counter() - start < 0.05 and speeds(robot) == (0, 0), speeds(robot))
+check("running motion is cancelled", running.done.is_set() and running.cancelled)
+check("queued motion is cancelled", queued.done.is_set() and queued.cancelled)
+time.sleep(0.1)
+check("nothing runs after the cancel", speeds(robot) == (0, 0) and not motors.busy(), speeds(robot))
+
+# stop while idle
+robot.set_motors(0.2, 0.2)
+motors.stop()
+check("stop while idle zeroes the motors", speeds(robot) == (0, 0), speeds(robot))
+
+# speed loop after a timed motion
+speed_loop.set_targets(0.25, 0.25)
+time.sleep(0.05)
+check("slider speed is written", speeds(robot) == (0.25, 0.25), speeds(robot))
+motors.submit('forward', 0.5, 0.05).done.wait(1.0)
+time.sleep(0.02)
+speed_loop.set_targets(0.25, 0.25)
+time.sleep(0.05)
+check("same slider speed is written again after a motion", speeds(robot) == (0.25, 0.25), speeds(robot))
+
+latency = motors.latency_stats()
+print(f"motion latency mean {latency['motion'][0] * 1000:.2f} ms, stop latency mean {latency['stop'][0] * 1000:.3f} ms")
+speed_loop.close()
+motors.close()
@@ -1,114 +1,274 @@
-import gradio as gr
-import time
-import os
-import uuid
-from PIL import Image
-import numpy as np
-import cv2
+# Imported first: robot, camera and depth network start in the background
+# while gradio is imported and the UI is built
+from startup import startup
+from motor_control import MotorExecutor, MotorControlLoop
+import threading
+
 is_recording = False
-command_log = []
+journal = None
+journal_path = None
+# Guards is_recording and journal against concurrent handlers
+recording_lock = threading.Lock()
+player = None
 
 # Placeholder image path or URL
 placeholder_image_path = 'images.png'
-try:
-    from jetbot import Robot, Camera, bgr8_to_jpeg
-    robot = Robot()
-    camera = Camera.instance()
-except ImportError as e:
-    print(f"Import error: {e}\nRunning in simulation mode.")
-    robot = None
-    camera = None
+# Port of the MJPEG video endpoint (http://<jetbot>:8081/stream.mjpg)
+video_port = 8081
+# Burst snapshots: number of frames and frames per second
+burst_count = 10
+burst_rate = 5.0
+
+# Set by the init functions once their hardware is up; handlers check robot/camera
+# first and do nothing (or show the placeholder) until then, as in simulation mode
+robot = None
+camera = None
+frames = None
+video_server = None
+motors = None
+speed_loop = None
+snapshot_writer = None
+guard = None
+
+def init_robot():
+    global robot, guard, motors, speed_loop
+    from jetbot import Robot
+    from collision_guard import CollisionGuard
+    jetbot = Robot()
+    # Forward motion is slowed or vetoed when the depth network sees an obstacle
+    # ahead, and stays vetoed until the network has loaded (see init_guard)
+    guard = CollisionGuard(jetbot, stop_distance=0.5, slow_distance=1.0)
+    # Timed motions run in the background so button handlers return immediately
+    motors = MotorExecutor(guard)
+    # Slider speeds are coalesced and written to the motors at a fixed rate
+    speed_loop = MotorControlLoop(guard, rate=50)
+    # Published last: handlers only touch the motors once robot is set
+    robot = jetbot
+
+def init_camera():
+    global camera, frames, video_server, snapshot_writer
+    from jetbot import Camera
+    from frame_buffer import FrameRing
+    from video_stream import MJPEGServer
+    from snapshots import SnapshotWriter
+    jetbot_camera = Camera.instance()
+    # Each camera frame is converted once here and shared by every consumer
+    frames = FrameRing.from_camera(jetbot_camera)
+    # Low-latency MJPEG feed: each frame is encoded once and shared by all viewers
+    video_server = MJPEGServer(frames, port=video_port).start()
+    # Snapshots copy the frame instantly; encoding and disk writes run in the background
+    snapshot_writer = SnapshotWriter(frames, 'snapshots', max_files=500)
+    camera = jetbot_camera
+    startup.mark('first_frame')
+
+def init_guard():
+    global guard
+    try:
+        startup.wait('camera')
+        if not startup.ready('camera'):
+            raise RuntimeError("needs camera")
+        from collision_guard import jetson_depth
+        depth_fn = jetson_depth()
+        # The first map also warms the network up
+        frame = frames.latest()
+        guard.update(depth_fn(frame.rgb), frame.timestamp)
+    except BaseException:
+        # No camera or no depth network: the motors are driven directly, as without
+        # the guard, instead of leaving forward motion vetoed for the whole session
+        motors.robot = speed_loop.robot = robot
+        guard.close()
+        guard = None
+        raise
+    startup.mark('first_inference')
+    guard.follow(frames, depth_fn)
+
+startup.start('robot', init_robot)
+startup.start('camera', init_camera)
+startup.start('guard', init_guard, after=('robot',))
+
+import gradio as gr
+import os
+from PIL import Image
+
+from command_journal import CommandJournal, JournalPlayer, load_journal, new_journal_path, robot_commands
+from dataset_recorder import DatasetRecorder, new_dataset_path
 
 def move_forward():
     if robot:
-        robot.forward(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('forward', 0.3, 1.0)
 
 def move_backward():
     if robot:
-        robot.backward(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('backward', 0.3, 1.0)
 
 def turn_left():
     if robot:
-        robot.left(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('left', 0.3, 1.0)
 
 def turn_right():
     if robot:
-        robot.right(0.3)
-        time.sleep(1)
-        robot.stop()
+        motors.submit('right', 0.3, 1.0)
 def toggle_recording():
-    global is_recording
-    is_recording = not is_recording
-    if not is_recording:
-        return "Recording stopped. Ready to replay."
-    else:
-        command_log.clear()
+    global is_recording, journal, journal_path
+    # The journal exists before the flag is set and the flag is cleared before it is closed,
+    # so record_command never writes to a missing or closed journal
+    with recording_lock:
+        if is_recording:
+            is_recording = False
+            journal.close()
+            return f"Recording stopped ({journal.count} commands). Ready to replay."
+        # Each recording goes to its own timestamped journal file
+        journal_path = new_journal_path('journals')
+        journal = CommandJournal(journal_path, robot_commands)
+        is_recording = True
         return "Recording started. Please execute commands."
 
-def record_command(command, *params):
-    if is_recording:
-        command_log.append((command, params))
+def record_command(command, a=0.0, b=0.0):
+    with recording_lock:
+        if is_recording:
+            journal.record(command, a, b)
+
+def dispatch_command(command, a, b):
+    if command == 'set_motor_speed':
+        set_motor_speed(a, b)
+    else:
+        move_robot(command, a)
 
-def replay_commands():
-    if not command_log:
+def replay_commands(speed=1.0):
+    global player
+    if is_recording:
+        return "Stop recording before replaying."
+    if journal_path is None:
         return "No commands recorded."
-    for func, params in command_log:
-        print(func,params)
-        func(*params)
-        time.sleep(1)  # delay between commands for clarity
-    return "Replay finished."
+    commands, records = load_journal(journal_path)
+    if not len(records):
+        return "No commands recorded."
+    # Commands are replayed with their recorded timing, scaled by speed
+    player = JournalPlayer(commands, records, dispatch_command, speed)
+    played = player.play()
+    return f"Replay finished ({played} of {len(records)} commands)."
+
+# Dataset recording: frames with the motor values (and label) at capture time
+dataset_labels = {'Unlabeled': -1, 'Free': 0, 'Blocked': 1}
+dataset_label = -1
+dataset = None
+
+def toggle_dataset():
+    global dataset
+    if not camera:
+        return "No camera in simulation mode."
+    if dataset is None:
+        # A fresh directory per recording; a quick stop/start must not overwrite the last one
+        path = new_dataset_path('datasets')
+        dataset = DatasetRecorder(path, frames.latest().rgb.shape)
+        dataset.label = dataset_label
+        # Samples at most 10 frames per second; drops samples rather than slowing the camera
+        dataset.follow(frames, robot, rate=10)
+        return f"Recording dataset to {path}."
+    recorder, dataset = dataset, None
+    recorder.close()
+    return f"Dataset saved to {recorder.path} ({recorder.recorded} frames, {recorder.dropped} dropped)."
+
+def set_dataset_label(label):
+    global dataset_label
+    dataset_label = dataset_labels[label]
+    if dataset:
+        dataset.label = dataset_label
 def stop():
     if robot:
-        robot.stop()
+        # Cancels any queued or running motion immediately
+        motors.stop()
+        speed_loop.reset()
 
 def set_speed_left(speed):
     if robot:
-        robot.left_motor.value = speed
+        speed_loop.set_targets(left=speed)
 
 def set_speed_right(speed):
     if robot:
-        robot.right_motor.value = speed
+        speed_loop.set_targets(right=speed)
+
+def set_motor_speed(left_speed, right_speed):
+    if robot:
+        speed_loop.set_targets(left_speed, right_speed)
+
+# Load the placeholder image as a PIL Image once
+with open(placeholder_image_path, 'rb') as f:
+    placeholder_image = Image.open(f)
+    placeholder_image.load()  # This might be necessary depending on how PIL handles lazy loading
 
 def update_camera():
     if camera:
-        # Assuming the camera.value is a numpy array in BGR format
-        # Convert from BGR to RGB
-        rgb_image = cv2.cvtColor(camera.value, cv2.COLOR_BGR2RGB)
-        # Convert numpy array to PIL Image
-        pil_image = Image.fromarray(rgb_image)
-        return pil_image
+        # Latest frame, already converted to RGB and wrapped as a PIL Image once per camera tick
+        return frames.latest().image()
     else:
-        # Load the placeholder image as a PIL Image
-        with open(placeholder_image_path, 'rb') as f:
-            pil_image = Image.open(f)
-            pil_image.load()  # This might be necessary depending on how PIL handles lazy loading
-        return pil_image
+        return placeholder_image
+
 
+# Button labels to Robot method names
+direction_actions = {'⬆️ Forward': 'forward', '⬅️ Left': 'left', '🛑 Stop': 'stop', '➡️ Right': 'right', '⬇️ Backward': 'backward'}
 
 def move_robot(direction, duration=1.0):
     if robot:
-        getattr(robot, direction)(0.3)
-        robot.sleep(duration)
-        robot.stop()
-    record_command(move_robot, direction, duration)
+        action = direction_actions.get(direction, direction)
+        if action == 'stop':
+            motors.stop()
+            speed_loop.reset()
+        else:
+            motors.submit(action, 0.3, duration)
+    record_command(direction_actions.get(direction, direction), duration)
+
+def press_direction(direction):
+    # The Stop button also interrupts a replay in progress
+    if direction == '🛑 Stop' and player:
+        player.stop()
+    move_robot(direction)
 
 def save_snapshot():
     if camera:
-        image_path = f"snapshots/{uuid.uuid4()}.jpeg"
-        with open(image_path, 'wb') as f:
-            f.write(update_camera())
-        return image_path
+        # Show the captured pixels right away; the JPEG is written by the snapshot workers
+        return snapshot_writer.capture().rgb
     else:
         return placeholder_image_path
 
-# Ensure snapshot directory exists
+def take_burst():
+    if camera:
+        snapshot_writer.burst(burst_count, burst_rate)
+        return f"Capturing {burst_count} frames at {burst_rate:g} per second into snapshots/."
+    else:
+        return "No camera in simulation mode."
+
+def video_link():
+    if startup.state('camera') == 'starting':
+        return "Low-latency MJPEG feed: waiting for the camera."
+    if not video_server:
+        return ""
+    return f"For a lower-latency feed open `http://<jetbot-address>:{video_port}/stream.mjpg` (add `?quality=60&width=320` to reduce bandwidth)."
+
+def guard_status():
+    if startup.state('guard') == 'starting':
+        return "Collision guard: loading the depth network (forward motion is blocked until then)."
+    if not guard:
+        error = startup.report()['subsystems'].get('guard', {}).get('error')
+        return f"Collision guard off ({error}): forward motion is not guarded." if robot and error else "Collision guard disabled."
+    stats = guard.stats()
+    return (f"Forward speed limit {stats['scale']:.0%}, clearance {stats['clearance']:.2f}, "
+            f"{stats['vetoes']} vetoes, reflex p99 {stats['reflex']['p99'] * 1000:.2f} ms")
+
+def calibrate_guard():
+    if not guard:
+        return "Collision guard disabled."
+    try:
+        # The current view becomes the free-floor reference
+        guard.calibrate()
+    except RuntimeError as e:
+        return str(e)
+    return guard_status()
+
+# Ensure snapshot and journal directories exist
 os.makedirs('snapshots', exist_ok=True)
+os.makedirs('journals', exist_ok=True)
+os.makedirs('datasets', exist_ok=True)
 
 with gr.Blocks() as demo:
     gr.Markdown("# JetBot Control Panel")
@@ -119,7 +279,15 @@ with gr.Blocks() as demo:
         record_status = gr.Textbox(label="Recording Status", value="Recording not started.")
     
     record_button.click(toggle_recording, outputs=record_status)
-    replay_button.click(replay_commands, outputs=record_status)
+    replay_speed = gr.Slider(0.25, 4.0, step=0.25, label="Replay Speed", value=1.0)
+    replay_button.click(replay_commands, inputs=[replay_speed], outputs=record_status)
+
+    with gr.Row():
+        dataset_button = gr.Button("💾 Start/⏹️ Stop Dataset")
+        dataset_label_choice = gr.Radio(list(dataset_labels), value='Unlabeled', label="Dataset Label")
+        dataset_status = gr.Textbox(label="Dataset Status", value="Dataset not recording.")
+    dataset_button.click(toggle_dataset, outputs=dataset_status)
+    dataset_label_choice.change(set_dataset_label, inputs=[dataset_label_choice], outputs=[])
 
     with gr.Row():
         left_speed = gr.Slider(-1.0, 1.0, step=0.1, label="Left Motor Speed", value=0.0)
@@ -129,7 +297,7 @@ with gr.Blocks() as demo:
         directions = ['⬆️ Forward', '⬅️ Left', '🛑 Stop', '➡️ Right', '⬇️ Backward']
         for direction in directions:
             gr.Button(direction.title(), elem_id=f"{direction}_button").click(
-                fn=lambda x=direction: move_robot(x), inputs=[], outputs=[])
+                fn=lambda x=direction: press_direction(x), inputs=[], outputs=[])
 
     left_speed.change(set_speed_left, inputs=[left_speed], outputs=[])
     right_speed.change(set_speed_right, inputs=[right_speed], outputs=[])
@@ -137,11 +305,24 @@ with gr.Blocks() as demo:
     with gr.Row():
         live_feed = gr.Image(streaming=True,value=update_camera)
         snapshot_result = gr.Image(width=300, height=300, label="Last Snapshot")
-    snapshot_button = gr.Button("📸 Take Snapshot", elem_id="snapshot_button").click(save_snapshot, outputs=snapshot_result)
+    with gr.Row():
+        snapshot_button = gr.Button("📸 Take Snapshot", elem_id="snapshot_button").click(save_snapshot, outputs=snapshot_result)
+        burst_button = gr.Button(f"🎞️ Burst ({burst_count} frames)", elem_id="burst_button")
+        burst_status = gr.Textbox(label="Burst Status", value="")
+    burst_button.click(take_burst, outputs=burst_status)
+    with gr.Row():
+        calibrate_button = gr.Button("🧭 Calibrate Collision Guard (clear floor ahead)", elem_id="calibrate_button")
+        guard_output = gr.Textbox(label="Collision Guard", value=guard_status)
+    calibrate_button.click(calibrate_guard, outputs=guard_output)
+    startup_output = gr.Textbox(label="Startup", value=startup.format_status, every=2.0, lines=4)
+    # Re-checked while the page is open: the camera (and its MJPEG server) usually comes up after the layout is built
+    gr.Markdown(value=video_link, every=2.0)
         
     gr.Markdown("### Instructions")
     gr.Markdown("1. **Move the Sliders**: Adjust the sliders to change the speed of the left and right motors.")
     gr.Markdown("2. **Press the Buttons**: Use the directional buttons to move the JetBot. Press 'Stop' to halt any movement.")
     gr.Markdown("3. **Camera and Snapshot**: View the live feed and take snapshots using the button.")
 
-demo.launch(share=True)
+demo.launch(share=True, prevent_thread_lock=True)
+startup.mark('ui')
+demo.block_thread()
@@ -0,0 +1,295 @@
+"""Depth-based collision reflex between the motion commands and the motors.
+
+Each depth map is reduced to a coarse obstacle grid: the part of the image
+below ``horizon`` is split into ``rows`` x ``columns`` cells and each cell
+holds its mean depth (a subsample and one ``cv2.resize`` with area
+averaging). Image columns correspond to bearings, so the grid is a polar
+map of bearing sectors by distance bands. The ``clearance`` is the nearest obstacle cell
+in the central ``corridor`` (the columns the robot drives into). Cells
+are obstacles when they are closer than the free-floor reference
+recorded by ``calibrate``, if there is one.
+
+``CollisionGuard`` wraps a ``jetbot.Robot`` and has the same motion
+interface, so ``MotorExecutor`` and ``MotorControlLoop`` can drive it
+instead of the robot. Every command is filtered: the forward part of the
+left/right speeds is scaled by 1 above ``slow_distance``, by 0 (a veto)
+below ``stop_distance``, and linearly in between. Turning in place and
+reversing are never limited, so the robot can always back away.
+
+Latency: ``update`` reduces the map and rewrites the motors in the
+calling thread, so a depth map that requires a stop reaches the motors
+after a fixed, content-independent amount of work (well under a
+millisecond for a 224x224 field). When depth stops arriving for
+``max_age`` seconds, a watchdog vetoes forward motion. Ages are counted
+from the capture time of the map's camera frame (the ``update`` time if
+it is not given), and a map that is already older than ``max_age`` when
+it arrives vetoes forward motion itself. Forward motion is therefore
+never based on depth from a frame captured more than ``max_age`` plus one
+watchdog period earlier. Until the first map arrives, forward motion is
+vetoed as well.
+Reflex and end-to-end times are recorded in ``metrics``; those
+over ``budget`` are counted.
+
+Depth is distance (larger = farther) in the units of the depth network;
+pass ``inverse=True`` for maps where larger values are closer.
+"""
+import threading
+import time
+
+import numpy as np
+import cv2
+
+from metrics import metrics
+
+
+def jetson_depth(network="monodepth-mobilenet"):
+    """Depth function for ``CollisionGuard.follow``: depthNet's raw field at network resolution.
+
+    The grid is coarse, so the field is neither upsampled nor colorized.
+    Raises ImportError without jetson.inference.
+    """
+    import jetson.inference
+    import jetson.utils
+    net = jetson.inference.depthNet(network)
+
+    def depth(rgb):
+        net.Process(jetson.utils.cudaFromNumpy(rgb))
+        field = net.GetDepthField()
+        jetson.utils.cudaDeviceSynchronize()
+        return jetson.utils.cudaToNumpy(field).reshape(field.height, field.width).copy()
+    return depth
+
+
+def obstacle_grid(depth, rows=4, columns=16, horizon=0.35, inverse=False):
+    """Mean depth of ``rows`` x ``columns`` cells covering the image below ``horizon`` (fraction of the height)."""
+    depth = np.asarray(depth)
+    if depth.ndim == 3:
+        depth = depth[..., 0]
+    roi = depth[int(depth.shape[0] * horizon):]
+    # Averaging 16x16 samples per cell is plenty; subsampling keeps large maps as cheap as the network field
+    step = max(1, min(roi.shape[0] // (16 * rows), roi.shape[1] // (16 * columns)))
+    roi = roi[::step, ::step]
+    if roi.dtype != np.float32:
+        roi = roi.astype(np.float32)
+    if inverse:
+        roi = 1.0 / np.maximum(roi, 1e-6)
+    finite = np.isfinite(roi)
+    if finite.all():
+        return cv2.resize(roi, (columns, rows), interpolation=cv2.INTER_AREA)
+    # Mean over the known pixels of each cell; cells without any are treated as far away
+    sums = cv2.resize(np.where(finite, roi, 0).astype(np.float32), (columns, rows), interpolation=cv2.INTER_AREA)
+    counts = cv2.resize(finite.astype(np.float32), (columns, rows), interpolation=cv2.INTER_AREA)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.inf).astype(np.float32)
+
+
+class GuardedMotor:
+    """Stands in for ``robot.left_motor``/``right_motor``; writes go through the guard."""
+
+    def __init__(self, guard, side):
+        self._guard = guard
+        self._side = side
+
+    @property
+    def value(self):
+        return self._guard.requested[self._side]
+
+    @value.setter
+    def value(self, speed):
+        self._guard._request(**{self._side: float(speed)})
+
+
+class CollisionGuard:
+    """Scales or vetoes forward motion of ``robot`` from the latest depth map."""
+
+    def __init__(self, robot, stop_distance=0.5, slow_distance=1.0, rows=4, columns=16, horizon=0.35,
+                 corridor=0.5, inverse=False, budget=0.1, max_age=0.5, floor_margin=0.15):
+        self.robot = robot
+        self.stop_distance = stop_distance
+        self.slow_distance = slow_distance
+        self.rows = rows
+        self.columns = columns
+        self.horizon = horizon
+        self.inverse = inverse
+        self.budget = budget
+        self.max_age = max_age
+        self.floor_margin = floor_margin
+        margin = int(round(columns * (1 - corridor) / 2))
+        self.corridor = slice(margin, columns - margin)
+        self.floor = None
+        self.left_motor = GuardedMotor(self, 'left')
+        self.right_motor = GuardedMotor(self, 'right')
+        self.requested = {'left': 0.0, 'right': 0.0}
+        self.written = (0.0, 0.0)
+        # No depth yet: forward motion is vetoed until the first map arrives
+        self.scale = 0.0
+        self.clearance = 0.0
+        self.grid = None
+        self.depth = None
+        # time.time() at which the frame of the current map was captured
+        self.captured = None
+        self.lock = threading.Lock()
+        self.maps = 0
+        self.vetoes = 0
+        self.stale_stops = 0
+        self.over_budget = 0
+        self.running = True
+        self.watchdog = threading.Thread(target=self._watch, daemon=True)
+        self.watchdog.start()
+        self.follower = None
+
+    # Motion interface of jetbot.Robot
+
+    def set_motors(self, left_speed, right_speed):
+        self._request(left=float(left_speed), right=float(right_speed))
+
+    def forward(self, speed=1.0):
+        self.set_motors(speed, speed)
+
+    def backward(self, speed=1.0):
+        self.set_motors(-speed, -speed)
+
+    def left(self, speed=1.0):
+        self.set_motors(-speed, speed)
+
+    def right(self, speed=1.0):
+        self.set_motors(speed, -speed)
+
+    def stop(self):
+        self.set_motors(0, 0)
+
+    # Depth input
+
+    def calibrate(self, depth=None):
+        """Record free floor (default: the latest depth map); later cells only count as obstacles where they are closer.
+
+        Without a calibration, the floor in the lowest rows counts as an
+        obstacle once it is nearer than ``slow_distance``.
+        """
+        depth = self.depth if depth is None else depth
+        if depth is None:
+            raise RuntimeError("no depth map yet")
+        self.floor = obstacle_grid(depth, self.rows, self.columns, self.horizon, self.inverse)
+
+    def update(self, depth, captured=None):
+        """Apply a new depth map; ``captured`` is the ``time.time()`` of its camera frame, if known.
+
+        Returns the new forward scale (0 = vetoed, also when the frame is
+        older than ``max_age``).
+        """
+        start = time.perf_counter()
+        grid = obstacle_grid(depth, self.rows, self.columns, self.horizon, self.inverse)
+        ahead = grid[:, self.corridor]
+        if self.floor is not None:
+            # Only what sticks out of the floor is an obstacle
+            ahead = np.where(ahead < self.floor[:, self.corridor] * (1 - self.floor_margin), ahead, np.inf)
+        clearance = float(ahead.min())
+        span = self.slow_distance - self.stop_distance
+        scale = float(np.clip((clearance - self.stop_distance) / span, 0.0, 1.0)) if span > 0 else float(
+            clearance > self.stop_distance)
+        now = time.time()
+        captured_at = now if captured is None else captured
+        stale = now - captured_at > self.max_age
+        with self.lock:
+            if stale:
+                # Too old to drive on, whatever it shows
+                if self.scale > 0.0:
+                    self.stale_stops += 1
+                scale = 0.0
+            elif scale == 0.0 and self.scale > 0.0:
+                self.vetoes += 1
+            self.grid = grid
+            self.depth = depth
+            self.clearance = clearance
+            self.scale = scale
+            self.captured = captured_at
+            self.maps += 1
+            self._write()
+        done = time.perf_counter()
+        metrics.observe('collision_reflex', done - start)
+        if captured is not None:
+            end_to_end = time.time() - captured
+            metrics.observe('collision_end_to_end', end_to_end)
+            if end_to_end > self.budget:
+                with self.lock:
+                    self.over_budget += 1
+        return scale
+
+    def follow(self, frames, depth_fn):
+        """Run ``depth_fn(rgb)`` on each new frame of a FrameRing and feed the result to ``update``.
+
+        Runs on a background thread; frames that arrive while depth is
+        being computed are skipped, so the guard always sees the newest one.
+        """
+        def run():
+            last_sequence = -1
+            while self.follower is not None:
+                frame = frames.wait_next(last_sequence, timeout=self.max_age)
+                if frame is None:
+                    continue
+                last_sequence = frame.sequence
+                try:
+                    depth = depth_fn(frame.rgb)
+                except Exception as e:
+                    # The watchdog stops forward motion once depth is stale
+                    print(f"Collision guard depth failed: {e}")
+                    continue
+                self.update(depth, frame.timestamp)
+
+        self.follower = threading.Thread(target=run, daemon=True)
+        self.follower.start()
+
+    def stats(self):
+        with self.lock:
+            age = None if self.captured is None else time.time() - self.captured
+            stats = {
+                'scale': self.scale,
+                'clearance': self.clearance,
+                'depth_age': age,
+                'maps': self.maps,
+                'vetoes': self.vetoes,
+                'stale_stops': self.stale_stops,
+                'over_budget': self.over_budget,
+            }
+        stats['reflex'] = metrics.histogram('collision_reflex').snapshot()
+        stats['end_to_end'] = metrics.histogram('collision_end_to_end').snapshot()
+        return stats
+
+    def close(self):
+        self.follower = None
+        self.running = False
+        self.watchdog.join(timeout=1)
+        self.robot.stop()
+
+    def _request(self, left=None, right=None):
+        with self.lock:
+            if left is not None:
+                self.requested['left'] = left
+            if right is not None:
+                self.requested['right'] = right
+            self._write()
+
+    def _write(self):
+        # Called with the lock held; only the forward part of the command is scaled
+        left, right = self.requested['left'], self.requested['right']
+        forward, turn = (left + right) / 2, (left - right) / 2
+        if forward > 0:
+            forward *= self.scale
+        output = (forward + turn, forward - turn)
+        if output != self.written:
+            if output[0] != self.written[0]:
+                self.robot.left_motor.value = output[0]
+            if output[1] != self.written[1]:
+                self.robot.right_motor.value = output[1]
+            self.written = output
+
+    def _watch(self):
+        period = min(self.max_age, self.budget) / 2
+        while self.running:
+            time.sleep(period)
+            with self.lock:
+                stale = self.captured is not None and time.time() - self.captured > self.max_age
+                if stale and self.scale > 0.0:
+                    self.scale = 0.0
+                    self.stale_stops += 1
+                    self._write()
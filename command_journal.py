@@ -0,0 +1,128 @@
+"""Compact, timestamped journal of robot commands with time-faithful replay.
+
+A journal file is a small JSON header followed by fixed-width 17-byte
+records ``(time, command, a, b)``:
+
+- ``time``: seconds since recording started (monotonic clock), float64
+- ``command``: index into the header's command names, uint8
+- ``a``, ``b``: numeric arguments, float32 (e.g. duration, or left/right speed)
+
+Records are only ever appended, and loading is a single ``np.memmap`` of
+the record area, so hours-long sessions stay cheap to write and open.
+"""
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'JBJ1'
+# Commands the control panels record: the Robot motions and set_motor_speed
+robot_commands = ('forward', 'backward', 'left', 'right', 'stop', 'set_motor_speed')
+record_dtype = np.dtype([('time', '<f8'), ('command', 'u1'), ('a', '<f4'), ('b', '<f4')])
+_record_struct = struct.Struct('<dBff')
+
+
+def new_journal_path(directory):
+    """``<directory>/<YYYYmmdd-HHMMSS>.jbj``, with a ``-2``, ``-3``... suffix if that name is taken."""
+    stem = os.path.join(directory, time.strftime('%Y%m%d-%H%M%S'))
+    path, number = f"{stem}.jbj", 1
+    while os.path.exists(path):
+        number += 1
+        path = f"{stem}-{number}.jbj"
+    return path
+
+
+class CommandJournal:
+    """Append-only recorder for one session; never overwrites an existing file (FileExistsError)."""
+
+    def __init__(self, path, commands):
+        self.path = path
+        self.commands = list(commands)
+        self.command_index = {name: i for i, name in enumerate(self.commands)}
+        header = json.dumps({'commands': self.commands, 'created': time.time()}).encode()
+        self.file = open(path, 'xb')
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.file.flush()
+        self.start = time.monotonic()
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, command, a=0.0, b=0.0):
+        data = _record_struct.pack(time.monotonic() - self.start, self.command_index[command], a, b)
+        with self.lock:
+            self.file.write(data)
+            # Flush every record so a crash loses at most the last command
+            self.file.flush()
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def load_journal(path):
+    """Return ``(commands, records)``; ``records`` is a read-only structured array."""
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a command journal")
+        header_size, = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_size))
+    offset = 8 + header_size
+    # Ignore a partially written last record
+    count = (os.path.getsize(path) - offset) // record_dtype.itemsize
+    if count == 0:
+        return header['commands'], np.zeros(0, dtype=record_dtype)
+    records = np.memmap(path, dtype=record_dtype, mode='r', offset=offset, shape=(count,))
+    return header['commands'], records
+
+
+class JournalPlayer:
+    """Replays journal records with their original spacing.
+
+    ``dispatch(name, a, b)`` is called for each record. ``speed`` scales
+    time (2.0 plays twice as fast), and ``seek`` jumps to a point in the
+    recording.
+    """
+
+    def __init__(self, commands, records, dispatch, speed=1.0):
+        self.commands = commands
+        self.records = records
+        self.dispatch = dispatch
+        self.speed = speed
+        self.position = 0
+        self.stopped = threading.Event()
+
+    @property
+    def duration(self):
+        return float(self.records['time'][-1]) if len(self.records) else 0.0
+
+    def seek(self, seconds):
+        """Continue playback from the first record at or after ``seconds``."""
+        self.position = int(np.searchsorted(self.records['time'], seconds))
+
+    def stop(self):
+        self.stopped.set()
+
+    def play(self):
+        """Dispatch the remaining records in real time (scaled by speed); returns how many ran."""
+        self.stopped.clear()
+        times = self.records['time']
+        if self.position >= len(times):
+            return 0
+        origin = float(times[self.position])
+        start = time.monotonic()
+        played = 0
+        while self.position < len(times):
+            record = self.records[self.position]
+            delay = (float(record['time']) - origin) / self.speed - (time.monotonic() - start)
+            if delay > 0 and self.stopped.wait(delay):
+                break
+            if self.stopped.is_set():
+                break
+            self.dispatch(self.commands[record['command']], float(record['a']), float(record['b']))
+            self.position += 1
+            played += 1
+        return played
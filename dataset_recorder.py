@@ -0,0 +1,246 @@
+"""Time-aligned training data: camera frames, motor values, labels and detections.
+
+A dataset is a directory of append-only shards plus ``index.json``:
+
+- ``shard-NNNNN.frames.npy``: ``(chunk_size, H, W, 3)`` uint8 RGB frames
+- ``shard-NNNNN.meta.npy``: one ``meta_dtype`` row per frame (time, camera
+  sequence, left/right motor values, label, and where its detections are)
+- ``shard-NNNNN.detections.npy``: ``detection_dtype`` rows for the shard
+
+All three are plain ``.npy`` files, so ``Dataset`` opens them with
+``np.load(mmap_mode='r')`` and reads any sample without loading the rest.
+``index.json`` lists the shards and their frame counts; it is rewritten
+atomically whenever a shard is finished and on ``close``.
+
+Recording never blocks the caller: ``record`` copies the frame onto a
+bounded queue and a writer thread stores it. When the disk cannot keep
+up, new samples are dropped and counted instead of stalling the camera
+or the control loop.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+meta_dtype = np.dtype([
+    ('time', '<f8'), ('sequence', '<u8'), ('left', '<f4'), ('right', '<f4'), ('label', '<i2'),
+    ('detection_start', '<u4'), ('detection_count', '<u2'),
+])
+detection_dtype = np.dtype([
+    ('class_id', '<i2'), ('confidence', '<f4'), ('left', '<f4'), ('top', '<f4'),
+    ('right', '<f4'), ('bottom', '<f4'), ('depth', '<f4'),
+])
+
+
+def _detection_rows(detections):
+    rows = []
+    for d in detections:
+        depth = d.get('MeanDepth')
+        rows.append((d['ClassID'], d.get('Confidence', 0.0), d['Left'], d['Top'], d['Right'], d['Bottom'],
+                     np.nan if depth is None else depth))
+    return rows
+
+
+def new_dataset_path(directory):
+    """A new, empty ``<directory>/<YYYYmmdd-HHMMSS>`` directory (``-2``, ``-3``... if that name is taken)."""
+    stem = os.path.join(directory, time.strftime('%Y%m%d-%H%M%S'))
+    path, number = stem, 1
+    while True:
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            number += 1
+            path = f"{stem}-{number}"
+
+
+class DatasetRecorder:
+    """Writes samples into shards of ``chunk_size`` frames under ``path``.
+
+    ``label`` is stored with every sample until changed (e.g. 0 = free,
+    1 = blocked for collision avoidance; -1 = unlabeled). A ``path`` that
+    already holds a dataset is refused with FileExistsError rather than
+    overwritten.
+    """
+
+    def __init__(self, path, shape, chunk_size=512, queue_size=64):
+        if os.path.isdir(path) and any(name == 'index.json' or name.startswith('shard-') for name in os.listdir(path)):
+            raise FileExistsError(f"{path} already holds a dataset")
+        self.path = path
+        self.shape = tuple(shape)
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+        self.index = {'shape': list(self.shape), 'chunk_size': chunk_size, 'created': time.time(), 'shards': []}
+        self.samples = queue.Queue(maxsize=queue_size)
+        self.start = time.monotonic()
+        self.label = -1
+        self.recorded = 0
+        # Counted by both the recording caller and the writer thread
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.sampler = None
+
+    def record(self, rgb, left=0.0, right=0.0, detections=None, sequence=0, timestamp=None):
+        """Queue one sample; returns False if it was dropped because the writer is behind."""
+        if timestamp is None:
+            timestamp = time.monotonic() - self.start
+        sample = (np.array(rgb, dtype=np.uint8, copy=True), timestamp, sequence, left, right, self.label,
+                  _detection_rows(detections or ()))
+        try:
+            self.samples.put_nowait(sample)
+            return True
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+            return False
+
+    def follow(self, frames, motors, rate=10.0, detections=None):
+        """Record each new frame of a FrameRing, at most ``rate`` per second, from a background thread.
+
+        ``motors`` is a ``jetbot.Robot`` (or SimulatedRobot); its current
+        motor values are stored with each frame. ``detections`` is an
+        optional callable returning the latest detection dicts.
+        """
+        def run():
+            interval = 1.0 / rate
+            last_sequence = -1
+            next_time = time.monotonic()
+            while self.sampler is not None:
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_time = max(next_time + interval, time.monotonic())
+                frame = frames.wait_next(last_sequence, timeout=1.0)
+                if frame is None:
+                    continue
+                last_sequence = frame.sequence
+                self.record(frame.rgb, motors.left_motor.value, motors.right_motor.value,
+                            detections() if detections else None, frame.sequence,
+                            frame.timestamp - time.time() + time.monotonic() - self.start)
+
+        self.sampler = threading.Thread(target=run, daemon=True)
+        self.sampler.start()
+
+    def close(self):
+        """Stop sampling, store everything still queued and write the final index."""
+        sampler, self.sampler = self.sampler, None
+        if sampler is not None:
+            sampler.join(timeout=2)
+        self.samples.put(None)
+        self.thread.join()
+        return self.index
+
+    def _write_index(self):
+        temporary = os.path.join(self.path, 'index.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(temporary, os.path.join(self.path, 'index.json'))
+
+    def _open_shard(self):
+        name = f"shard-{len(self.index['shards']):05d}"
+        frames = np.lib.format.open_memmap(os.path.join(self.path, f"{name}.frames.npy"), mode='w+',
+                                           dtype=np.uint8, shape=(self.chunk_size,) + self.shape)
+        meta = np.zeros(self.chunk_size, dtype=meta_dtype)
+        return name, frames, meta, []
+
+    def _finish_shard(self, name, frames, meta, detections, count):
+        frames.flush()
+        del frames
+        np.save(os.path.join(self.path, f"{name}.meta.npy"), meta[:count])
+        np.save(os.path.join(self.path, f"{name}.detections.npy"), np.array(detections, dtype=detection_dtype))
+        self.index['shards'].append({'name': name, 'count': count})
+        self._write_index()
+
+    def _run(self):
+        shard = None
+        count = 0
+        while True:
+            sample = self.samples.get()
+            if sample is None:
+                break
+            if shard is None:
+                shard = self._open_shard()
+                count = 0
+            name, frames, meta, detections = shard
+            rgb, timestamp, sequence, left, right, label, rows = sample
+            if rgb.shape != self.shape:
+                with self.dropped_lock:
+                    self.dropped += 1
+                continue
+            frames[count] = rgb
+            meta[count] = (timestamp, sequence, left, right, label, len(detections), len(rows))
+            detections.extend(rows)
+            count += 1
+            self.recorded += 1
+            if count == self.chunk_size:
+                self._finish_shard(name, frames, meta, detections, count)
+                shard = None
+        if shard is not None:
+            self._finish_shard(*shard, count)
+        else:
+            self._write_index()
+
+
+class Dataset:
+    """Random access to a recorded dataset; frames stay on disk until indexed."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            self.index = json.load(f)
+        self.frames, metas, self.detections = [], [], []
+        for shard in self.index['shards']:
+            base = os.path.join(path, shard['name'])
+            self.frames.append(np.load(f"{base}.frames.npy", mmap_mode='r')[:shard['count']])
+            metas.append(np.load(f"{base}.meta.npy"))
+            self.detections.append(np.load(f"{base}.detections.npy"))
+        counts = [shard['count'] for shard in self.index['shards']]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        # All per-frame metadata in one small in-memory array
+        self.meta = np.concatenate(metas) if metas else np.zeros(0, dtype=meta_dtype)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _locate(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if indices.size and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("sample index out of range")
+        shards = np.searchsorted(self.offsets, indices, side='right') - 1
+        return shards, indices - self.offsets[shards]
+
+    def frame(self, index):
+        (shard,), (position,) = self._locate([index])
+        return self.frames[shard][position]
+
+    def batch(self, indices, out=None):
+        """Frames for ``indices`` as one ``(N, H, W, 3)`` array, read shard by shard.
+
+        Pass ``out`` to refill the same array every step; ``preprocess.Preprocessor.batch``
+        turns it into model inputs the same way.
+        """
+        shards, positions = self._locate(indices)
+        if out is None:
+            out = np.empty((len(positions),) + tuple(self.index['shape']), dtype=np.uint8)
+        for shard in np.unique(shards):
+            selected = np.flatnonzero(shards == shard)
+            # Sorted reads keep the page cache access sequential
+            order = np.argsort(positions[selected])
+            out[selected[order]] = self.frames[shard][positions[selected[order]]]
+        return out
+
+    def detections_for(self, index):
+        (shard,), _ = self._locate([index])
+        row = self.meta[index]
+        start = int(row['detection_start'])
+        return self.detections[shard][start:start + int(row['detection_count'])]
+
+    def __getitem__(self, index):
+        """``(frame, meta_row, detections)`` for one sample."""
+        return self.frame(index), self.meta[index], self.detections_for(index)
@@ -0,0 +1,743 @@
+"""Fleet mode: many JetBots controlled from one server.
+
+Each robot runs a ``FleetAgent`` that keeps one persistent TCP connection
+to the ``FleetServer``. Agents dial out, so a robot only needs the
+server's address, and it reconnects by itself after a drop. The server
+keeps the pool of agent connections and serves all of them from a single
+selector thread, so dozens of robots cost a socket and two buffers each
+instead of a process each.
+
+Commands, telemetry and video share that one connection as framed
+messages, a 5-byte header ``(channel, length)`` followed by the payload:
+
+- ``hello``: agent -> server, JSON ``{'robot': id, 'version': 1}``, sent first
+- ``command``: server -> agent, JSON ``{'id', 'action', 'args'}``
+- ``ack``: agent -> server, JSON ``{'id', 'ok', 'error'}`` once the command ran
+- ``telemetry``: agent -> server, JSON status, ``telemetry_rate`` times per second
+- ``thumbnail``: agent -> server, ``(sequence, timestamp)`` and the JPEG
+  of a ``thumbnail_width`` pixel wide frame, ``thumbnail_rate`` per second
+- ``ping``/``pong``: keepalive and round-trip time, every ``ping_interval``
+
+Both ends send in priority order: commands, acks and pings first, then
+the newest telemetry, then the newest thumbnail. Telemetry and thumbnails
+are single slots that a newer message replaces, so a slow link drops
+stale video instead of delaying commands behind it.
+
+Actions are 'forward', 'backward', 'left', 'right' (``speed, duration``,
+run by the robot's ``MotorExecutor``), 'stop', 'set_motors' (``left,
+right``, through its ``MotorControlLoop``) and 'configure' (one dict of
+new rates/width, e.g. a higher thumbnail rate for the robot being
+watched).
+"""
+import json
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from frame_buffer import FrameRing
+from metrics import metrics
+from motor_control import MotorExecutor, MotorControlLoop
+from preprocess import encode_jpeg
+from simulation import SimulatedCamera, SimulatedRobot
+
+PROTOCOL_VERSION = 1
+HELLO, COMMAND, ACK, TELEMETRY, THUMBNAIL, PING, PONG = range(7)
+channel_names = ('hello', 'command', 'ack', 'telemetry', 'thumbnail', 'ping', 'pong')
+motion_actions = ('forward', 'backward', 'left', 'right')
+# Settings 'configure' may change: (type, min, max); a thumbnail rate of 0 turns thumbnails off
+configurable = {
+    'telemetry_rate': (float, 0.1, 100.0),
+    'thumbnail_rate': (float, 0.0, 30.0),
+    'thumbnail_width': (int, 16, 1920),
+    'thumbnail_quality': (int, 1, 100),
+}
+max_message = 8 * 1024 * 1024
+_header = struct.Struct('<BI')
+_thumbnail_header = struct.Struct('<Qd')
+_ping = struct.Struct('<d')
+
+
+def pack(channel, payload):
+    """One framed message; ``payload`` is bytes or a JSON-serializable object."""
+    if not isinstance(payload, (bytes, bytearray)):
+        payload = json.dumps(payload, separators=(',', ':')).encode()
+    return _header.pack(channel, len(payload)) + payload
+
+
+def unpack(buffer):
+    """Remove the complete messages from the front of ``buffer`` (a bytearray) and return ``[(channel, payload)]``."""
+    messages = []
+    offset = 0
+    while len(buffer) - offset >= _header.size:
+        channel, length = _header.unpack_from(buffer, offset)
+        if length > max_message:
+            raise ValueError(f"message of {length} bytes on channel {channel}")
+        end = offset + _header.size + length
+        if len(buffer) < end:
+            break
+        messages.append((channel, bytes(buffer[offset + _header.size:end])))
+        offset = end
+    del buffer[:offset]
+    return messages
+
+
+class Outbox:
+    """Outgoing messages of one connection, taken in priority order.
+
+    Control messages (commands, acks, pings) queue up in order; telemetry
+    and thumbnails each have one slot that a newer message replaces.
+    """
+
+    def __init__(self):
+        self.control = deque()
+        self.slots = {TELEMETRY: None, THUMBNAIL: None}
+        self.replaced = 0
+        self.condition = threading.Condition()
+
+    def put(self, channel, payload):
+        data = pack(channel, payload)
+        with self.condition:
+            if channel in self.slots:
+                if self.slots[channel] is not None:
+                    self.replaced += 1
+                self.slots[channel] = data
+            else:
+                self.control.append(data)
+            self.condition.notify()
+
+    def take(self):
+        """The next message to send, or None."""
+        with self.condition:
+            return self._take()
+
+    def wait(self, timeout=None):
+        """Like ``take``, waiting up to ``timeout`` seconds for a message."""
+        with self.condition:
+            self.condition.wait_for(self._pending, timeout)
+            return self._take()
+
+    def clear(self):
+        with self.condition:
+            self.control.clear()
+            for channel in self.slots:
+                self.slots[channel] = None
+
+    def _pending(self):
+        return bool(self.control) or any(data is not None for data in self.slots.values())
+
+    def _take(self):
+        if self.control:
+            return self.control.popleft()
+        for channel in (TELEMETRY, THUMBNAIL):
+            data = self.slots[channel]
+            if data is not None:
+                self.slots[channel] = None
+                return data
+        return None
+
+
+class FleetAgent:
+    """Connects one robot to a ``FleetServer`` and keeps the connection up.
+
+    ``robot`` is read for the motor values in telemetry; ``motors``
+    (MotorExecutor) runs timed motions and ``speed_loop``
+    (MotorControlLoop) takes speeds, both usually wrapping the collision
+    guard. ``frames`` (FrameRing) provides the thumbnails, and ``status``
+    optionally returns extra telemetry fields.
+    """
+
+    def __init__(self, robot_id, address, robot, motors, speed_loop, frames=None, status=None,
+                 telemetry_rate=5.0, thumbnail_rate=2.0, thumbnail_width=160, thumbnail_quality=60,
+                 timeout=10.0, reconnect_delay=(0.5, 10.0)):
+        self.robot_id = robot_id
+        self.address = address
+        self.robot = robot
+        self.motors = motors
+        self.speed_loop = speed_loop
+        self.frames = frames
+        self.status = status
+        self.telemetry_rate = telemetry_rate
+        self.thumbnail_rate = thumbnail_rate
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_quality = thumbnail_quality
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.outbox = Outbox()
+        self.sock = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.connects = 0
+        self.commands = 0
+        self.errors = 0
+        self.last_error = None
+        self.threads = []
+
+    @property
+    def connected(self):
+        return self.sock is not None
+
+    def start(self):
+        for target in (self._run, self._produce):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            sock = self.sock
+        if sock is not None:
+            _shutdown(sock)
+        for thread in self.threads:
+            thread.join(timeout=1)
+
+    def telemetry(self):
+        frame = self.frames.latest() if self.frames is not None else None
+        status = {
+            'time': time.time(),
+            'left': self.robot.left_motor.value,
+            'right': self.robot.right_motor.value,
+            'busy': self.motors.busy(),
+            'commands': self.commands,
+            'errors': self.errors,
+            'frame': frame.sequence if frame is not None else None,
+        }
+        if self.status is not None:
+            status.update(self.status())
+        return status
+
+    def execute(self, action, args):
+        if action in motion_actions:
+            self.motors.submit(action, *args)
+        elif action == 'stop':
+            # Cancels any queued or running motion immediately, like the panel's Stop button
+            self.motors.stop()
+            self.speed_loop.reset()
+        elif action == 'set_motors':
+            self.speed_loop.set_targets(*args)
+        elif action == 'configure':
+            settings, = args
+            if not isinstance(settings, dict):
+                raise ValueError("configure takes one dict of settings")
+            # Checked before anything is applied, so a bad value leaves every setting as it was
+            for name, value in settings.items():
+                if name not in configurable:
+                    raise ValueError(f"unknown setting {name!r}")
+                kind, low, high = configurable[name]
+                # JSON gives ints for whole numbers, which are fine for a float setting
+                accepted = (int, float) if kind is float else kind
+                if isinstance(value, bool) or not isinstance(value, accepted) or not low <= value <= high:
+                    raise ValueError(f"{name} must be {'a number' if kind is float else 'an integer'} in [{low}, {high}], "
+                                     f"got {value!r}")
+            for name, value in settings.items():
+                setattr(self, name, value)
+        else:
+            raise ValueError(f"unknown action {action!r}")
+
+    def _handle(self, channel, payload):
+        if channel == COMMAND:
+            command = json.loads(payload)
+            if not isinstance(command, dict) or 'id' not in command:
+                raise ValueError("command without an id")
+            error = None
+            try:
+                self.execute(command['action'], command.get('args', []))
+            except Exception as e:
+                error = str(e)
+                self.errors += 1
+            self.commands += 1
+            self.outbox.put(ACK, {'id': command['id'], 'ok': error is None, 'error': error})
+        elif channel == PING:
+            self.outbox.put(PONG, payload)
+
+    def _run(self):
+        delay = self.reconnect_delay[0]
+        while not self.stopped.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=self.timeout)
+            except OSError as e:
+                self.last_error = str(e)
+                if self.stopped.wait(delay):
+                    return
+                delay = min(delay * 2, self.reconnect_delay[1])
+                continue
+            delay = self.reconnect_delay[0]
+            self._session(sock)
+            self.stopped.wait(delay)
+
+    def _session(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        # Whatever was queued for the previous connection is stale now
+        self.outbox.clear()
+        self.outbox.put(HELLO, {'robot': self.robot_id, 'version': PROTOCOL_VERSION})
+        with self.lock:
+            self.sock = sock
+            self.connects += 1
+        writer = threading.Thread(target=self._write, args=(sock,), daemon=True)
+        writer.start()
+        buffer = bytearray()
+        try:
+            while not self.stopped.is_set():
+                data = sock.recv(65536)
+                if not data:
+                    break
+                buffer += data
+                for channel, payload in unpack(buffer):
+                    self._handle(channel, payload)
+        except Exception as e:
+            # Includes the read timeout (the server pings far more often than that) and malformed
+            # messages; either way this connection is dropped and _run reconnects
+            self.last_error = str(e)
+        finally:
+            with self.lock:
+                self.sock = None
+            _shutdown(sock)
+            writer.join(timeout=1)
+            sock.close()
+
+    def _write(self, sock):
+        try:
+            while self.sock is sock:
+                data = self.outbox.wait(0.5)
+                if data is not None:
+                    sock.sendall(data)
+        except OSError as e:
+            self.last_error = str(e)
+            _shutdown(sock)
+
+    def _produce(self):
+        now = time.monotonic()
+        next_telemetry = next_thumbnail = now
+        last_sequence = None
+        while not self.stopped.wait(max(0.0, min(next_telemetry, next_thumbnail) - time.monotonic())):
+            now = time.monotonic()
+            try:
+                if now >= next_telemetry:
+                    next_telemetry = now + 1.0 / self.telemetry_rate
+                    if self.connected:
+                        self.outbox.put(TELEMETRY, self.telemetry())
+                if now >= next_thumbnail:
+                    # Checked again every second when thumbnails are off, so 'configure' can turn them on
+                    next_thumbnail = now + (1.0 / self.thumbnail_rate if self.thumbnail_rate > 0 else 1.0)
+                    frame = self.frames.latest() if self.frames is not None and self.thumbnail_rate > 0 else None
+                    if self.connected and frame is not None and frame.sequence != last_sequence:
+                        last_sequence = frame.sequence
+                        with metrics.timer('fleet_thumbnail'):
+                            jpeg = encode_jpeg(frame.rgb, self.thumbnail_quality, self.thumbnail_width)
+                        self.outbox.put(THUMBNAIL, _thumbnail_header.pack(frame.sequence, frame.timestamp) + jpeg.tobytes())
+            except Exception as e:
+                # A failing status callback or encoder must not end telemetry for the session; retry in a second
+                self.errors += 1
+                self.last_error = str(e)
+                next_telemetry = max(next_telemetry, now + 1.0)
+                next_thumbnail = max(next_thumbnail, now + 1.0)
+
+
+class StandInAgent(FleetAgent):
+    """A ``FleetAgent`` on a SimulatedRobot and SimulatedCamera, for trying the fleet without hardware."""
+
+    def __init__(self, robot_id, address, width=224, height=224, fps=10.0, **kwargs):
+        self.camera = SimulatedCamera(width, height, fps).start()
+        robot = SimulatedRobot(history=1000)
+        super().__init__(robot_id, address, robot, MotorExecutor(robot), MotorControlLoop(robot, rate=50),
+                         FrameRing.from_camera(self.camera), **kwargs)
+
+    def close(self):
+        super().close()
+        self.motors.close()
+        self.speed_loop.close()
+        self.camera.stop()
+
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class RobotState:
+    """What the server knows about one robot; kept across reconnects."""
+
+    def __init__(self, robot_id):
+        self.robot_id = robot_id
+        self.connection = None
+        self.address = None
+        self.connected_at = None
+        self.last_seen = None
+        self.connects = 0
+        self.telemetry = {}
+        self.telemetry_time = None
+        # (sequence, capture timestamp, JPEG bytes)
+        self.thumbnail = None
+        self.thumbnails = 0
+        self.rtt = None
+        self.sent = 0
+        self.acked = 0
+        self.failed = 0
+
+    @property
+    def online(self):
+        return self.connection is not None
+
+    def summary(self):
+        now = time.time()
+        return {
+            'robot': self.robot_id,
+            'online': self.online,
+            'address': self.address,
+            'telemetry': self.telemetry,
+            'telemetry_age': None if self.telemetry_time is None else now - self.telemetry_time,
+            'thumbnails': self.thumbnails,
+            'rtt': self.rtt,
+            'connects': self.connects,
+            'sent': self.sent,
+            'acked': self.acked,
+            'failed': self.failed,
+        }
+
+
+class _Connection:
+    """Server side of one agent connection; only touched by the selector thread, except ``outbox``."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.inbox = bytearray()
+        self.outbox = Outbox()
+        self.sending = None
+        self.writing = False
+        self.robot = None
+        self.last_seen = time.monotonic()
+
+
+class _Pending:
+    __slots__ = ('connection', 'sent', 'event', 'ack')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.sent = time.perf_counter()
+        self.event = threading.Event()
+        self.ack = None
+
+
+class FleetServer:
+    """Accepts agents and multiplexes all of them on one selector thread.
+
+    ``send`` and ``broadcast`` can be called from any thread; they queue the
+    command and wake the selector. Command latency (send to ack) is
+    recorded as ``metrics`` 'fleet_command'.
+    """
+
+    def __init__(self, host='0.0.0.0', port=9000, ping_interval=2.0, timeout=10.0):
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self.listener = socket.create_server((host, port), backlog=128)
+        self.listener.setblocking(False)
+        self.waker, self.wake_sender = socket.socketpair()
+        self.waker.setblocking(False)
+        self.wake_sender.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self.waker, selectors.EVENT_READ)
+        self.robots = {}
+        self.pending = {}
+        self.dirty = set()
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.messages = [0] * len(channel_names)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy = 0.0
+        self.running = False
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.listener.getsockname()[1]
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self._wake()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+        for key in list(self.selector.get_map().values()):
+            if isinstance(key.data, _Connection):
+                self._close(key.data)
+        self.selector.close()
+        self.listener.close()
+        self.waker.close()
+        self.wake_sender.close()
+
+    def send(self, robot_id, action, *args, wait=None):
+        """Queue a command for one robot and return its id.
+
+        With ``wait`` (seconds), block for the ack instead and return it
+        (``{'id', 'ok', 'error'}``), or None on timeout. Raises
+        ConnectionError if the robot is not connected.
+        """
+        command_id, pending = self._queue(robot_id, action, args)
+        if wait is None:
+            return command_id
+        return self._wait(command_id, pending, wait)
+
+    def broadcast(self, action, *args, wait=None):
+        """Send a command to every connected robot; returns ``{robot_id: id or ack}``."""
+        queued = {}
+        for robot_id in self.robot_ids(online=True):
+            try:
+                queued[robot_id] = self._queue(robot_id, action, args)
+            except ConnectionError:
+                continue
+        if wait is None:
+            return {robot_id: command_id for robot_id, (command_id, _) in queued.items()}
+        deadline = time.perf_counter() + wait
+        return {robot_id: self._wait(command_id, pending, deadline - time.perf_counter())
+                for robot_id, (command_id, pending) in queued.items()}
+
+    def robot_ids(self, online=False):
+        with self.lock:
+            return sorted(robot_id for robot_id, state in self.robots.items() if state.online or not online)
+
+    def snapshot(self):
+        """Summary of every robot seen so far, sorted by id."""
+        with self.lock:
+            return [self.robots[robot_id].summary() for robot_id in sorted(self.robots)]
+
+    def thumbnail(self, robot_id):
+        """``(sequence, timestamp, jpeg bytes)`` of the newest thumbnail, or None."""
+        with self.lock:
+            state = self.robots.get(robot_id)
+            return state.thumbnail if state is not None else None
+
+    def stats(self):
+        with self.lock:
+            online = sum(state.online for state in self.robots.values())
+            return {
+                'robots': len(self.robots),
+                'online': online,
+                'pending': len(self.pending),
+                'messages': dict(zip(channel_names, self.messages)),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'busy_seconds': self.busy,
+                'command': metrics.histogram('fleet_command').snapshot(),
+            }
+
+    def _queue(self, robot_id, action, args):
+        with self.lock:
+            state = self.robots.get(robot_id)
+            if state is None or state.connection is None:
+                raise ConnectionError(f"robot {robot_id} is not connected")
+            self.next_id += 1
+            command_id = self.next_id
+            connection = state.connection
+            pending = self.pending[command_id] = _Pending(connection)
+            state.sent += 1
+            connection.outbox.put(COMMAND, {'id': command_id, 'action': action, 'args': list(args)})
+            self.dirty.add(connection)
+        self._wake()
+        return command_id, pending
+
+    def _wait(self, command_id, pending, timeout):
+        if not pending.event.wait(max(0.0, timeout)):
+            with self.lock:
+                self.pending.pop(command_id, None)
+            return None
+        return pending.ack
+
+    def _wake(self):
+        try:
+            self.wake_sender.send(b'\0')
+        except (BlockingIOError, OSError):
+            # A wakeup is already pending, or the server is stopping
+            pass
+
+    def _run(self):
+        next_ping = time.monotonic() + self.ping_interval
+        while self.running:
+            events = self.selector.select(max(0.0, next_ping - time.monotonic()))
+            start = time.perf_counter()
+            for key, mask in events:
+                if key.fileobj is self.listener:
+                    self._accept()
+                elif key.fileobj is self.waker:
+                    try:
+                        self.waker.recv(4096)
+                    except BlockingIOError:
+                        pass
+                elif key.data.sock is not None:
+                    if mask & selectors.EVENT_READ:
+                        self._read(key.data)
+                    if mask & selectors.EVENT_WRITE and key.data.sock is not None:
+                        self._flush(key.data)
+            with self.lock:
+                dirty, self.dirty = self.dirty, set()
+            for connection in dirty:
+                if connection.sock is not None:
+                    self._flush(connection)
+            now = time.monotonic()
+            if now >= next_ping:
+                next_ping = now + self.ping_interval
+                self._ping(now)
+            self.busy += time.perf_counter() - start
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except BlockingIOError:
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(sock, address)
+            self.selector.register(sock, selectors.EVENT_READ, connection)
+
+    def _read(self, connection):
+        try:
+            data = connection.sock.recv(262144)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(connection)
+            return
+        self.bytes_in += len(data)
+        connection.last_seen = time.monotonic()
+        connection.inbox += data
+        try:
+            for channel, payload in unpack(connection.inbox):
+                self._handle(connection, channel, payload)
+        except Exception as e:
+            # Whatever a peer sends, only its own connection goes; the selector thread serves everyone
+            print(f"Fleet: dropping {connection.address}: {e}")
+            self._close(connection)
+
+    def _handle(self, connection, channel, payload):
+        if channel < len(self.messages):
+            self.messages[channel] += 1
+        if connection.robot is None:
+            if channel != HELLO:
+                raise ValueError("expected hello")
+            hello = json.loads(payload)
+            if not isinstance(hello, dict) or not isinstance(hello.get('robot'), str):
+                raise ValueError("malformed hello")
+            self._register(connection, hello['robot'])
+            return
+        state = connection.robot
+        now = time.time()
+        if channel == ACK:
+            ack = json.loads(payload)
+            if not isinstance(ack, dict):
+                raise ValueError("malformed ack")
+            ack = {'id': ack.get('id'), 'ok': bool(ack.get('ok')), 'error': ack.get('error')}
+            with self.lock:
+                pending = self.pending.pop(ack['id'], None)
+                if ack['ok']:
+                    state.acked += 1
+                else:
+                    state.failed += 1
+            if pending is not None:
+                metrics.observe('fleet_command', time.perf_counter() - pending.sent)
+                pending.ack = ack
+                pending.event.set()
+        elif channel == TELEMETRY:
+            telemetry = json.loads(payload)
+            with self.lock:
+                state.telemetry = telemetry
+                state.telemetry_time = now
+        elif channel == THUMBNAIL:
+            if len(payload) < _thumbnail_header.size:
+                raise ValueError(f"thumbnail of {len(payload)} bytes")
+            sequence, timestamp = _thumbnail_header.unpack_from(payload)
+            with self.lock:
+                state.thumbnail = (sequence, timestamp, payload[_thumbnail_header.size:])
+                state.thumbnails += 1
+        elif channel == PONG:
+            if len(payload) != _ping.size:
+                raise ValueError(f"pong of {len(payload)} bytes")
+            sent, = _ping.unpack(payload)
+            state.rtt = time.perf_counter() - sent
+        with self.lock:
+            state.last_seen = now
+
+    def _register(self, connection, robot_id):
+        with self.lock:
+            state = self.robots.setdefault(robot_id, RobotState(robot_id))
+            previous = state.connection
+        if previous is not None:
+            # The robot reconnected before the old connection timed out
+            self._close(previous)
+        with self.lock:
+            state.connection = connection
+            state.address = '%s:%s' % connection.address[:2]
+            state.connected_at = state.last_seen = time.time()
+            state.connects += 1
+        connection.robot = state
+
+    def _flush(self, connection):
+        while True:
+            if connection.sending is None:
+                data = connection.outbox.take()
+                if data is None:
+                    break
+                connection.sending = memoryview(data)
+            try:
+                sent = connection.sock.send(connection.sending)
+            except BlockingIOError:
+                break
+            except OSError:
+                self._close(connection)
+                return
+            self.bytes_out += sent
+            connection.sending = connection.sending[sent:] if sent < len(connection.sending) else None
+        # Only ask for writability while output is stuck in the socket buffer
+        writing = connection.sending is not None
+        if writing != connection.writing:
+            connection.writing = writing
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0)
+            self.selector.modify(connection.sock, events, connection)
+
+    def _ping(self, now):
+        payload = _ping.pack(time.perf_counter())
+        for key in list(self.selector.get_map().values()):
+            connection = key.data
+            if not isinstance(connection, _Connection):
+                continue
+            if now - connection.last_seen > self.timeout:
+                self._close(connection)
+                continue
+            connection.outbox.put(PING, payload)
+            self._flush(connection)
+
+    def _close(self, connection):
+        if connection.sock is None:
+            return
+        self.selector.unregister(connection.sock)
+        connection.sock.close()
+        connection.sock = None
+        state = connection.robot
+        if state is None:
+            return
+        with self.lock:
+            if state.connection is connection:
+                state.connection = None
+            # Commands still in flight on this connection fail now rather than at their timeout
+            lost = [command_id for command_id, pending in self.pending.items() if pending.connection is connection]
+            for command_id in lost:
+                pending = self.pending.pop(command_id)
+                pending.ack = {'id': command_id, 'ok': False, 'error': 'disconnected'}
+                pending.event.set()
+                state.failed += 1
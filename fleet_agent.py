@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Fleet agent: connects this JetBot to a fleet dashboard (see fleet.py).
+
+Run it on each robot instead of app.py, with the address of the machine
+running fleet_dashboard.py:
+
+    python3 fleet_agent.py --server 192.168.1.10:9000
+
+Without the jetbot package a stand-in robot with a simulated camera is
+connected instead. ``--stand-ins N`` connects N of them from one process,
+for trying the fleet from a laptop.
+"""
+import argparse
+import socket
+import threading
+
+from fleet import FleetAgent, StandInAgent
+from frame_buffer import FrameRing
+from motor_control import MotorExecutor, MotorControlLoop
+from collision_guard import CollisionGuard, jetson_depth
+
+parser = argparse.ArgumentParser(description="Connect this JetBot to a fleet dashboard.")
+parser.add_argument("--server", type=str, required=True, help="dashboard address host:port")
+parser.add_argument("--name", type=str, default=socket.gethostname(), help="robot name shown on the dashboard")
+parser.add_argument("--telemetry-rate", type=float, default=5.0, help="telemetry messages per second")
+parser.add_argument("--thumbnail-rate", type=float, default=2.0, help="thumbnails per second (0 = none)")
+parser.add_argument("--thumbnail-width", type=int, default=160, help="thumbnail width in pixels")
+parser.add_argument("--stand-ins", type=int, default=0, help="connect this many simulated robots instead")
+opt = parser.parse_args()
+
+host, port = opt.server.rsplit(':', 1)
+address = (host, int(port))
+settings = dict(telemetry_rate=opt.telemetry_rate, thumbnail_rate=opt.thumbnail_rate,
+                thumbnail_width=opt.thumbnail_width)
+
+agents = []
+if not opt.stand_ins:
+    try:
+        from jetbot import Robot, Camera
+        robot = Robot()
+        camera = Camera.instance()
+        frames = FrameRing.from_camera(camera)
+        # Forward motion is slowed or vetoed when the depth network sees an obstacle ahead
+        guard = CollisionGuard(robot, stop_distance=0.5, slow_distance=1.0)
+        try:
+            guard.follow(frames, jetson_depth())
+        except Exception as e:
+            # Import error or a network that fails to load: drive the motors directly rather than vetoed
+            print(f"Collision guard disabled: {e}")
+            guard.close()
+            guard = None
+
+        def guard_status():
+            stats = guard.stats()
+            return {'scale': stats['scale'], 'clearance': stats['clearance'], 'vetoes': stats['vetoes']}
+
+        agents.append(FleetAgent(opt.name, address, robot, MotorExecutor(guard or robot),
+                                 MotorControlLoop(guard or robot, rate=50), frames,
+                                 status=guard_status if guard else None, **settings))
+    except ImportError as e:
+        print(f"Import error: {e}\nConnecting a stand-in robot.")
+        opt.stand_ins = 1
+if opt.stand_ins:
+    names = [opt.name] if opt.stand_ins == 1 else [f"{opt.name}-{i}" for i in range(opt.stand_ins)]
+    agents.extend(StandInAgent(name, address, **settings) for name in names)
+
+for agent in agents:
+    agent.start()
+print(f"Connecting {len(agents)} robot(s) to {host}:{port}")
+try:
+    threading.Event().wait()
+except KeyboardInterrupt:
+    for agent in agents:
+        agent.close()
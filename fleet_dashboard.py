@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Fleet dashboard: one control server for many JetBots (see fleet.py).
+
+Robots connect with fleet_agent.py; this process never touches a robot
+directly, so one dashboard serves the whole lab. ``--stand-ins N`` starts
+N simulated robots in this process for trying it without hardware.
+"""
+import argparse
+
+import gradio as gr
+import numpy as np
+import cv2
+
+from fleet import FleetServer, StandInAgent
+from metrics import metrics
+
+parser = argparse.ArgumentParser(description="Control many JetBots from one dashboard.")
+parser.add_argument("--port", type=int, default=9000, help="port the fleet agents connect to")
+parser.add_argument("--stand-ins", type=int, default=0, help="simulated robots to start locally")
+parser.add_argument("--refresh", type=float, default=1.0, help="seconds between dashboard refreshes")
+parser.add_argument("--metrics-port", type=int, default=9101, help="Prometheus-style metrics endpoint")
+opt = parser.parse_args()
+
+server = FleetServer(port=opt.port).start()
+stand_ins = [StandInAgent(f"stand-in-{i:02d}", ('127.0.0.1', server.port)).start() for i in range(opt.stand_ins)]
+metrics.serve(opt.metrics_port)
+
+# Decoded thumbnails per robot, so each JPEG is decoded once however often the page refreshes
+decoded = {}
+
+
+def thumbnail_image(robot_id):
+    thumbnail = server.thumbnail(robot_id)
+    if thumbnail is None:
+        return None
+    sequence, _, jpeg = thumbnail
+    cached = decoded.get(robot_id)
+    if cached is None or cached[0] != sequence:
+        bgr = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        cached = decoded[robot_id] = (sequence, cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+    return cached[1]
+
+
+@metrics.timed()
+def update_thumbnails():
+    images = []
+    for robot_id in server.robot_ids(online=True):
+        image = thumbnail_image(robot_id)
+        if image is not None:
+            images.append((image, robot_id))
+    return images
+
+
+def _number(value, scale=1.0, digits=2):
+    return None if value is None else round(value * scale, digits)
+
+
+@metrics.timed()
+def update_table():
+    rows = []
+    for robot in server.snapshot():
+        telemetry = robot['telemetry']
+        rows.append([robot['robot'], 'online' if robot['online'] else 'offline', telemetry.get('left'),
+                     telemetry.get('right'), telemetry.get('busy'), _number(telemetry.get('clearance')),
+                     _number(robot['rtt'], 1000), _number(robot['telemetry_age']),
+                     f"{robot['acked']}/{robot['sent']}", robot['connects']])
+    return rows
+
+
+def robot_choices():
+    return gr.update(choices=server.robot_ids())
+
+
+def command(robot_id, action, *args):
+    if not robot_id:
+        return "Select a robot first."
+    try:
+        ack = server.send(robot_id, action, *args, wait=2.0)
+    except ConnectionError as e:
+        return str(e)
+    if ack is None:
+        return f"{robot_id}: no answer to {action}"
+    return f"{robot_id}: {action} done" if ack['ok'] else f"{robot_id}: {action} failed: {ack['error']}"
+
+
+@metrics.timed()
+def move(robot_id, action):
+    return command(robot_id, action, 0.3, 1.0)
+
+
+@metrics.timed()
+def stop(robot_id):
+    return command(robot_id, 'stop')
+
+
+@metrics.timed()
+def set_speeds(robot_id, left, right):
+    return command(robot_id, 'set_motors', left, right)
+
+
+@metrics.timed()
+def watch(robot_id, rate):
+    # Only the watched robot streams faster; the rest stay at their reduced rate
+    return command(robot_id, 'configure', {'thumbnail_rate': rate})
+
+
+@metrics.timed()
+def stop_all():
+    acks = server.broadcast('stop', wait=2.0)
+    missing = sorted(robot_id for robot_id, ack in acks.items() if not (ack and ack['ok']))
+    result = f"Stopped {len(acks) - len(missing)} of {len(acks)} robots"
+    return f"{result}; no answer from {', '.join(missing)}" if missing else result
+
+
+with gr.Blocks() as demo:
+    gr.Markdown("# JetBot Fleet")
+    gr.Markdown(f"Start `python3 fleet_agent.py --server <this-host>:{server.port}` on each robot.")
+    with gr.Row():
+        gr.Button("🛑 Stop All Robots", elem_id="stop_all_button").click(stop_all, outputs=gr.Textbox(label="Fleet"))
+    gr.Gallery(value=update_thumbnails, every=opt.refresh, label="Robots", columns=6, height=400)
+    gr.Dataframe(value=update_table, every=opt.refresh,
+                 headers=["Robot", "State", "Left", "Right", "Busy", "Clearance", "RTT ms", "Telemetry age s",
+                          "Acked/sent", "Connects"])
+
+    gr.Markdown("### Selected robot")
+    with gr.Row():
+        robot = gr.Dropdown(choices=server.robot_ids(), label="Robot")
+        gr.Button("🔄 Refresh list").click(robot_choices, outputs=robot)
+    status = gr.Textbox(label="Command", value="")
+    with gr.Row():
+        for label, action in (("⬆️ Forward", 'forward'), ("⬅️ Left", 'left'), ("➡️ Right", 'right'),
+                              ("⬇️ Backward", 'backward')):
+            gr.Button(label).click(lambda robot_id, action=action: move(robot_id, action), inputs=robot,
+                                   outputs=status)
+        gr.Button("🛑 Stop", elem_id="stop_button").click(stop, inputs=robot, outputs=status)
+    with gr.Row():
+        left_speed = gr.Slider(-1.0, 1.0, step=0.1, label="Left Motor Speed", value=0.0)
+        right_speed = gr.Slider(-1.0, 1.0, step=0.1, label="Right Motor Speed", value=0.0)
+    left_speed.change(set_speeds, inputs=[robot, left_speed, right_speed], outputs=status)
+    right_speed.change(set_speeds, inputs=[robot, left_speed, right_speed], outputs=status)
+    with gr.Row():
+        rate = gr.Slider(0.0, 15.0, step=0.5, label="Thumbnail rate of the selected robot (per second)", value=2.0)
+        gr.Button("👁️ Apply").click(watch, inputs=[robot, rate], outputs=status)
+    gr.Markdown(f"Command latency and handler timings: `http://<this-host>:{opt.metrics_port}/metrics`.")
+
+demo.launch()
@@ -0,0 +1,82 @@
+"""Shared ring of camera frames with latest-frame semantics.
+
+The camera producer converts each BGR frame to RGB once, straight into a
+preallocated slot. Every consumer (live feed, snapshots, inference) reads
+the same converted frame without copying it, and the PIL wrapper is made
+at most once per frame.
+
+A frame's pixels stay valid until the producer wraps around to its slot,
+i.e. for ``size - 1`` further camera ticks. Copy the array if you need to
+keep it longer than that.
+"""
+import threading
+import time
+
+import numpy as np
+import cv2
+
+from metrics import metrics
+
+
+class Frame:
+    """One converted camera frame: sequence number, capture time and RGB pixels."""
+
+    __slots__ = ('sequence', 'timestamp', 'rgb', '_image')
+
+    def __init__(self, sequence, timestamp, rgb):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.rgb = rgb
+        self._image = None
+
+    def image(self):
+        """PIL view of the frame, created on first use and cached."""
+        if self._image is None:
+            # PIL is only needed once a UI asks for images, so it is not imported at start-up
+            from PIL import Image
+            self._image = Image.fromarray(self.rgb)
+        return self._image
+
+
+class FrameRing:
+    """Fixed number of preallocated RGB frame slots, written round-robin."""
+
+    def __init__(self, shape, size=4):
+        self.slots = np.empty((size,) + tuple(shape), dtype=np.uint8)
+        self.frames = [None] * size
+        self.sequence = 0
+        self.condition = threading.Condition()
+
+    @classmethod
+    def from_camera(cls, camera, size=4):
+        """Create a ring fed by every new ``camera.value`` from a JetBot camera."""
+        ring = cls(camera.value.shape, size)
+        ring.write_bgr(camera.value)
+        camera.observe(lambda change: ring.write_bgr(change['new']), names='value')
+        return ring
+
+    def write_bgr(self, bgr):
+        """Convert a BGR frame into the next slot and publish it."""
+        slot = (self.sequence + 1) % len(self.slots)
+        rgb = self.slots[slot]
+        with metrics.timer('preprocess'):
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+        with self.condition:
+            self.sequence += 1
+            self.frames[slot] = Frame(self.sequence, time.time(), rgb)
+            self.condition.notify_all()
+
+    def latest(self):
+        """The newest frame, or None before the first write."""
+        with self.condition:
+            return self.frames[self.sequence % len(self.slots)]
+
+    def wait_next(self, after_sequence, timeout=None):
+        """Block until a frame newer than ``after_sequence`` arrives and return the newest one.
+
+        Returns None on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.sequence > after_sequence, timeout):
+                return None
+            return self.frames[self.sequence % len(self.slots)]
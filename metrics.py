@@ -0,0 +1,232 @@
+"""Cheap timers and fixed-memory latency histograms.
+
+Code under measurement wraps a step in ``metrics.timer('detect')`` (or
+decorates a handler with ``metrics.timed('process_image',
+family='handler')``). Each observation is one ``time.perf_counter()`` pair
+and an increment in a log-spaced histogram, so memory per metric is fixed
+no matter how long the robot runs, and percentiles stay within about 10%.
+
+Read the numbers on demand:
+
+- ``metrics.prometheus_text()`` / ``metrics.serve(port)``: Prometheus text
+  format at ``http://<host>:<port>/metrics``
+- ``metrics.format_summary()`` / ``metrics.report_every(seconds)``: a short
+  human-readable table
+
+Stage names used across the project: capture, preprocess, detect, depth,
+fusion, annotate, encode, output.
+"""
+import math
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Histogram:
+    """Counts of durations in buckets growing by ``2 ** (1 / resolution)``, from ``low`` to ``high`` seconds."""
+
+    def __init__(self, low=1e-6, high=1e3, resolution=4):
+        self.low = low
+        self.scale = resolution / math.log(2)
+        self.size = int(math.ceil(math.log(high / low) * self.scale)) + 1
+        self.counts = [0] * (self.size + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = int(math.log(seconds / self.low) * self.scale) + 1 if seconds > self.low else 0
+        with self.lock:
+            self.counts[min(index, self.size)] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def value(self, index):
+        """Geometric middle of a bucket."""
+        return self.low * math.exp(max(index - 0.5, 0) / self.scale)
+
+    def quantile(self, q):
+        """Middle of the bucket holding the q-quantile (0 <= q <= 1), capped at the largest value seen."""
+        with self.lock:
+            counts = list(self.counts)
+            total, largest = self.count, self.max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.value(index), largest)
+        return largest
+
+    def snapshot(self):
+        with self.lock:
+            count, total, largest = self.count, self.sum, self.max
+        return {
+            'count': count,
+            'mean': total / count if count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'max': largest,
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Named histograms grouped in families (``stage``, ``handler``, ...), plus counters."""
+
+    def __init__(self, prefix='jetbot'):
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def histogram(self, name, family='stage'):
+        key = (family, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, seconds, family='stage'):
+        self.histogram(name, family).observe(seconds)
+
+    def timer(self, name, family='stage'):
+        """Context manager that records how long its block took."""
+        return _Timer(self.histogram(name, family))
+
+    def timed(self, name=None, family='handler'):
+        """Decorator that times every call of the function (handler name defaults to the function name)."""
+        def decorate(fn):
+            histogram = self.histogram(name or fn.__name__, family)
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def _histograms(self):
+        # Copied under the lock: a histogram's first use on another thread adds to the dict
+        with self.lock:
+            return sorted(self.histograms.items())
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        """``{family: {name: snapshot}}`` plus ``counters``."""
+        summary = {}
+        for (family, name), histogram in self._histograms():
+            summary.setdefault(family, {})[name] = histogram.snapshot()
+        with self.lock:
+            summary['counters'] = dict(self.counters)
+        return summary
+
+    def format_summary(self):
+        lines = []
+        for (family, name), histogram in self._histograms():
+            s = histogram.snapshot()
+            if s['count']:
+                lines.append(f"{family}/{name}: n={s['count']} mean {s['mean'] * 1000:.2f} ms, "
+                             f"p50 {s['p50'] * 1000:.2f} ms, p99 {s['p99'] * 1000:.2f} ms")
+        with self.lock:
+            lines += [f"{name}: {value}" for name, value in sorted(self.counters.items())]
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format (histograms as summaries)."""
+        lines = []
+        histograms = self._histograms()
+        families = sorted({family for (family, _), _ in histograms})
+        for family in families:
+            metric = f"{self.prefix}_{family}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (f, name), histogram in histograms:
+                if f != family:
+                    continue
+                s = histogram.snapshot()
+                for quantile, key in (('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99')):
+                    lines.append(f'{metric}{{{family}="{name}",quantile="{quantile}"}} {s[key]:.6g}')
+                lines.append(f'{metric}_sum{{{family}="{name}"}} {s["mean"] * s["count"]:.6g}')
+                lines.append(f'{metric}_count{{{family}="{name}"}} {s["count"]}')
+        with self.lock:
+            counters = sorted(self.counters.items())
+        for name, value in counters:
+            lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+            lines.append(f"{self.prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9101, host='0.0.0.0'):
+        """Serve ``/metrics`` from a background thread; returns the HTTP server.
+
+        If the port cannot be bound (e.g. it is in use), this is logged and
+        None is returned, so the caller keeps running without the endpoint.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"Metrics endpoint on port {port} unavailable: {e}")
+            return None
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def report_every(self, interval, output=print):
+        """Call ``output(format_summary())`` every ``interval`` seconds from a daemon thread."""
+        def report():
+            while True:
+                time.sleep(interval)
+                text = self.format_summary()
+                if text:
+                    output(text)
+        thread = threading.Thread(target=report, daemon=True)
+        thread.start()
+        return thread
+
+
+# Process-wide registry shared by every module
+metrics = Metrics()
@@ -0,0 +1,191 @@
+"""Non-blocking motor commands for the JetBot control panels.
+
+Timed motions ("forward at 0.3 for 1 s") are queued and executed by one
+dedicated thread, so a button handler returns immediately instead of
+sleeping in a Gradio worker. ``stop`` clears the queue and stops the motors
+from the calling thread right away. Slider speeds go through a fixed-rate
+control loop that coalesces bursts of updates.
+"""
+import threading
+import time
+from collections import deque
+
+
+class MotorCommand:
+    """A queued timed motion. ``done`` is set when it finishes or is cancelled."""
+
+    def __init__(self, action, speed, duration):
+        self.action = action
+        self.speed = speed
+        self.duration = duration
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class MotorExecutor:
+    """Runs queued motions on ``robot`` one after another in a background thread.
+
+    ``robot`` is a ``jetbot.Robot`` or ``simulation.SimulatedRobot``; actions
+    are its method names ('forward', 'backward', 'left', 'right').
+    """
+
+    def __init__(self, robot, history=100):
+        self.robot = robot
+        self.queue = deque()
+        self.current = None
+        self.deadline = None
+        self.condition = threading.Condition()
+        # Seconds from submit (or stop request) to the motor call
+        self.latencies = deque(maxlen=history)
+        self.stop_latencies = deque(maxlen=history)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, action, speed=0.3, duration=1.0):
+        """Queue a timed motion and return its MotorCommand without waiting."""
+        command = MotorCommand(action, speed, duration)
+        with self.condition:
+            self.queue.append(command)
+            self.condition.notify()
+        return command
+
+    def stop(self):
+        """Cancel everything queued or running and stop the motors immediately."""
+        requested = time.perf_counter()
+        with self.condition:
+            cancelled = list(self.queue)
+            if self.current is not None:
+                cancelled.append(self.current)
+            self.queue.clear()
+            self.current = None
+            self.deadline = None
+            self.robot.stop()
+            self.stop_latencies.append(time.perf_counter() - requested)
+            self.condition.notify()
+        for command in cancelled:
+            command.cancelled = True
+            command.done.set()
+
+    def busy(self):
+        with self.condition:
+            return self.current is not None or bool(self.queue)
+
+    def latency_stats(self):
+        """Mean and max command-to-actuation latency in seconds, for motions and stops."""
+        with self.condition:
+            motions = list(self.latencies)
+            stops = list(self.stop_latencies)
+        def summary(values):
+            return (sum(values) / len(values), max(values)) if values else (0.0, 0.0)
+        return {'motion': summary(motions), 'stop': summary(stops)}
+
+    def close(self):
+        self.stop()
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=1)
+
+    def _run(self):
+        with self.condition:
+            while self.running:
+                now = time.perf_counter()
+                if self.current is not None and now >= self.deadline:
+                    self.robot.stop()
+                    self.current.done.set()
+                    self.current = None
+                if self.current is None and self.queue:
+                    command = self.queue.popleft()
+                    getattr(self.robot, command.action)(command.speed)
+                    command.started = time.perf_counter()
+                    self.latencies.append(command.started - command.submitted)
+                    self.current = command
+                    self.deadline = command.started + command.duration
+                timeout = None if self.current is None else max(0.0, self.deadline - time.perf_counter())
+                self.condition.wait(timeout)
+
+
+class MotorControlLoop:
+    """Writes left/right motor speeds at a fixed rate from the latest requested targets.
+
+    Slider drags send many updates per second; they only replace the target,
+    and the loop writes to the motors at most ``rate`` times per second, and
+    only when the value changes. With ``ramp`` (speed units per second) the
+    output moves toward the target gradually instead of jumping. The loop
+    sleeps while the motors are at their targets. Each new target is
+    compared with the motors' actual values, since timed motions and stops
+    drive the same motors behind the loop's back.
+    """
+
+    def __init__(self, robot, rate=50.0, ramp=None):
+        self.robot = robot
+        self.period = 1.0 / rate
+        self.ramp = ramp
+        self.left_target = self.right_target = 0.0
+        self.left = self.right = 0.0
+        self.updates_received = 0
+        self.writes_issued = 0
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def set_targets(self, left=None, right=None):
+        """Request new speeds; None keeps the current target for that side."""
+        with self.condition:
+            # E.g. a timed motion ended with robot.stop(): resume from where the motors are
+            self.left, self.right = self.robot.left_motor.value, self.robot.right_motor.value
+            if left is not None:
+                self.left_target = float(left)
+            if right is not None:
+                self.right_target = float(right)
+            self.updates_received += 1
+            self.condition.notify()
+
+    def reset(self, left=0.0, right=0.0):
+        """Record that the motors were set elsewhere (e.g. stopped) without writing them."""
+        with self.condition:
+            self.left_target = self.left = left
+            self.right_target = self.right = right
+
+    def counters(self):
+        with self.condition:
+            return {'updates_received': self.updates_received, 'writes_issued': self.writes_issued}
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=1)
+
+    def _step(self, current, target):
+        if self.ramp is None:
+            return target
+        limit = self.ramp * self.period
+        return current + max(-limit, min(limit, target - current))
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while True:
+            with self.condition:
+                while self.running and (self.left, self.right) == (self.left_target, self.right_target):
+                    self.condition.wait()
+                    next_tick = max(next_tick, time.perf_counter())
+                if not self.running:
+                    return
+                left = self._step(self.left, self.left_target)
+                right = self._step(self.right, self.right_target)
+                if left != self.left:
+                    self.robot.left_motor.value = left
+                    self.writes_issued += 1
+                if right != self.right:
+                    self.robot.right_motor.value = right
+                    self.writes_issued += 1
+                self.left, self.right = left, right
+            next_tick += self.period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
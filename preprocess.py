@@ -0,0 +1,196 @@
+"""Image preprocessing into reusable buffers.
+
+``BufferPool`` hands out arrays by (shape, dtype) and takes them back, so
+per-frame scratch images (colour conversions, resized copies) are
+allocated once instead of on every frame. ``pool`` is the shared
+instance.
+
+``Preprocessor`` turns a camera frame into a model input in three passes
+over the model-sized image and writes the result into a caller-provided
+array:
+
+1. resize straight into the letterbox region of a pooled uint8 canvas
+2. widen to float32 (HWC) or pick channels (CHW)
+3. channel swap, scaling to [0, 1] and mean/std normalization as one
+   affine map per pixel (``cv2.transform``, or one multiply-subtract per
+   plane for CHW)
+
+No full-resolution intermediate is made: the colour swap happens at
+model resolution, after the resize.
+"""
+import threading
+from collections import defaultdict
+
+import numpy as np
+import cv2
+
+
+class BufferPool:
+    """Free lists of arrays keyed by (shape, dtype), at most ``max_free`` kept per key."""
+
+    def __init__(self, max_free=4):
+        self.max_free = max_free
+        self.free = defaultdict(list)
+        self.lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def take(self, shape, dtype=np.uint8):
+        """An array of ``shape`` and ``dtype`` with undefined contents."""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            free = self.free.get(key)
+            if free:
+                self.reuses += 1
+                return free.pop()
+            self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def give(self, array):
+        """Return an array from ``take``; it must not be used afterwards."""
+        key = (array.shape, array.dtype.str)
+        with self.lock:
+            free = self.free[key]
+            if len(free) < self.max_free:
+                free.append(array)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'allocations': self.allocations,
+                'reuses': self.reuses,
+                'free': sum(len(free) for free in self.free.values()),
+                'free_bytes': sum(a.nbytes for free in self.free.values() for a in free),
+            }
+
+
+pool = BufferPool()
+
+
+def rgb_to_bgr(rgb, out):
+    """Swap channels into ``out`` (also works BGR -> RGB)."""
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=out)
+
+
+def encode_jpeg(rgb, quality=90, width=None):
+    """JPEG bytes of an RGB frame, optionally scaled down to ``width``, using pooled scratch buffers."""
+    buffers = []
+    try:
+        if width and width < rgb.shape[1]:
+            height = max(1, round(rgb.shape[0] * width / rgb.shape[1]))
+            small = pool.take((height, width, 3))
+            buffers.append(small)
+            rgb = cv2.resize(rgb, (width, height), dst=small, interpolation=cv2.INTER_AREA)
+        bgr = pool.take(rgb.shape)
+        buffers.append(bgr)
+        ok, encoded = cv2.imencode('.jpg', rgb_to_bgr(rgb, bgr), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    finally:
+        for buffer in buffers:
+            pool.give(buffer)
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return encoded
+
+
+def letterbox_geometry(shape, size):
+    """``(scale, left, top, width, height)`` placing an image of ``shape`` inside ``size`` (w, h) without distortion."""
+    src_height, src_width = shape[:2]
+    dst_width, dst_height = size
+    scale = min(dst_width / src_width, dst_height / src_height)
+    width = max(1, min(dst_width, round(src_width * scale)))
+    height = max(1, min(dst_height, round(src_height * scale)))
+    return scale, (dst_width - width) // 2, (dst_height - height) // 2, width, height
+
+
+class Preprocessor:
+    """Resize, colour-convert and normalize frames into model inputs.
+
+    ``size`` is the model input (width, height). With ``letterbox`` the
+    aspect ratio is kept and the border filled with ``pad``; otherwise the
+    frame is stretched. Inputs are ``input_order`` ('bgr' from the JetBot
+    camera, or 'rgb' from a FrameRing); the output is RGB, ``(x / 255 -
+    mean) / std`` per channel, float32 in ``layout`` 'hwc' or 'chw'.
+    """
+
+    def __init__(self, size=(224, 224), letterbox=True, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225),
+                 input_order='bgr', layout='chw', pad=0, interpolation=cv2.INTER_LINEAR, buffers=None):
+        self.size = tuple(size)
+        self.letterbox = letterbox
+        self.layout = layout
+        self.pad = pad
+        self.interpolation = interpolation
+        self.pool = buffers if buffers is not None else pool
+        # Output channel c reads input channel source[c]
+        self.source = (2, 1, 0) if input_order == 'bgr' else (0, 1, 2)
+        self.scale = (1.0 / (255.0 * np.asarray(std, dtype=np.float64))).astype(np.float32)
+        self.offset = (np.asarray(mean, dtype=np.float64) / np.asarray(std, dtype=np.float64)).astype(np.float32)
+        # Swap, scale and offset as one 3x4 affine map for cv2.transform
+        self.matrix = np.zeros((3, 4), dtype=np.float32)
+        for c, s in enumerate(self.source):
+            self.matrix[c, s] = self.scale[c]
+            self.matrix[c, 3] = -self.offset[c]
+
+    @property
+    def shape(self):
+        width, height = self.size
+        return (3, height, width) if self.layout == 'chw' else (height, width, 3)
+
+    def geometry(self, shape):
+        """Where a frame of ``shape`` lands in the model input: ``(scale_x, scale_y, left, top)``.
+
+        Model coordinates map back to the frame as ``(x - left) / scale_x``.
+        """
+        if self.letterbox:
+            scale, left, top, _, _ = letterbox_geometry(shape, self.size)
+            return scale, scale, left, top
+        return self.size[0] / shape[1], self.size[1] / shape[0], 0, 0
+
+    def __call__(self, image, out=None):
+        """Preprocess one HxWx3 uint8 frame into ``out`` (allocated if None) and return it."""
+        if out is None:
+            out = np.empty(self.shape, dtype=np.float32)
+        width, height = self.size
+        canvas = self.pool.take((height, width, 3))
+        try:
+            if self.letterbox:
+                _, left, top, inner_width, inner_height = letterbox_geometry(image.shape, self.size)
+                canvas[:top] = self.pad
+                canvas[top + inner_height:] = self.pad
+                canvas[:, :left] = self.pad
+                canvas[:, left + inner_width:] = self.pad
+                region = canvas[top:top + inner_height, left:left + inner_width]
+            else:
+                inner_width, inner_height, region = width, height, canvas
+            if image.shape[:2] == (inner_height, inner_width):
+                region[...] = image
+            else:
+                cv2.resize(image, (inner_width, inner_height), dst=region, interpolation=self.interpolation)
+            self._normalize(canvas, out)
+        finally:
+            self.pool.give(canvas)
+        return out
+
+    def batch(self, images, out=None):
+        """Preprocess a sequence of frames into one ``(N,) + shape`` array."""
+        if out is None:
+            out = np.empty((len(images),) + self.shape, dtype=np.float32)
+        for i, image in enumerate(images):
+            self(image, out[i])
+        return out
+
+    def _normalize(self, canvas, out):
+        if self.layout == 'chw':
+            for c, s in enumerate(self.source):
+                np.multiply(canvas[..., s], self.scale[c], out=out[c], casting='unsafe')
+                np.subtract(out[c], self.offset[c], out=out[c])
+            return
+        widened = self.pool.take(canvas.shape, np.float32)
+        try:
+            np.copyto(widened, canvas, casting='unsafe')
+            # cv2.transform only writes in place into a contiguous destination
+            if out.flags.c_contiguous:
+                cv2.transform(widened, self.matrix, dst=out)
+            else:
+                out[...] = cv2.transform(widened, self.matrix)
+        finally:
+            self.pool.give(widened)
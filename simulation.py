@@ -0,0 +1,108 @@
+"""Stand-ins for JetBot hardware, for testing and benchmarking without a robot."""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class SimulatedMotor:
+    def __init__(self, robot, name):
+        self._robot = robot
+        self._name = name
+        self._value = 0.0
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, speed):
+        self._value = speed
+        self._robot.log(f'{self._name}_motor', speed)
+
+
+class SimulatedRobot:
+    """Mimics ``jetbot.Robot``: same motion methods and motor attributes.
+
+    Every motor write is recorded in ``calls`` as ``(time.perf_counter(), name, value)``.
+    """
+
+    def __init__(self, history=10000):
+        self.calls = deque(maxlen=history)
+        self.left_motor = SimulatedMotor(self, 'left')
+        self.right_motor = SimulatedMotor(self, 'right')
+
+    def log(self, name, value):
+        self.calls.append((time.perf_counter(), name, value))
+
+    def set_motors(self, left_speed, right_speed):
+        self.left_motor.value = left_speed
+        self.right_motor.value = right_speed
+
+    def forward(self, speed=1.0):
+        self.set_motors(speed, speed)
+
+    def backward(self, speed=1.0):
+        self.set_motors(-speed, -speed)
+
+    def left(self, speed=1.0):
+        self.set_motors(-speed, speed)
+
+    def right(self, speed=1.0):
+        self.set_motors(speed, -speed)
+
+    def stop(self):
+        self.set_motors(0, 0)
+
+
+class SimulatedCamera:
+    """Mimics ``jetbot.Camera``: a BGR ``value`` updated at ``fps``, with ``observe``.
+
+    Frames are a moving gradient, cheap to generate but not trivially
+    compressible, so JPEG timings are realistic.
+    """
+
+    def __init__(self, width=224, height=224, fps=30.0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.observers = []
+        base = np.linspace(0, 255, width, dtype=np.float32)
+        self._gradient = np.tile(base, (height, 1))
+        self._noise = np.random.default_rng(0).integers(0, 32, (height, width), dtype=np.uint8)
+        self.frame_count = 0
+        self.value = self._render()
+        self.running = False
+        self.thread = None
+
+    def _render(self):
+        shift = (self.frame_count * 4) % self.width
+        gray = np.roll(self._gradient, shift, axis=1).astype(np.uint8) + self._noise
+        return np.dstack([gray, gray[::-1], 255 - gray])
+
+    def observe(self, callback, names='value'):
+        self.observers.append(callback)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while self.running:
+            self.frame_count += 1
+            self.value = self._render()
+            for callback in self.observers:
+                callback({'name': 'value', 'new': self.value})
+            next_tick += 1.0 / self.fps
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
@@ -0,0 +1,175 @@
+"""Snapshots from the camera ring, encoded and written in the background.
+
+``SnapshotWriter.capture()`` copies the newest frame's pixels (a memcpy)
+and returns a ``Snapshot`` handle at once; JPEG encoding and the disk
+write happen on a small worker pool. Files appear atomically (written
+to a temporary name, then renamed), so a path that exists is always a
+complete JPEG.
+
+``burst(count, rate)`` captures ``count`` distinct frames at ``rate``
+per second from a background thread. The snapshot directory is kept
+under ``max_files`` files (and ``max_bytes`` bytes if set) by deleting
+the oldest snapshots, including ones left by earlier runs.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+from preprocess import encode_jpeg
+
+
+class Snapshot:
+    """Handle for one snapshot; ``rgb`` is usable immediately, ``path`` once ``wait()`` returns."""
+
+    def __init__(self, frame, path):
+        self.sequence = frame.sequence
+        self.timestamp = frame.timestamp
+        self.rgb = frame.rgb.copy()
+        self.path = path
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def ready(self):
+        return self.done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the file is written; returns the path or raises the write error."""
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"snapshot {self.path} not written within {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.path
+
+
+class Burst:
+    """Handle for a burst; ``snapshots`` grows as frames are captured."""
+
+    def __init__(self, count):
+        self.count = count
+        self.snapshots = []
+        self.finished = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait until every frame is captured and written; returns the paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.finished.wait(timeout)
+        return [s.wait(None if deadline is None else max(0.0, deadline - time.monotonic())) for s in self.snapshots]
+
+
+class SnapshotWriter:
+    """Encodes snapshots of a ``frame_buffer.FrameRing`` on ``workers`` threads."""
+
+    def __init__(self, frames, directory='snapshots', workers=2, quality=90, max_files=500, max_bytes=None):
+        self.frames = frames
+        self.directory = directory
+        self.quality = quality
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='snapshot')
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.captured = 0
+        self.written = 0
+        self.failed = 0
+        self.evicted = 0
+        # Oldest first, so retention also covers snapshots from earlier runs
+        existing = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(('.jpg', '.jpeg'))]
+        existing.sort(key=os.path.getmtime)
+        self.files = deque((path, os.path.getsize(path)) for path in existing)
+        self.total_bytes = sum(size for _, size in self.files)
+        self._evict()
+
+    def capture(self, frame=None):
+        """Snapshot ``frame`` (default: the newest camera frame) and return its handle immediately."""
+        frame = frame or self.frames.latest()
+        if frame is None:
+            raise RuntimeError("no camera frame yet")
+        with self.lock:
+            self.counter += 1
+            self.captured += 1
+            name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(frame.timestamp))}-{self.counter:06d}.jpg"
+        snapshot = Snapshot(frame, os.path.join(self.directory, name))
+        self.executor.submit(self._write, snapshot)
+        return snapshot
+
+    def burst(self, count, rate):
+        """Capture ``count`` distinct frames at up to ``rate`` per second; returns a Burst at once."""
+        burst = Burst(count)
+
+        def run():
+            interval = 1.0 / rate
+            next_time = time.monotonic()
+            last_sequence = -1
+            try:
+                for _ in range(count):
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    # Never store the same camera frame twice
+                    frame = self.frames.wait_next(last_sequence, timeout=2.0)
+                    if frame is None:
+                        break
+                    last_sequence = frame.sequence
+                    burst.snapshots.append(self.capture(frame))
+                    next_time += interval
+            finally:
+                burst.finished.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        return burst
+
+    def stats(self):
+        with self.lock:
+            return {
+                'captured': self.captured,
+                'written': self.written,
+                'failed': self.failed,
+                'pending': self.captured - self.written - self.failed,
+                'evicted': self.evicted,
+                'files': len(self.files),
+                'bytes': self.total_bytes,
+            }
+
+    def close(self):
+        """Finish the pending writes."""
+        self.executor.shutdown(wait=True)
+
+    def _write(self, snapshot):
+        try:
+            with metrics.timer('snapshot_encode'):
+                encoded = encode_jpeg(snapshot.rgb, self.quality)
+            with metrics.timer('snapshot_write'):
+                temporary = snapshot.path + '.tmp'
+                with open(temporary, 'wb') as f:
+                    f.write(encoded.tobytes())
+                os.replace(temporary, snapshot.path)
+        except Exception as e:
+            snapshot.error = e
+            with self.lock:
+                self.failed += 1
+            print(f"Snapshot {snapshot.path} failed: {e}")
+        else:
+            with self.lock:
+                self.written += 1
+                self.files.append((snapshot.path, len(encoded)))
+                self.total_bytes += len(encoded)
+                self._evict()
+        finally:
+            snapshot.done.set()
+
+    def _evict(self):
+        # Called with the lock held (or before any worker exists)
+        while self.files and (len(self.files) > self.max_files or
+                              (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+            path, size = self.files.popleft()
+            self.total_bytes -= size
+            self.evicted += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,170 @@
+"""Background initialization and per-subsystem readiness for the entry points.
+
+An entry point imports this module first (it only needs the standard
+library), starts its slow parts with ``startup.start('camera',
+init_camera)`` and only then imports gradio and builds the UI. Opening
+the robot, the camera and loading the networks then overlap with the
+gradio import and with each other instead of running one after another
+before the page can load. Handlers check ``startup.ready(name)`` (or the
+globals the init functions publish) and answer with a placeholder until
+then.
+
+Each subsystem is 'starting', then 'ready', 'disabled' (an ImportError,
+i.e. simulation mode, or a dependency that is not ready) or 'failed'.
+Milestones such as 'ui', 'first_frame' and 'first_inference' are recorded
+once with ``startup.mark``. All times are seconds since the process
+started (read from /proc on Linux, so interpreter start-up and imports
+before this module count too). They are also exported as ``metrics``
+in the 'startup' family.
+"""
+import os
+import threading
+import time
+
+from metrics import metrics
+
+
+def process_start_time():
+    """``time.time()`` at which this process started; the import time of this module where /proc is missing."""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name; the start time is field 22 of the whole line
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class Subsystem:
+    """One part initialized in the background."""
+
+    def __init__(self, name, started):
+        self.name = name
+        self.state = 'starting'
+        self.value = None
+        self.error = None
+        self.started = started
+        self.finished = None
+        self.done = threading.Event()
+
+
+class Startup:
+    """Registry of background-initialized subsystems and start-up milestones."""
+
+    def __init__(self, origin=None, verbose=True):
+        self.origin = process_start_time() if origin is None else origin
+        self.verbose = verbose
+        self.subsystems = {}
+        self.milestones = {}
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        """Seconds since the process started."""
+        return time.time() - self.origin
+
+    def start(self, name, factory, after=()):
+        """Run ``factory()`` on a background thread; its return value becomes ``get(name)``.
+
+        The factory runs once the subsystems in ``after`` are done, and not
+        at all if one of them is not ready.
+        """
+        subsystem = Subsystem(name, self.elapsed())
+        with self.lock:
+            self.subsystems[name] = subsystem
+
+        def run():
+            for dependency in after:
+                self.wait(dependency)
+                if not self.ready(dependency):
+                    self._finish(subsystem, 'disabled', error=f"needs {dependency}")
+                    return
+            try:
+                value = factory()
+            except ImportError as e:
+                self._finish(subsystem, 'disabled', error=e)
+            except Exception as e:
+                self._finish(subsystem, 'failed', error=e)
+            else:
+                self._finish(subsystem, 'ready', value)
+
+        threading.Thread(target=run, daemon=True, name=f'startup-{name}').start()
+        return subsystem
+
+    def wait(self, name, timeout=None):
+        """Block until ``name`` is done initializing and return its value (None unless it is ready or on timeout)."""
+        with self.lock:
+            subsystem = self.subsystems.get(name)
+        if subsystem is None or not subsystem.done.wait(timeout):
+            return None
+        return subsystem.value
+
+    def get(self, name):
+        """The value of ``name`` if it is ready, without waiting."""
+        with self.lock:
+            subsystem = self.subsystems.get(name)
+        return subsystem.value if subsystem is not None and subsystem.state == 'ready' else None
+
+    def ready(self, name):
+        with self.lock:
+            subsystem = self.subsystems.get(name)
+        return subsystem is not None and subsystem.state == 'ready'
+
+    def state(self, name):
+        with self.lock:
+            subsystem = self.subsystems.get(name)
+        return subsystem.state if subsystem is not None else None
+
+    def mark(self, milestone):
+        """Record the first time ``milestone`` is reached; later calls are ignored."""
+        with self.lock:
+            if milestone in self.milestones:
+                return
+            self.milestones[milestone] = at = self.elapsed()
+        metrics.observe(milestone, at, family='startup')
+        if self.verbose:
+            print(f"Startup: {milestone} after {at:.2f} s")
+
+    def report(self):
+        """``{'elapsed', 'subsystems': {name: {...}}, 'milestones': {name: seconds}}``."""
+        with self.lock:
+            subsystems = {
+                name: {
+                    'state': s.state,
+                    'started': s.started,
+                    'ready_at': s.finished,
+                    'seconds': None if s.finished is None else s.finished - s.started,
+                    'error': None if s.error is None else str(s.error),
+                } for name, s in self.subsystems.items()
+            }
+            milestones = dict(self.milestones)
+        return {'elapsed': self.elapsed(), 'subsystems': subsystems, 'milestones': milestones}
+
+    def format_status(self):
+        """One line per subsystem and milestone, for a status box in the UI."""
+        report = self.report()
+        lines = []
+        for name, s in report['subsystems'].items():
+            if s['state'] == 'starting':
+                lines.append(f"{name}: starting ({report['elapsed'] - s['started']:.1f} s so far)")
+            else:
+                line = f"{name}: {s['state']} after {s['ready_at']:.2f} s"
+                lines.append(f"{line} ({s['error']})" if s['error'] else line)
+        lines += [f"{name}: {at:.2f} s" for name, at in sorted(report['milestones'].items(), key=lambda item: item[1])]
+        return "\n".join(lines)
+
+    def _finish(self, subsystem, state, value=None, error=None):
+        with self.lock:
+            subsystem.state = state
+            subsystem.value = value
+            subsystem.error = error
+            subsystem.finished = self.elapsed()
+        metrics.observe(subsystem.name, subsystem.finished - subsystem.started, family='startup')
+        if self.verbose:
+            print(f"Startup: {subsystem.name} {state} after {subsystem.finished:.2f} s" + (f" ({error})" if error else ""))
+        subsystem.done.set()
+
+
+# Process-wide registry shared by every module
+startup = Startup()
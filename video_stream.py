@@ -0,0 +1,177 @@
+"""Low-latency MJPEG video endpoint for the control panels.
+
+Each camera frame is JPEG-encoded at most once per (quality, width)
+variant and the same bytes are sent to every viewer that asked for that
+variant, instead of every viewer pushing a PIL image through Gradio's
+image serialization. Viewers that fall behind skip straight to the newest
+frame.
+
+Endpoints, with optional ``?quality=1-100&width=pixels``. Requested
+values are snapped to a few fixed variants (``variant``), so however many
+different URLs clients use, only a bounded number are encoded and cached:
+
+- ``/stream.mjpg``: multipart/x-mixed-replace MJPEG stream
+- ``/snapshot.jpg``: the latest frame as a single JPEG
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from metrics import metrics
+from preprocess import encode_jpeg
+
+BOUNDARY = 'jetbotframe'
+# Widths a viewer can get; a request is rounded down to one of them
+variant_widths = (160, 320, 480, 640, 960, 1280, 1920)
+
+
+def variant(quality, width=None):
+    """Snap a requested ``(quality, width)`` to one of the fixed variants.
+
+    Quality is rounded to a multiple of 10; width down to an entry of
+    ``variant_widths`` (at least the smallest). None stays the full size.
+    """
+    quality = min(100, max(10, int(round(quality / 10)) * 10))
+    if width is not None:
+        width = max([w for w in variant_widths if w <= width] or variant_widths[:1])
+    return quality, width
+
+
+class JpegEncoder:
+    """Encodes frames from a FrameRing, caching the latest JPEG per variant."""
+
+    def __init__(self):
+        self.cache = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.encodes = 0
+
+    def encode(self, frame, quality, width=None):
+        # Keys come from request URLs, so only the fixed variants may become cache entries
+        key = variant(quality, width)
+        quality, width = key
+        with self.lock:
+            variant_lock = self.locks.setdefault(key, threading.Lock())
+        # One encode per variant per frame, even with many viewers waiting on it
+        with variant_lock:
+            cached = self.cache.get(key)
+            # A newer frame already encoded is just as good for a latest-frame viewer
+            if cached is not None and cached[0] >= frame.sequence:
+                return cached[1]
+            # Scaling and the BGR copy use pooled scratch buffers
+            with metrics.timer('encode'):
+                data = encode_jpeg(frame.rgb, quality, width).tobytes()
+            self.cache[key] = (frame.sequence, data)
+            self.encodes += 1
+            return data
+
+
+class MJPEGServer:
+    """Serves frames from a ``frame_buffer.FrameRing`` over HTTP in a background thread."""
+
+    def __init__(self, frames, host='0.0.0.0', port=8081, quality=80, max_width=None, idle_timeout=30.0):
+        self.frames = frames
+        # A stream with no new frame for this long ends, so a dead client's handler thread does too
+        self.idle_timeout = idle_timeout
+        self.quality = quality
+        self.max_width = max_width
+        self.encoder = JpegEncoder()
+        self.viewers = 0
+        self.frames_sent = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {'viewers': self.viewers, 'frames_sent': self.frames_sent, 'encodes': self.encoder.encodes}
+
+    def _options(self, query):
+        params = parse_qs(query)
+        quality = self.quality
+        width = self.max_width
+        try:
+            if 'quality' in params:
+                quality = max(1, min(100, int(params['quality'][0])))
+            if 'width' in params:
+                width = max(16, int(params['width'][0]))
+                if self.max_width:
+                    width = min(width, self.max_width)
+        except ValueError:
+            pass
+        return variant(quality, width)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                quality, width = server._options(url.query)
+                if url.path == '/stream.mjpg':
+                    self.stream(quality, width)
+                elif url.path == '/snapshot.jpg':
+                    frame = server.frames.latest()
+                    if frame is None:
+                        self.send_error(503, "no frame yet")
+                        return
+                    data = server.encoder.encode(frame, quality, width)
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/jpeg')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self.send_error(404)
+
+            def stream(self, quality, width):
+                self.send_response(200)
+                self.send_header('Cache-Control', 'no-cache, private')
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+                self.end_headers()
+                with server.lock:
+                    server.viewers += 1
+                sequence = 0
+                idle = 0.0
+                try:
+                    while True:
+                        frame = server.frames.wait_next(sequence, timeout=5.0)
+                        if frame is None:
+                            # The camera stopped; a client that went away is never noticed without a write
+                            idle += 5.0
+                            if idle >= server.idle_timeout:
+                                return
+                            continue
+                        idle = 0.0
+                        sequence = frame.sequence
+                        data = server.encoder.encode(frame, quality, width)
+                        self.wfile.write(
+                            f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n'.encode())
+                        self.wfile.write(data)
+                        self.wfile.write(b'\r\n')
+                        with server.lock:
+                            server.frames_sent += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server.lock:
+                        server.viewers -= 1
+
+        return Handler